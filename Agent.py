@@ -1,30 +1,100 @@
 import os
 import json
 import re
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from fuzzywuzzy import fuzz, process
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
-from PDFBuilder import PDFBuilder
+import time
+import hashlib
+import io
+import copy
+import uuid
+import functools
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
 from llm_interface import LLMInterface
+from chunked_extraction import ChunkedExtractor
+from demographics_extractor import DemographicsExtractor
+from code_catalog import CodeCatalog, group_by_category
+from code_scanner import normalize_code
+from ocr_engine import create_ocr_engine
+from x12_export import write_claims_jsonl
+from metrics import PDF_RENDERS, PDF_RENDER_LATENCY, record_cache, record_fuzzy_match, record_ocr
+from tracing import span, annotate
+
+# Per-case state changed by a conversation turn; the conversation history only grows during a
+# turn, so it is snapshotted by length instead of copied
+CASE_FIELDS = ["patient_info", "diagnoses", "procedures", "matched_icd10_codes", "matched_cpt4_codes",
+               "current_icd10_matches", "current_cpt4_matches", "clinical_info", "document_text",
+               "current_state", "summary_mode"]
+
+class TurnCancelled(BaseException):
+    """
+    Raised in a cancelled turn before its next irreversible step. A BaseException, like
+    KeyboardInterrupt, so the handlers that report errors to the user do not swallow it.
+    """
+
+# Code lookup also takes ranges ("99202-99215") and families ("E11*", "E11.*")
+CODE_RANGE = re.compile(r"^([A-Z0-9.]+)\s*[-\u2013]\s*([A-Z0-9.]+)$", re.IGNORECASE)
+CODE_FAMILY = re.compile(r"^([A-Z0-9.]+?)\.?\*$", re.IGNORECASE)
+CODE_SET_DISPLAY_LIMIT = 50
+
+def default_pdf_builder(filename=None):
+    """Default PDFBuilder factory; ReportLab is only imported when the first claim is rendered"""
+    from PDFBuilder import PDFBuilder
+    return PDFBuilder(filename)
+
+def merge_phrases(first, second):
+    """Phrases of first, then those of second that are not already there (ignoring case)"""
+    seen = {phrase.lower() for phrase in first}
+    merged = list(first)
+    for phrase in second:
+        if phrase.lower() not in seen:
+            seen.add(phrase.lower())
+            merged.append(phrase)
+    return merged
+
+def traced(name):
+    """Run the decorated agent method inside a span of the agent's trace"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.trace_span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+def pins_catalog(method):
+    """Run the decorated agent method against one catalog version, even if a newer one is swapped in meanwhile"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.pin_catalog():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class MedicalCodingAgent:
-    def __init__(self, llm: LLMInterface, icd10_data_path="ICD10.json", cpt4_data_path="CPT4.json", pdf_builder=None,
-                 tesseract_cmd=None, poppler_path=None):
+    def __init__(self, llm: LLMInterface, icd10_data_path="ICD10.json", cpt4_data_path="CPT4.json", pdf_builder_factory=None,
+                 tesseract_cmd=None, poppler_path=None, max_chunk_chars=6000, extraction_workers=4, ocr_engine=None,
+                 form_template=False, claim_export_path=None, catalog=None, message_handler=None, profiler=None,
+                 tracer=None, trace_id=None, retrieval_candidates=100, term_coverage=0.8):
         self.llm = llm  # Use the LLM interface
 
-        # Configure Tesseract OCR path
-        if tesseract_cmd:
-            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        # Long documents are extracted chunk by chunk in parallel, then merged
+        self.document_extractor = ChunkedExtractor(llm, max_chunk_chars=max_chunk_chars, max_workers=extraction_workers)
+
+        # Configure OCR: warm in-process Tesseract workers when available, pytesseract otherwise.
+        # Created on the first document unless one is injected
+        self.ocr_engine = ocr_engine
+        self.tesseract_cmd = tesseract_cmd
 
         # Configure Poppler path
         self.poppler_path = poppler_path
 
-        # Load ICD-10 and CPT-4 data
-        self.icd10_data = self.load_icd10_data(icd10_data_path)
-        self.cpt4_data = self.load_cpt4_data(cpt4_data_path)
+        # ICD-10 and CPT-4 catalogs are read-only, so several agents can share one catalog; it is
+        # loaded the first time codes are needed. A CatalogManager may swap in new versions at any
+        # time, so work that must see one version pins it (pin_catalog)
+        self.catalog_source = catalog or CodeCatalog(icd10_data_path, cpt4_data_path)
+        self.pinned_catalog = None
+
+        # Assistant messages are printed by default; a service passes its own handler to collect them
+        self.message_handler = message_handler or (lambda message: print("Assistant:", message))
 
         # Initialize other attributes
         self.patient_info = {}
@@ -36,6 +106,7 @@ class MedicalCodingAgent:
         self.current_state = "greeting"
         self.summary_mode = False
         self.clinical_info = {}
+        self.document_text = None
 
         # Define essential patient info fields
         self.essential_info_fields = {
@@ -46,40 +117,91 @@ class MedicalCodingAgent:
             "policy": "insurance ID"
         }
 
-        # Inject PDFBuilder instance
-        self.pdf_builder = pdf_builder or PDFBuilder("default_claim.pdf")
+        # Labelled demographics are read with rules first; the LLM is skipped when they are complete
+        self.demographics_extractor = DemographicsExtractor()
+        self.pre_extraction_confidence = 0.9
 
-    def load_icd10_data(self, data_path):
-        """Load ICD-10 codes from json file"""
-        try:
-            with open(data_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        except Exception as e:
-            print(f"Error loading ICD-10 data: {e}")
-            # Return empty list if file loading fails
-            return []
-    
-    def load_cpt4_data(self, data_path):
-        """Load CPT-4 codes from json file"""
+        # Inject the PDFBuilder factory; every render gets a fresh in-memory builder (called with None)
+        self.pdf_builder_factory = pdf_builder_factory or default_pdf_builder
+        # (content hash, PDF bytes) of the last rendered claim and (content hash, filename) of the last
+        # file written, to skip unchanged re-renders
+        self.last_claim_pdf = None
+        self.last_claim_render = None
+        # Draw claims over the cached CMS-1500 skeleton instead of rebuilding every table: somewhat
+        # faster, but a single-claim file is about a third larger than with the dynamic layout
+        self.form_template = form_template
+        # Finalized claims are appended here as JSON lines for electronic (X12 837P) submission
+        self.claim_export_path = claim_export_path
+        # Optional TurnProfiler timing each turn and its stages; can be switched on and off at any time
+        self.profiler = profiler
+        # Optional Tracer; every span of this agent carries trace_id (e.g. the session ID) so one
+        # claim's OCR, LLM, matching and rendering can be followed end to end
+        self.tracer = tracer
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        # Fuzzy matching only re-ranks this many TF-IDF candidates per phrase; 0 scores the whole catalog
+        self.retrieval_candidates = retrieval_candidates
+        # Catalog terms and shorthand spotted in the notes seed the extraction; the LLM is only asked
+        # when they account for less than this share of the note's content words (None: always ask)
+        self.term_coverage = term_coverage
+        # Set by the caller (e.g. the GUI's Cancel button) to stop the running turn before it spends
+        # more LLM calls, writes a claim file or exports a claim
+        self.cancel_event = None
+
+    @property
+    def catalog(self):
+        """The pinned catalog version during a turn or match, otherwise the current one"""
+        return self.pinned_catalog or self.catalog_source.current
+
+    @contextmanager
+    def pin_catalog(self):
+        """Keep using the current catalog version until the block ends; nested pins share it"""
+        if self.pinned_catalog is not None:
+            yield self.pinned_catalog
+            return
+        self.pinned_catalog = self.catalog_source.current
         try:
-            with open(data_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        except Exception as e:
-            print(f"Error loading CPT-4 data: {e}")
-            # Return empty list if file loading fails
-            return []
-    
+            yield self.pinned_catalog
+        finally:
+            self.pinned_catalog = None
+
+    @property
+    def icd10_data(self):
+        return self.catalog.icd10_data
+
+    @property
+    def cpt4_data(self):
+        return self.catalog.cpt4_data
+
+    @property
+    def code_scanner(self):
+        return self.catalog.code_scanner
+
+    def get_ocr_engine(self):
+        """Return the OCR engine, starting it on first use"""
+        if self.ocr_engine is None:
+            self.ocr_engine = create_ocr_engine(self.tesseract_cmd)
+        return self.ocr_engine
+
+    def close(self):
+        """Stop the OCR engine's workers; called when the agent is shut down (not for a shared engine)"""
+        if self.ocr_engine is not None:
+            self.ocr_engine.close()
+            self.ocr_engine = None
+
     def start_conversation(self):
         """Begin the conversation with the user"""
+        self.open_conversation()
+
+        # Start the conversation loop
+        self.conversation_loop()
+
+    def open_conversation(self):
+        """Set the system prompt and greet the user"""
         self.add_to_history("system", "You are an AI medical coding assistant that helps healthcare providers accurately code diagnoses with ICD-10 codes, procedures with CPT-4 codes, and generate insurance claim forms.")
         
         # Initial greeting
         greeting = "Hello! I'm your AI medical coding assistant. I can help you code patient diagnoses and procedures, then generate insurance claims. Would you like to:\n1. Start with guided mode (I'll help you step by step)\n2. Use summary mode (provide all information at once)\n3. Upload a PDF/JPG document (I'll extract information from your document)"
-        self.add_to_history("assistant", greeting)
-        print("Assistant:", greeting)
-        
-        # Start the conversation loop
-        self.conversation_loop()
+        self.say(greeting)
     
     def conversation_loop(self):
         """Main conversation loop for the agent"""
@@ -95,28 +217,7 @@ class MedicalCodingAgent:
                     print("Assistant: Thank you for using the Medical Coding Assistant. Goodbye!")
                     break
                     
-                self.add_to_history("user", user_input)
-                
-                # Process based on current state
-                if self.current_state == "collecting_patient_info":
-                    self.collect_patient_info(user_input)
-                elif self.current_state == "collecting_clinical_notes":
-                    self.collect_clinical_notes(user_input)
-                elif self.current_state == "confirming_codes":
-                    self.confirm_codes(user_input)
-                elif self.current_state == "reviewing_claim":
-                    self.review_claim(user_input)
-                elif self.current_state == "post_claim_menu":
-                    self.handle_post_claim_menu(user_input)
-                elif self.current_state == "collecting_summary":
-                    self.collect_summary(user_input)
-                elif self.current_state == "code_lookup":
-                    self.code_lookup(user_input)
-                elif self.current_state == "processing_document":
-                    self.process_document(user_input)
-                else:
-                    # Default handling using GPT for flexible conversation
-                    self.handle_default_conversation(user_input)
+                self.handle_input(user_input)
             except EOFError:
                 print("\nInput stream ended. Exiting...")
                 break
@@ -127,25 +228,124 @@ class MedicalCodingAgent:
                 print(f"Error in conversation loop: {str(e)}")
                 print("Assistant: Sorry, I encountered an error. Let's continue.")
     
+    @contextmanager
+    def timed(self, stage):
+        """Time a block as a stage of the current turn when profiling is on, and as a span when tracing"""
+        with self.profiler.stage(stage) if self.profiler else nullcontext(), span(stage):
+            yield
+
+    def trace_span(self, name, **attrs):
+        """Open a span of this agent's trace, or do nothing when tracing is off"""
+        return self.tracer.span(name, trace_id=self.trace_id, **attrs) if self.tracer else nullcontext()
+
+    def handle_input(self, user_input):
+        """Record one user message and route it to the handler for the current state"""
+        profiler = self.profiler
+        with profiler.turn(self.current_state) if profiler else nullcontext(), \
+                self.trace_span("turn", state=self.current_state), self.pin_catalog():
+            self.dispatch_input(user_input)
+            annotate(next_state=self.current_state)
+
+    def dispatch_input(self, user_input):
+        self.add_to_history("user", user_input)
+
+        # Process based on current state
+        if self.current_state == "collecting_patient_info":
+            self.collect_patient_info(user_input)
+        elif self.current_state == "collecting_clinical_notes":
+            self.collect_clinical_notes(user_input)
+        elif self.current_state == "confirming_codes":
+            self.confirm_codes(user_input)
+        elif self.current_state == "reviewing_claim":
+            self.review_claim(user_input)
+        elif self.current_state == "post_claim_menu":
+            self.handle_post_claim_menu(user_input)
+        elif self.current_state == "collecting_summary":
+            self.collect_summary(user_input)
+        elif self.current_state == "code_lookup":
+            self.code_lookup(user_input)
+        elif self.current_state == "processing_document":
+            self.process_document(user_input)
+        else:
+            # Default handling using GPT for flexible conversation
+            self.handle_default_conversation(user_input)
+
+    def reset_case(self, clear_history=False):
+        """Forget the current patient case so a new one can start"""
+        self.patient_info = {}
+        self.diagnoses = []
+        self.procedures = []
+        self.matched_icd10_codes = []
+        self.matched_cpt4_codes = []
+        self.current_icd10_matches = []
+        self.current_cpt4_matches = []
+        self.clinical_info = {}
+        self.document_text = None
+        if clear_history:
+            self.conversation_history = []
+
+    def snapshot_case(self):
+        """Copy the case state so an abandoned turn can be rolled back; the history is kept by length"""
+        snapshot = copy.deepcopy({field: getattr(self, field, None) for field in CASE_FIELDS})
+        snapshot["conversation_history"] = (self.conversation_history, len(self.conversation_history))
+        return snapshot
+
+    def restore_case(self, snapshot):
+        """Put back the case state captured by snapshot_case"""
+        for field, value in snapshot.items():
+            if field == "conversation_history":
+                history, length = value
+                del history[length:]
+                value = history
+            setattr(self, field, value)
+
+    def check_cancelled(self):
+        """Stop a cancelled turn before an irreversible step (LLM spend, claim files, claim export)"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise TurnCancelled()
+
     def add_to_history(self, role, content):
         """Add a message to the conversation history"""
         self.conversation_history.append({"role": role, "content": content})
+
+    def say(self, message):
+        """Record an assistant message and hand it to the message handler"""
+        self.add_to_history("assistant", message)
+        self.message_handler(message)
     
     def generate_llm_response(self, specific_prompt=None):
         """Generate a response using the LLM interface."""
+        self.check_cancelled()
         try:
-            response = self.llm.generate_response(self.conversation_history, specific_prompt)
-            self.add_to_history("assistant", response)
-            print("Assistant:", response)
+            with self.timed("llm"):
+                response = self.llm.generate_response(self.conversation_history, specific_prompt)
+            self.say(response)
             return response
         except Exception as e:
             error_message = f"I apologize, but I encountered an error: {str(e)}. Please try again."
-            self.add_to_history("assistant", error_message)
-            print("Assistant:", error_message)
+            self.say(error_message)
             return error_message
     
+    def pre_extract_patient_info(self, text):
+        """Fill patient_info from labelled fields in the text and return the fields found with high confidence"""
+        found = {}
+        with self.timed("demographics rules"):
+            extracted = self.demographics_extractor.extract(text)
+        for field, result in extracted.items():
+            if result["confidence"] >= self.pre_extraction_confidence:
+                self.patient_info[field] = result["value"]
+                found[field] = result["value"]
+        return found
+
+    def has_essential_info(self):
+        """Check whether every essential patient field has a value"""
+        return all(self.patient_info.get(field) for field in self.essential_info_fields)
+
     def collect_patient_info(self, user_input):
         """Collect and parse patient information"""
+        # Deterministic pass first; only ask the LLM when something essential is still missing
+        pre_extracted = self.pre_extract_patient_info(user_input)
+        
         # Extract potential patient info using GPT
         system_prompt = """
         Extract patient information from the user's message. 
@@ -163,7 +363,7 @@ class MedicalCodingAgent:
         For any missing information, use null or empty string.
         """
         
-        response = self.generate_llm_response(system_prompt)
+        response = "" if self.has_essential_info() else self.generate_llm_response(system_prompt)
         
         # Try to extract JSON from the response
         try:
@@ -175,9 +375,9 @@ class MedicalCodingAgent:
                 json_str = json_match.group(0)
                 extracted_info = json.loads(json_str)
                 
-                # Update patient info with extracted data
+                # Update patient info with extracted data, keeping the high-confidence rule matches
                 for key, value in extracted_info.items():
-                    if value not in [None, "", "null"]:
+                    if value not in [None, "", "null"] and key not in pre_extracted:
                         self.patient_info[key] = value
             
             # Check if we have all essential information
@@ -190,32 +390,78 @@ class MedicalCodingAgent:
                 # Ask for missing essential information
                 fields_str = ", ".join(missing_fields)
                 response = f"I still need the following essential information: {fields_str}. Please provide these details."
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
             else:
                 # Move to collecting clinical notes
                 self.current_state = "collecting_clinical_notes"
                 response = "Thank you for providing the patient information. Now, please share the clinical notes or medical documentation. I'll extract diagnosis (ICD-10) and procedure (CPT-4) codes from them."
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
                 
         except Exception as e:
             print(f"Error parsing patient info: {e}")
             response = "I had trouble processing that information. Could you please provide the patient details again, clearly specifying their name, date of birth, gender, insurance provider, and policy number?"
-            self.add_to_history("assistant", response)
-            print("Assistant:", response)
+            self.say(response)
     
+    def confirm_literal_codes(self, text):
+        """Add ICD-10/CPT-4 codes written literally in the text straight to the confirmed codes"""
+        with self.timed("code scan"):
+            literal_icd10, literal_cpt4 = self.code_scanner.scan(text)
+        version = self.catalog.version
+        for code in literal_icd10 + literal_cpt4:
+            code["catalog_version"] = version
+        for code in literal_icd10:
+            if not any(matched['code'] == code['code'] for matched in self.matched_icd10_codes):
+                self.matched_icd10_codes.append(code)
+        for code in literal_cpt4:
+            if not any(matched['code'] == code['code'] for matched in self.matched_cpt4_codes):
+                self.matched_cpt4_codes.append(code)
+        return literal_icd10, literal_cpt4
+
+    def format_literal_codes(self, literal_icd10, literal_cpt4):
+        """Describe the literal codes that were confirmed without LLM extraction or fuzzy matching"""
+        if not literal_icd10 and not literal_cpt4:
+            return ""
+        response = "CONFIRMED CODES (written in the notes):\n"
+        for code in literal_icd10:
+            response += f"- ICD-10 {code['code']} - {code['disease']}\n"
+        for code in literal_cpt4:
+            response += f"- CPT-4 {code['code']} - {code['procedure']}\n"
+        return response
+
+    @traced("collect clinical notes")
+    @pins_catalog
     def collect_clinical_notes(self, user_input):
         """Collect and process clinical notes to extract diagnoses and procedures"""
+        # Codes already written in the notes bypass the LLM extraction and fuzzy matching
+        literal_icd10, literal_cpt4 = self.confirm_literal_codes(user_input)
+        literal_codes = literal_icd10 + literal_cpt4
+        already_coded = ""
+        if literal_codes:
+            already_coded = "\nThese items are already coded, do not list them again: " + ", ".join(
+                code.get('disease', code.get('procedure')) for code in literal_codes)
+        # Skip the LLM entirely when nothing but the codes (and their descriptions) was written
+        residual_text = self.code_scanner.residual_text(user_input, literal_codes)
+        residual_words = re.findall(r'[A-Za-z]{3,}', residual_text)
+        needs_extraction = not literal_codes or len(residual_words) >= 3
+
+        # Known diagnosis/procedure terms are found in one pass over the notes; when they cover
+        # nearly all of it there is nothing left for the LLM to add
+        spotted = {"diagnoses": [], "procedures": []}
+        if self.term_coverage is not None:
+            with self.timed("term spotting"):
+                spotted = self.catalog.term_spotter().spot(residual_text)
+                annotate(term_coverage=round(spotted["coverage"], 2))
+            needs_extraction = needs_extraction and spotted["coverage"] < self.term_coverage
+
         # First, try to extract diagnoses (ICD-10)
         icd10_system_prompt = """
         Extract potential medical diagnoses from the clinical notes. 
         Focus on conditions, diseases, symptoms, or health issues mentioned.
         Format your response as a list of diagnoses, one per line.
-        """
+        """ + already_coded
         
         # Extract diagnoses
-        diagnoses_response = self.generate_llm_response(icd10_system_prompt)
+        diagnoses_response = self.generate_llm_response(icd10_system_prompt) if needs_extraction else ""
         
         # Try to parse diagnoses from the response
         extracted_diagnoses = []
@@ -229,11 +475,13 @@ class MedicalCodingAgent:
                     extracted_diagnoses.append(diagnosis)
         
         # Find matching ICD-10 codes for each diagnosis
-        self.diagnoses = extracted_diagnoses
+        self.diagnoses = merge_phrases(spotted["diagnoses"], extracted_diagnoses)
         all_icd10_matches = []
+        candidate_lists = self.retrieve_candidates("icd10", self.diagnoses)
         
-        for diagnosis in self.diagnoses:
-            matches = self.find_matching_icd10_codes(diagnosis)
+        for diagnosis, candidates in zip(self.diagnoses, candidate_lists):
+            with self.timed("fuzzy matching"):
+                matches = self.find_matching_icd10_codes(diagnosis, candidates)
             if matches:
                 all_icd10_matches.append({
                     "diagnosis": diagnosis,
@@ -245,10 +493,10 @@ class MedicalCodingAgent:
         Extract potential medical procedures from the clinical notes.
         Focus on treatments, surgeries, tests, or other medical services performed.
         Format your response as a list of procedures, one per line.
-        """
+        """ + already_coded
         
         # Extract procedures
-        procedures_response = self.generate_llm_response(cpt4_system_prompt)
+        procedures_response = self.generate_llm_response(cpt4_system_prompt) if needs_extraction else ""
         
         # Try to parse procedures from the response
         extracted_procedures = []
@@ -262,11 +510,13 @@ class MedicalCodingAgent:
                     extracted_procedures.append(procedure)
         
         # Find matching CPT-4 codes for each procedure
-        self.procedures = extracted_procedures
+        self.procedures = merge_phrases(spotted["procedures"], extracted_procedures)
         all_cpt4_matches = []
+        candidate_lists = self.retrieve_candidates("cpt4", self.procedures)
         
-        for procedure in self.procedures:
-            matches = self.find_matching_cpt4_codes(procedure)
+        for procedure, candidates in zip(self.procedures, candidate_lists):
+            with self.timed("fuzzy matching"):
+                matches = self.find_matching_cpt4_codes(procedure, candidates)
             if matches:
                 all_cpt4_matches.append({
                     "procedure": procedure,
@@ -280,13 +530,16 @@ class MedicalCodingAgent:
         # Build response with matched codes
         response = "Based on the clinical notes, I've identified the following:\n\n"
         
+        if literal_codes:
+            response += self.format_literal_codes(literal_icd10, literal_cpt4) + "\n"
+        
         if all_icd10_matches:
             response += "DIAGNOSES:\n"
             for i, item in enumerate(all_icd10_matches, 1):
                 response += f"{i}. For '{item['diagnosis']}', I found these ICD-10 codes:\n"
                 for j, match in enumerate(item['matches'], 1):
                     response += f"   {chr(96+j)}. {match['code']} - {match['disease']}\n"
-        else:
+        elif not literal_icd10:
             response += "I couldn't identify any clear diagnoses for ICD-10 coding.\n"
         
         response += "\n"
@@ -297,67 +550,119 @@ class MedicalCodingAgent:
                 response += f"{i}. For '{item['procedure']}', I found these CPT-4 codes:\n"
                 for j, match in enumerate(item['matches'], 1):
                     response += f"   {chr(96+j)}. {match['code']} - {match['procedure']}\n"
-        else:
+        elif not literal_cpt4:
             response += "I couldn't identify any clear procedures for CPT-4 coding.\n"
         
+        if literal_codes:
+            response += "\nCodes written in the notes are already confirmed; type 'ok' to continue with just those."
+        
         response += "\nPlease confirm the codes by typing the corresponding numbers and letters (e.g., '1a, 2c, 3b' for diagnoses and '1B, 2A' for procedures (Case sensitive)). Or type 'none' if none of the suggested codes are appropriate."
         
-        self.add_to_history("assistant", response)
-        print("Assistant:", response)
+        self.say(response)
         self.current_state = "confirming_codes"
     
-    def find_matching_icd10_codes(self, diagnosis_text):
-        """Find ICD-10 codes that match the given diagnosis text"""
-        matches = []
-        
-        # Using fuzzy matching to find potential matches
-        for code_entry in self.icd10_data:
-            disease_score = fuzz.token_set_ratio(diagnosis_text.lower(), code_entry["disease"].lower())
-            category_score = fuzz.token_set_ratio(diagnosis_text.lower(), code_entry["category"].lower())
-            
-            # Use the higher of the two scores
-            best_score = max(disease_score, category_score)
-            
-            if best_score > 70:  # Threshold for considering it a match
-                matches.append({
-                    "code": code_entry["code"],
-                    "disease": code_entry["disease"],
-                    "category": code_entry["category"],
-                    "score": best_score
-                })
-        
-        # Sort by score in descending order
-        matches.sort(key=lambda x: x["score"], reverse=True)
+    def retrieve_candidates(self, catalog, phrases):
+        """
+        Catalog positions worth fuzzy scoring for each phrase, from one batched TF-IDF query, or
+        None per phrase when retrieval is off (the whole catalog is scored).
+        """
+        if not self.retrieval_candidates or not phrases:
+            return [None] * len(phrases)
+        with self.timed("retrieval"):
+            hits = self.catalog.retrieval_index(catalog).search_many(phrases, self.retrieval_candidates)
+        return [[document for document, _ in phrase_hits] for phrase_hits in hits]
+
+    @traced("match icd10")
+    @pins_catalog
+    def find_matching_icd10_codes(self, diagnosis_text, candidates=None):
+        """Find ICD-10 codes that match the given diagnosis text, re-ranking the retrieval candidates"""
+        from fuzzywuzzy import fuzz
+        if candidates is None:
+            candidates = self.retrieve_candidates("icd10", [diagnosis_text])[0]
+        started = time.perf_counter()
+        query = diagnosis_text.lower()
+
+        if candidates is None:
+            groups = self.catalog.icd10_categories
+        else:
+            groups = group_by_category((rank, self.icd10_data[index]) for rank, index in enumerate(candidates))
+
+        # Using fuzzy matching to find potential matches. Each distinct category is scored once
+        # and its score reused for every entry under it
+        version = self.catalog.version
+        ranked = []
+        for category, entries in groups:
+            category_score = fuzz.token_set_ratio(query, category)
+            for index, code_entry, disease in entries:
+                disease_score = fuzz.token_set_ratio(query, disease)
+
+                # Use the higher of the two scores
+                best_score = max(disease_score, category_score)
+
+                if best_score > 70:  # Threshold for considering it a match
+                    ranked.append((-best_score, index, {
+                        "code": code_entry["code"],
+                        "disease": code_entry["disease"],
+                        "category": code_entry["category"],
+                        "score": best_score,
+                        "catalog_version": version
+                    }))
+
+        # Sort by score in descending order, ties in retrieval (or catalog) order
+        ranked.sort(key=lambda item: item[:2])
+        matches = [match for _, _, match in ranked]
+        record_fuzzy_match("icd10", len(matches), time.perf_counter() - started)
+        annotate(candidates=len(matches))
         
         return matches
     
-    def find_matching_cpt4_codes(self, procedure_text):
-        """Find CPT-4 codes that match the given procedure text"""
+    @traced("match cpt4")
+    @pins_catalog
+    def find_matching_cpt4_codes(self, procedure_text, candidates=None):
+        """Find CPT-4 codes that match the given procedure text, re-ranking the retrieval candidates"""
+        from fuzzywuzzy import fuzz
+        if candidates is None:
+            candidates = self.retrieve_candidates("cpt4", [procedure_text])[0]
+        started = time.perf_counter()
         matches = []
+        query = procedure_text.lower()
+        entries = self.cpt4_data if candidates is None else [self.cpt4_data[index] for index in candidates]
+        version = self.catalog.version
         
         # Using fuzzy matching to find potential matches
-        for code_entry in self.cpt4_data:
-            procedure_score = fuzz.token_set_ratio(procedure_text.lower(), code_entry["procedure"].lower())
+        for code_entry in entries:
+            procedure_score = fuzz.token_set_ratio(query, code_entry["procedure"].lower())
             
             if procedure_score > 70:  # Threshold for considering it a match
                 matches.append({
                     "code": code_entry["code"],
                     "procedure": code_entry["procedure"],
-                    "score": procedure_score
+                    "score": procedure_score,
+                    "catalog_version": version
                 })
         
         # Sort by score in descending order
         matches.sort(key=lambda x: x["score"], reverse=True)
+        record_fuzzy_match("cpt4", len(matches), time.perf_counter() - started)
+        annotate(candidates=len(matches))
         
         return matches
     
+    def auto_confirm_top_matches(self):
+        """Confirm the best suggestion for every diagnosis and procedure without asking (unattended intake)"""
+        for item in getattr(self, 'current_icd10_matches', []):
+            if item["matches"] and item["matches"][0] not in self.matched_icd10_codes:
+                self.matched_icd10_codes.append(item["matches"][0])
+        for item in getattr(self, 'current_cpt4_matches', []):
+            if item["matches"] and item["matches"][0] not in self.matched_cpt4_codes:
+                self.matched_cpt4_codes.append(item["matches"][0])
+
     def confirm_codes(self, user_input):
         """Confirm selected ICD-10 and CPT-4 codes"""
         if user_input.lower() == "none":
             # User doesn't want any of the suggested codes
             response = "No problem. I'll generate a claim form without any coding. Would you like to provide alternative codes manually?"
-            self.add_to_history("assistant", response)
-            print("Assistant:", response)
+            self.say(response)
         else:
             # Parse user selections
             try:
@@ -398,8 +703,7 @@ class MedicalCodingAgent:
                 
                 # Now generate the claim form
                 response = "Thank you for confirming the codes. I'll now generate a claim form with the selected codes. Please wait..."
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
                 
                 # Generate the claim form
                 filename = self.generate_cms1500_pdf()
@@ -429,14 +733,12 @@ class MedicalCodingAgent:
                 
                 response += "\nWould you like to add any additional information to the claim? For example:\n- Service date\n- Place of service\n- Referring provider\n- NPI number\n- Additional insurance information"
                 
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
                 
             except Exception as e:
                 print(f"Error processing code selections: {e}")
                 response = "I'm having trouble understanding your code selections. Please use the format '1a, 2b' for diagnoses and procedures. For example, '1a, 2c' means you want the first code (a) for diagnosis 1 and the third code (c) for diagnosis 2."
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
     
     def review_claim(self, user_input):
         """Handle the user's request to add more information or finalize the claim"""
@@ -447,8 +749,10 @@ class MedicalCodingAgent:
             # User is done, finalize the claim
             filename = self.generate_cms1500_pdf()  # Regenerate with any final updates
             response = f"Your claim has been finalized and saved as '{filename}'. You can download this PDF file for submission."
-            self.add_to_history("assistant", response)
-            print("Assistant:", response)
+            if self.claim_export_path:
+                claim_id = self.export_claim_record()
+                response += f" The claim ({claim_id}) was also queued in '{self.claim_export_path}' for electronic submission."
+            self.say(response)
 
             # Present the user with the next action menu
             menu = (
@@ -458,8 +762,7 @@ class MedicalCodingAgent:
                 "3. Look up ICD-10 or CPT-4 code meanings\n"
                 "4. Learn about medical coding"
             )
-            self.add_to_history("assistant", menu)
-            print("Assistant:", menu)
+            self.say(menu)
             self.current_state = "post_claim_menu"
         else:
             # User wants to add more information
@@ -496,17 +799,18 @@ class MedicalCodingAgent:
                 filename = self.generate_cms1500_pdf()
                 
                 response = f"I've updated the claim form with the additional information and saved it as '{filename}'. Would you like to add any other details, or shall we finalize the claim?"
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
                 
             except Exception as e:
                 print(f"Error processing additional information: {e}")
                 response = "I've noted your additional information. Is there anything else you'd like to add before we finalize the claim?"
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
     
     def collect_summary(self, user_input):
         """Process all information provided in summary mode"""
+        # Read labelled demographics with rules before falling back to the LLM
+        pre_extracted = self.pre_extract_patient_info(user_input)
+        
         # Extract patient information
         patient_info_prompt = """
         Extract patient information from the text. Look for:
@@ -523,7 +827,7 @@ class MedicalCodingAgent:
         For any missing information, use null or empty string.
         """
         
-        patient_info_response = self.generate_llm_response(patient_info_prompt)
+        patient_info_response = "" if self.has_essential_info() else self.generate_llm_response(patient_info_prompt)
         
         try:
             # Find JSON in the response
@@ -536,7 +840,7 @@ class MedicalCodingAgent:
                 
                 # Update patient info with extracted data
                 for key, value in extracted_info.items():
-                    if value not in [None, "", "null"]:
+                    if value not in [None, "", "null"] and key not in pre_extracted:
                         self.patient_info[key] = value
         except Exception as e:
             print(f"Error parsing patient info: {e}")
@@ -548,70 +852,81 @@ class MedicalCodingAgent:
         filename = self.generate_cms1500_pdf()
         
         response = f"I've processed all the information and generated a claim form saved as '{filename}'. Would you like to review the claim details or make any adjustments?"
-        self.add_to_history("assistant", response)
-        print("Assistant:", response)
+        self.say(response)
         
         self.current_state = "reviewing_claim"
 
-    def generate_cms1500_pdf(self):
-        """Generate a CMS-1500 claim form as PDF with dynamic layout."""
-        patient_name = self.patient_info.get('name', 'Unknown').replace(' ', '_')
-        filename = f"claim_{patient_name}.pdf"
-
-        # Update the filename in the PDFBuilder instance
-        self.pdf_builder.filename = filename
-
-        # Title
-        self.pdf_builder.canvas.setFont("Helvetica-Bold", 16)
-        self.pdf_builder.canvas.setFillColor(colors.black)
-        title = "CMS-1500 HEALTH INSURANCE CLAIM FORM EXAMPLE"
-        title_width = self.pdf_builder.canvas.stringWidth(title, "Helvetica-Bold", 16)
-        self.pdf_builder.canvas.drawString((self.pdf_builder.width - title_width) / 2, self.pdf_builder.y_position, title)
-        self.pdf_builder.y_position -= 0.5 * inch
-
-        # Patient Info
-        self.pdf_builder.draw_section_header("PATIENT INFORMATION")
-        patient_data = [
-            ["Name:", self.patient_info.get('name', 'N/A')],
-            ["DOB:", self.patient_info.get('dob', 'N/A')],
-            ["Gender:", self.patient_info.get('gender', 'N/A')],
-            ["Address:", self.patient_info.get('address', 'N/A')],
-            ["Phone:", self.patient_info.get('phone', 'N/A')]
-        ]
-        self.pdf_builder.draw_table(patient_data, col_widths=[1.5 * inch, 4.5 * inch])
-
-        # Insurance Info
-        self.pdf_builder.draw_section_header("INSURANCE INFORMATION")
-        insurance_data = [
-            ["Provider:", self.patient_info.get('insurance', 'N/A')],
-            ["Policy #:", self.patient_info.get('policy', 'N/A')],
-            ["Group #:", self.patient_info.get('group', 'N/A')]
-        ]
-        self.pdf_builder.draw_table(insurance_data, col_widths=[1.5 * inch, 4.5 * inch])
-
-        # Clinical Info
-        if hasattr(self, 'clinical_info') and self.clinical_info:
-            self.pdf_builder.draw_section_header("CLINICAL INFORMATION")
-            clinical_data = [[f"{key.replace('_', ' ').capitalize()}:", str(value)] for key, value in self.clinical_info.items()]
-            self.pdf_builder.draw_table(clinical_data, col_widths=[1.5 * inch, 4.5 * inch])
-
-        # Diagnoses
-        if self.matched_icd10_codes:
-            self.pdf_builder.draw_section_header("DIAGNOSIS CODES (ICD-10)")
-            diagnosis_data = [["Code", "Description"]] + [[code['code'], code['disease']] for code in self.matched_icd10_codes]
-            self.pdf_builder.draw_table(diagnosis_data, col_widths=[1.5 * inch, 4.5 * inch])
-
-        # Procedures
-        if self.matched_cpt4_codes:
-            self.pdf_builder.draw_section_header("PROCEDURE CODES (CPT-4)")
-            procedure_data = [["Code", "Description"]] + [[code['code'], code['procedure']] for code in self.matched_cpt4_codes]
-            self.pdf_builder.draw_table(procedure_data, col_widths=[1.5 * inch, 4.5 * inch])
-
-        # Footer
-        self.pdf_builder.add_footer()
-
-        # Save the PDF
-        self.pdf_builder.save()
+    def build_claim_record(self):
+        """Collect the data printed on the claim form into a plain record"""
+        return {
+            "patient_info": dict(self.patient_info),
+            "clinical_info": dict(self.clinical_info) if hasattr(self, 'clinical_info') and self.clinical_info else {},
+            "icd10_codes": [{"code": code['code'], "disease": code['disease']} for code in self.matched_icd10_codes],
+            "cpt4_codes": [{"code": code['code'], "procedure": code['procedure']} for code in self.matched_cpt4_codes]
+        }
+
+    def claim_content_hash(self, record):
+        """Hash the claim content so unchanged claims can reuse the file already rendered"""
+        payload = json.dumps({"record": record, "form_template": self.form_template}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def render_cms1500_pdf(self):
+        """Render the CMS-1500 claim form in memory and return the PDF bytes."""
+        record = self.build_claim_record()
+        content_hash = self.claim_content_hash(record)
+        cached = bool(self.last_claim_pdf and self.last_claim_pdf[0] == content_hash)
+        record_cache("claim_pdf", cached)
+        if cached:
+            return self.last_claim_pdf[1]
+
+        layout = "template" if self.form_template else "dynamic"
+        with self.timed("claim render"), PDF_RENDER_LATENCY.time(layout=layout):
+            pdf_builder = self.pdf_builder_factory(None)
+            if self.form_template:
+                pdf_builder.draw_cms1500_template(record)
+            else:
+                pdf_builder.draw_cms1500(record)
+            pdf_builder.save()
+        PDF_RENDERS.inc(layout=layout)
+        self.last_claim_pdf = (content_hash, pdf_builder.getvalue())
+        return self.last_claim_pdf[1]
+
+    def cms1500_pdf_stream(self):
+        """Return the rendered claim as a file-like stream, e.g. for an HTTP response."""
+        return io.BytesIO(self.render_cms1500_pdf())
+
+    def export_claim_record(self, path=None):
+        """Append the claim record to a JSONL file, the input of the X12 837P exporter"""
+        path = path or self.claim_export_path
+        self.check_cancelled()
+        record = self.build_claim_record()
+        record["claim_id"] = self.claim_content_hash(record)[:20]
+        annotate(claim_id=record["claim_id"])
+        record["exported_at"] = datetime.now().isoformat()
+        with open(path, 'a', encoding='utf-8') as file:
+            write_claims_jsonl([record], file)
+        return record["claim_id"]
+
+    @traced("generate claim pdf")
+    def generate_cms1500_pdf(self, filename=None):
+        """Generate a CMS-1500 claim form as PDF with dynamic layout and write it to disk."""
+        if not filename:
+            patient_name = self.patient_info.get('name', 'Unknown').replace(' ', '_')
+            filename = f"claim_{patient_name}.pdf"
+
+        self.check_cancelled()
+        pdf_bytes = self.render_cms1500_pdf()
+        content_hash = self.last_claim_pdf[0]
+        annotate(claim_id=content_hash[:20], filename=filename)
+        unchanged = self.last_claim_render == (content_hash, filename) and os.path.exists(filename)
+        record_cache("claim_file", unchanged)
+        if unchanged:
+            return filename
+
+        # Disk is only one sink for the in-memory render
+        with self.timed("claim write"), open(filename, 'wb') as file:
+            file.write(pdf_bytes)
+        self.last_claim_render = (content_hash, filename)
         return filename
     
     def handle_default_conversation(self, user_input):
@@ -620,23 +935,19 @@ class MedicalCodingAgent:
             if user_input.strip() in ["1", "guided", "step by step"]:
                 self.current_state = "collecting_patient_info"
                 prompt = "First, I need the essential patient information:\n- Full name\n- Date of birth\n- Gender\n- Insurance provider\n- Insurance ID/policy number\n\nPlease provide as many of these details as you have available."
-                self.add_to_history("assistant", prompt)
-                print("Assistant:", prompt)
+                self.say(prompt)
             elif user_input.strip() in ["2", "summary", "all at once"]:
                 self.summary_mode = True
                 self.current_state = "collecting_summary"
                 prompt = "Please provide all the information at once, including:\n1. Patient Information (name, DOB, gender, insurance details)\n2. Clinical Notes (diagnoses and procedures)\n3. Any additional information (service dates, place of service, etc.)"
-                self.add_to_history("assistant", prompt)
-                print("Assistant:", prompt)
+                self.say(prompt)
             elif user_input.strip() in ["3", "upload", "document", "pdf", "jpg", "jpeg"]:
                 self.current_state = "processing_document"
                 prompt = "Please provide the path to your PDF or JPG document. I'll extract the information and ask for any missing essential details."
-                self.add_to_history("assistant", prompt)
-                print("Assistant:", prompt)
+                self.say(prompt)
             else:
                 response = "Please choose either option 1 (guided mode), 2 (summary mode), or 3 (upload document)."
-                self.add_to_history("assistant", response)
-                print("Assistant:", response)
+                self.say(response)
         else:
             system_prompt = """
             You are an AI medical coding assistant that helps healthcare providers accurately code diagnoses with ICD-10 codes, procedures with CPT-4 codes, and generate insurance claim forms.
@@ -659,58 +970,55 @@ class MedicalCodingAgent:
         # Map user input to actions
         choice = user_input.strip().lower()
         if choice in ["1", "start", "new patient", "new case"]:
-            self.patient_info = {}
-            self.diagnoses = []
-            self.procedures = []
-            self.matched_icd10_codes = []
-            self.matched_cpt4_codes = []
+            self.reset_case()
             self.current_state = "collecting_patient_info"
             prompt = "Let's start a new patient case. Please provide the essential patient information: Full name, Date of birth, Gender, Insurance provider, Insurance ID/policy number."
-            self.add_to_history("assistant", prompt)
-            print("Assistant:", prompt)
+            self.say(prompt)
         elif choice in ["2", "add", "modify", "diagnoses", "procedures"]:
             self.current_state = "collecting_clinical_notes"
             prompt = "Please provide the updated diagnoses or procedures."
-            self.add_to_history("assistant", prompt)
-            print("Assistant:", prompt)
+            self.say(prompt)
         elif choice in ["3", "review", "lookup", "look up", "codes", "icd-10", "cpt-4", "meaning", "meanings"]:
             self.current_state = "code_lookup"
-            prompt = "Please enter the ICD-10 or CPT-4 code(s) you want to look up (separated by commas if multiple)."
-            self.add_to_history("assistant", prompt)
-            print("Assistant:", prompt)
+            prompt = "Please enter the ICD-10 or CPT-4 code(s) you want to look up (separated by commas if multiple). The start of a code or description works too, as do ranges like 99202-99215 and families like E11*."
+            self.say(prompt)
         elif choice in ["4", "learn", "about", "medical coding"]:
             self.current_state = "learning"
             prompt = "What would you like to learn about medical coding? (ICD-10, CPT-4, claim forms, etc.)"
-            self.add_to_history("assistant", prompt)
-            print("Assistant:", prompt)
+            self.say(prompt)
         else:
             prompt = "Please choose a valid option from the menu (1-4)."
-            self.add_to_history("assistant", prompt)
-            print("Assistant:", prompt)
+            self.say(prompt)
 
+    @pins_catalog
     def code_lookup(self, user_input):
         """Look up ICD-10 or CPT-4 code meanings and helpful info"""
         codes = [code.strip().upper() for code in user_input.split(",") if code.strip()]
         results = []
         for code in codes:
-            found = False
-            for entry in self.icd10_data:
-                if entry["code"].upper() == code:
-                    # Clean, professional output
-                    results.append(f"ICD-10 {code}: {entry['disease']}\n  Category: {entry['category']}")
-                    found = True
-                    break
-            if not found:
-                for entry in self.cpt4_data:
-                    if entry["code"].upper() == code:
-                        results.append(f"CPT-4 {code}: {entry['procedure']}")
-                        found = True
-                        break
-            if not found:
-                results.append(f"Code {code} not found in ICD-10 or CPT-4 database.")
+            key = normalize_code(code)
+            range_match = CODE_RANGE.match(code)
+            family_match = CODE_FAMILY.match(code)
+            if range_match:
+                results.append(self.describe_code_set(code, range_match.group(1), range_match.group(2)))
+            elif family_match:
+                results.append(self.describe_code_set(code, family_match.group(1)))
+            elif key in self.code_scanner.icd10_by_code:
+                entry = self.code_scanner.icd10_by_code[key]
+                # Clean, professional output
+                results.append(f"ICD-10 {code}: {entry['disease']}\n  Category: {entry['category']}")
+            elif key in self.code_scanner.cpt4_by_code:
+                results.append(f"CPT-4 {code}: {self.code_scanner.cpt4_by_code[key]['procedure']}")
+            else:
+                # Partial codes and descriptions get the closest prefix matches instead
+                suggestions = self.suggest_codes(code, limit=8)
+                if suggestions:
+                    lines = [f"  {entry['system']} {entry['code']}: {entry['description']}" for entry in suggestions]
+                    results.append(f"No exact match for {code}. Codes starting with it:\n" + "\n".join(lines))
+                else:
+                    results.append(f"Code {code} not found in ICD-10 or CPT-4 database.")
         response = "\n\n".join(results)
-        self.add_to_history("assistant", response)
-        print("Assistant:", response)
+        self.say(response)
         # After lookup, return to the post-claim menu
         menu = (
             "What would you like to do next?\n"
@@ -719,10 +1027,32 @@ class MedicalCodingAgent:
             "3. Look up ICD-10 or CPT-4 code meanings\n"
             "4. Learn about medical coding"
         )
-        self.add_to_history("assistant", menu)
-        print("Assistant:", menu)
+        self.say(menu)
         self.current_state = "post_claim_menu"
 
+    def describe_code_set(self, label, low, high=None, limit=CODE_SET_DISPLAY_LIMIT):
+        """List the codes of both catalogs in the range low-high, or in the family starting with low"""
+        lines = []
+        total = 0
+        for system, index, field in (("ICD-10", self.catalog.icd10_code_index, "disease"),
+                                     ("CPT-4", self.catalog.cpt4_code_index, "procedure")):
+            for entries, start, stop in index.range_spans(low, high) if high else index.prefix_spans(low):
+                total += max(0, stop - start)
+                # Only the rows shown are sliced, so a huge range costs no more than a small one
+                for entry in entries[start:min(stop, start + limit - len(lines))]:
+                    lines.append(f"  {system} {entry['code']}: {entry[field]}")
+        if not total:
+            return f"No codes found in {label}."
+        header = f"{label}: {total} code(s)"
+        if total > len(lines):
+            header += f", showing the first {len(lines)}"
+        return header + "\n" + "\n".join(lines)
+
+    def suggest_codes(self, text, limit=10):
+        """Typeahead suggestions for a partial code or description"""
+        return self.catalog.typeahead().suggest(text, limit)
+
+    @traced("process document")
     def process_document(self, file_path):
         """Process PDF or JPG document to extract text"""
         try:
@@ -732,22 +1062,32 @@ class MedicalCodingAgent:
 
             # Get file extension
             _, ext = os.path.splitext(file_path.lower())
+            annotate(document=os.path.basename(file_path))
             
             # Process based on file type
             if ext == '.pdf':
                 try:
+                    from pdf2image import convert_from_path
+
                     # Convert PDF to images with Poppler path
-                    images = convert_from_path(file_path, poppler_path=self.poppler_path)
-                    text = ""
-                    for image in images:
-                        # Extract text from each page
-                        text += pytesseract.image_to_string(image) + "\n"
+                    with self.timed("pdf to images"):
+                        images = convert_from_path(file_path, poppler_path=self.poppler_path)
+                    # Extract text from each page
+                    started = time.perf_counter()
+                    with self.timed("ocr"):
+                        pages = self.get_ocr_engine().recognize_pages(images)
+                    record_ocr(len(pages), time.perf_counter() - started)
                 except Exception as e:
                     return f"Error processing PDF: {str(e)}. Please ensure Poppler is installed and the path is correct."
             elif ext in ['.jpg', '.jpeg', '.png']:
+                from PIL import Image
+
                 # Process image directly
                 image = Image.open(file_path)
-                text = pytesseract.image_to_string(image)
+                started = time.perf_counter()
+                with self.timed("ocr"):
+                    pages = self.get_ocr_engine().recognize_pages([image])
+                record_ocr(1, time.perf_counter() - started)
             else:
                 return "Error: Unsupported file format. Please provide a PDF or JPG/JPEG/PNG file."
 
@@ -769,23 +1109,35 @@ class MedicalCodingAgent:
                - Provider information
             
             Format your response as JSON with two main sections: patient_info and clinical_info.
+            The text may be only one part of a longer document; leave out anything not present in it.
             """
             
+            text = "\n".join(pages)
+            self.document_text = text
+
             # Add the extracted text to the conversation
             self.add_to_history("system", f"Extracted text from document:\n{text}")
             
-            # Get structured information using GPT
-            response = self.generate_llm_response(system_prompt)
+            # Literal codes on superbills are confirmed straight from the OCR text
+            literal_codes_found = self.format_literal_codes(*self.confirm_literal_codes(text))
+            
+            # Intake forms usually label demographics; skip the LLM when the rules find all of them
+            pre_extracted = self.pre_extract_patient_info(text)
+            if self.has_essential_info():
+                extracted_info = {
+                    "patient_info": pre_extracted,
+                    "clinical_info": self.demographics_extractor.extract_clinical(text)
+                }
+            else:
+                # Get structured information using GPT, one chunk per page/section in parallel
+                self.check_cancelled()
+                with self.timed("document extraction"):
+                    extracted_info = self.document_extractor.extract(pages, system_prompt)
+            response = json.dumps(extracted_info, indent=2)
+            self.say(response)
             
             try:
-                # Find JSON in the response
-                json_pattern = r'\{.*\}'
-                json_match = re.search(json_pattern, response, re.DOTALL)
-                
-                if json_match:
-                    json_str = json_match.group(0)
-                    extracted_info = json.loads(json_str)
-                    
+                if extracted_info:
                     # Update patient info
                     if 'patient_info' in extracted_info:
                         # Map alternative keys to standard keys
@@ -797,7 +1149,7 @@ class MedicalCodingAgent:
                         }
                         for key, value in extracted_info['patient_info'].items():
                             std_key = key_map.get(key, key)
-                            if value not in [None, "", "null"]:
+                            if value not in [None, "", "null"] and std_key not in pre_extracted:
                                 self.patient_info[std_key] = value
                     
                     # Process clinical information
@@ -822,17 +1174,15 @@ class MedicalCodingAgent:
                     if missing_fields:
                         # Ask for missing information
                         fields_str = ", ".join(missing_fields)
-                        response = f"I've extracted information from your document, but I still need the following essential details: {fields_str}. Please provide these missing pieces of information."
+                        response = f"{literal_codes_found}I've extracted information from your document, but I still need the following essential details: {fields_str}. Please provide these missing pieces of information."
                         self.current_state = "collecting_patient_info"
-                        self.add_to_history("assistant", response)
-                        print("Assistant:", response)
+                        self.say(response)
                         return response
                     else:
                         # Move to processing diagnoses and procedures
-                        response = "I've extracted the information from your document. Now, I'll process the diagnoses and procedures to find the appropriate codes."
+                        response = f"{literal_codes_found}I've extracted the information from your document. Now, I'll process the diagnoses and procedures to find the appropriate codes."
                         self.current_state = "collecting_clinical_notes"
-                        self.add_to_history("assistant", response)
-                        print("Assistant:", response)
+                        self.say(response)
                         return response
                 
             except Exception as e:
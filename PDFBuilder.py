@@ -1,19 +1,166 @@
+import io
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import Table, TableStyle
 from datetime import datetime
+from metrics import record_cache
+
+CLAIM_TITLE = "CMS-1500 HEALTH INSURANCE CLAIM FORM EXAMPLE"
+FOOTER_TEXT = "This is a computer-generated form created by AI Medical Coding Assistant."
+
+# Built once and shared by every table instead of per draw_table call
+TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('PADDING', (0, 0), (-1, -1), 6),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+class ClaimFormTemplate:
+    """Fixed-geometry CMS-1500 layout: the static skeleton and the value slots are computed once per page size."""
+    TEMPLATE_NAME = "cms1500_skeleton"
+    MARGIN = 0.6 * inch
+    ROW_HEIGHT = 0.22 * inch
+    HEADER_HEIGHT = 0.28 * inch
+    SECTION_GAP = 0.12 * inch
+    LABEL_WIDTH = 1.5 * inch
+    FONT_SIZE = 9
+    PADDING = 6
+
+    # (section header, slot name, fixed row labels or number of free rows)
+    SECTIONS = [
+        ("PATIENT INFORMATION", "patient", ["Name:", "DOB:", "Gender:", "Address:", "Phone:"]),
+        ("INSURANCE INFORMATION", "insurance", ["Provider:", "Policy #:", "Group #:"]),
+        ("CLINICAL INFORMATION", "clinical", 4),
+        ("DIAGNOSIS CODES (ICD-10)", "diagnoses", 12),  # Box 21 holds diagnoses A-L
+        ("PROCEDURE CODES (CPT-4)", "procedures", 6),   # Box 24 holds six service lines
+    ]
+
+    _layouts = {}
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.ops = []    # static drawing operations for the form XObject
+        self.slots = {}  # slot name -> list of rows, each a list of (x, y, max_width) cells
+        self.build()
+
+    @classmethod
+    def for_page(cls, width, height):
+        """Return the cached layout for a page size, building it on first use."""
+        key = (width, height)
+        record_cache("form_skeleton", key in cls._layouts)
+        if key not in cls._layouts:
+            cls._layouts[key] = cls(width, height)
+        return cls._layouts[key]
+
+    def capacity(self, slot):
+        return len(self.slots[slot])
+
+    def fits(self, record):
+        """Check whether the claim fits the fixed number of rows in every section."""
+        return (len(record.get('clinical_info') or {}) <= self.capacity("clinical")
+                and len(record.get('icd10_codes') or []) <= self.capacity("diagnoses")
+                and len(record.get('cpt4_codes') or []) <= self.capacity("procedures"))
+
+    def build(self):
+        table_width = self.width - 2 * self.MARGIN
+        value_width = table_width - self.LABEL_WIDTH
+        text_offset = (self.ROW_HEIGHT - self.FONT_SIZE * 0.7) / 2
+        y = self.height - self.MARGIN
+
+        title_width = stringWidth(CLAIM_TITLE, "Helvetica-Bold", 14)
+        self.ops.append(("text", "Helvetica-Bold", 14, colors.black, (self.width - title_width) / 2, y - 14, CLAIM_TITLE))
+        y -= 0.4 * inch
+
+        for header, slot, rows in self.SECTIONS:
+            self.ops.append(("rect", colors.lightgrey, self.MARGIN, y - self.HEADER_HEIGHT, table_width, self.HEADER_HEIGHT))
+            self.ops.append(("text", "Helvetica-Bold", 11, colors.black, self.MARGIN + 0.1 * inch, y - self.HEADER_HEIGHT + 0.08 * inch, header))
+            y -= self.HEADER_HEIGHT + 0.04 * inch
+
+            is_code_table = slot in ["diagnoses", "procedures"]
+            row_count = len(rows) if isinstance(rows, list) else rows
+            table_top = y
+            if is_code_table:
+                # Grey column header row, like the dynamic tables
+                self.ops.append(("rect", colors.lightgrey, self.MARGIN, y - self.ROW_HEIGHT, table_width, self.ROW_HEIGHT))
+                self.ops.append(("text", "Helvetica-Bold", self.FONT_SIZE, colors.black, self.MARGIN + self.PADDING, y - self.ROW_HEIGHT + text_offset, "Code"))
+                self.ops.append(("text", "Helvetica-Bold", self.FONT_SIZE, colors.black, self.MARGIN + self.LABEL_WIDTH + self.PADDING, y - self.ROW_HEIGHT + text_offset, "Description"))
+                y -= self.ROW_HEIGHT
+
+            cells = []
+            for i in range(row_count):
+                baseline = y - self.ROW_HEIGHT + text_offset
+                label_cell = (self.MARGIN + self.PADDING, baseline, self.LABEL_WIDTH - 2 * self.PADDING)
+                value_cell = (self.MARGIN + self.LABEL_WIDTH + self.PADDING, baseline, value_width - 2 * self.PADDING)
+                if isinstance(rows, list):
+                    self.ops.append(("text", "Helvetica-Bold", self.FONT_SIZE, colors.black, label_cell[0], baseline, rows[i]))
+                    cells.append([value_cell])
+                else:
+                    cells.append([label_cell, value_cell])
+                y -= self.ROW_HEIGHT
+            self.slots[slot] = cells
+
+            # Grid: outer box, row separators and the label/value divider
+            self.ops.append(("grid", self.MARGIN, y, table_width, table_top - y, table_top, self.ROW_HEIGHT, self.LABEL_WIDTH))
+            y -= self.SECTION_GAP
+
+        self.footer_y = max(y - 0.1 * inch, self.MARGIN)
+        self.ops.append(("text", "Helvetica", 8, colors.grey, self.MARGIN, self.footer_y, FOOTER_TEXT))
+
+    def define_form(self, pdf_canvas):
+        """Register the skeleton as a form XObject in the canvas's document, with public drawing calls only."""
+        pdf_canvas.beginForm(self.TEMPLATE_NAME)
+        self.draw_skeleton(pdf_canvas)
+        pdf_canvas.endForm()
+
+    def draw_skeleton(self, pdf_canvas):
+        """Replay the static operations; called once per document inside a form XObject."""
+        for op in self.ops:
+            if op[0] == "text":
+                _, font, size, color, x, y, text = op
+                pdf_canvas.setFont(font, size)
+                pdf_canvas.setFillColor(color)
+                pdf_canvas.drawString(x, y, text)
+            elif op[0] == "rect":
+                _, color, x, y, w, h = op
+                pdf_canvas.setFillColor(color)
+                pdf_canvas.rect(x, y, w, h, stroke=0, fill=1)
+            elif op[0] == "grid":
+                _, x, y, w, h, top, row_height, divider = op
+                pdf_canvas.setStrokeColor(colors.grey)
+                pdf_canvas.setLineWidth(0.5)
+                pdf_canvas.rect(x, y, w, h, stroke=1, fill=0)
+                row_y = top - row_height
+                while row_y > y + 0.01:
+                    pdf_canvas.line(x, row_y, x + w, row_y)
+                    row_y -= row_height
+                pdf_canvas.line(x + divider, y, x + divider, top)
 
 class PDFBuilder:
-    def __init__(self, filename):
+    def __init__(self, filename=None):
+        """Render to a file path, to a writable file-like object, or to an in-memory buffer when filename is None."""
         self.filename = filename
-        self.canvas = canvas.Canvas(filename, pagesize=letter)
+        self.buffer = io.BytesIO() if filename is None else None
+        self.canvas = canvas.Canvas(filename if filename is not None else self.buffer, pagesize=letter)
         self.width, self.height = letter
         self.margin = inch
         self.y_position = self.height - self.margin
         self.min_y = self.margin
         self.section_gap = 0.25 * inch
+        self.template_defined = False
+
+    def new_page(self):
+        """Finish the current page and start the next claim at the top of a fresh one."""
+        self.canvas.showPage()
+        self.y_position = self.height - self.margin
 
     def check_page_space(self, needed_height):
         """Check if there is enough space on the current page, otherwise create a new page."""
@@ -34,30 +181,141 @@ class PDFBuilder:
     def draw_table(self, data, col_widths):
         """Draw a table."""
         table = Table(data, colWidths=col_widths)
-        table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('PADDING', (0, 0), (-1, -1), 6),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
+        table.setStyle(TABLE_STYLE)
         w, h = table.wrap(self.width - 2 * self.margin, self.y_position)
         self.y_position = self.check_page_space(h)
         table.drawOn(self.canvas, self.margin, self.y_position - h)
         self.y_position -= h + self.section_gap
 
+    def draw_cms1500(self, record):
+        """Draw a claim with the dynamic layout (tables sized to their content)."""
+        patient_info = record.get('patient_info') or {}
+        clinical_info = record.get('clinical_info') or {}
+
+        # Title
+        self.canvas.setFont("Helvetica-Bold", 16)
+        self.canvas.setFillColor(colors.black)
+        title_width = self.canvas.stringWidth(CLAIM_TITLE, "Helvetica-Bold", 16)
+        self.canvas.drawString((self.width - title_width) / 2, self.y_position, CLAIM_TITLE)
+        self.y_position -= 0.5 * inch
+
+        # Patient Info
+        self.draw_section_header("PATIENT INFORMATION")
+        patient_data = [
+            ["Name:", patient_info.get('name', 'N/A')],
+            ["DOB:", patient_info.get('dob', 'N/A')],
+            ["Gender:", patient_info.get('gender', 'N/A')],
+            ["Address:", patient_info.get('address', 'N/A')],
+            ["Phone:", patient_info.get('phone', 'N/A')]
+        ]
+        self.draw_table(patient_data, col_widths=[1.5 * inch, 4.5 * inch])
+
+        # Insurance Info
+        self.draw_section_header("INSURANCE INFORMATION")
+        insurance_data = [
+            ["Provider:", patient_info.get('insurance', 'N/A')],
+            ["Policy #:", patient_info.get('policy', 'N/A')],
+            ["Group #:", patient_info.get('group', 'N/A')]
+        ]
+        self.draw_table(insurance_data, col_widths=[1.5 * inch, 4.5 * inch])
+
+        # Clinical Info
+        if clinical_info:
+            self.draw_section_header("CLINICAL INFORMATION")
+            clinical_data = [[f"{key.replace('_', ' ').capitalize()}:", str(value)] for key, value in clinical_info.items()]
+            self.draw_table(clinical_data, col_widths=[1.5 * inch, 4.5 * inch])
+
+        # Diagnoses
+        if record.get('icd10_codes'):
+            self.draw_section_header("DIAGNOSIS CODES (ICD-10)")
+            diagnosis_data = [["Code", "Description"]] + [[code['code'], code['disease']] for code in record['icd10_codes']]
+            self.draw_table(diagnosis_data, col_widths=[1.5 * inch, 4.5 * inch])
+
+        # Procedures
+        if record.get('cpt4_codes'):
+            self.draw_section_header("PROCEDURE CODES (CPT-4)")
+            procedure_data = [["Code", "Description"]] + [[code['code'], code['procedure']] for code in record['cpt4_codes']]
+            self.draw_table(procedure_data, col_widths=[1.5 * inch, 4.5 * inch])
+
+        # Footer
+        self.add_footer()
+
+    def draw_cms1500_template(self, record):
+        """
+        Draw a claim over the cached form skeleton, drawing only the field values.
+
+        The skeleton is registered once per document as a form XObject and reused by every page.
+        Claims with more rows than the fixed form has fall back to the dynamic layout.
+        """
+        template = ClaimFormTemplate.for_page(self.width, self.height)
+        if not template.fits(record):
+            return self.draw_cms1500(record)
+
+        if not self.template_defined:
+            template.define_form(self.canvas)
+            self.template_defined = True
+        self.canvas.doForm(ClaimFormTemplate.TEMPLATE_NAME)
+
+        patient_info = record.get('patient_info') or {}
+        clinical_info = record.get('clinical_info') or {}
+
+        # All values go into one text object instead of one per drawString
+        text = self.canvas.beginText()
+        text.setFont("Helvetica", ClaimFormTemplate.FONT_SIZE)
+        text.setFillColor(colors.black)
+        for cells, key in zip(template.slots["patient"], ['name', 'dob', 'gender', 'address', 'phone']):
+            self.draw_value(text, cells[0], patient_info.get(key, 'N/A'))
+        for cells, key in zip(template.slots["insurance"], ['insurance', 'policy', 'group']):
+            self.draw_value(text, cells[0], patient_info.get(key, 'N/A'))
+        for cells, (key, value) in zip(template.slots["clinical"], clinical_info.items()):
+            self.draw_value(text, cells[0], f"{key.replace('_', ' ').capitalize()}:")
+            self.draw_value(text, cells[1], value)
+        for cells, code in zip(template.slots["diagnoses"], record.get('icd10_codes') or []):
+            self.draw_value(text, cells[0], code['code'])
+            self.draw_value(text, cells[1], code['disease'])
+        for cells, code in zip(template.slots["procedures"], record.get('cpt4_codes') or []):
+            self.draw_value(text, cells[0], code['code'])
+            self.draw_value(text, cells[1], code['procedure'])
+
+        text.setFont("Helvetica", 8)
+        text.setFillColor(colors.grey)
+        text.setTextOrigin(ClaimFormTemplate.MARGIN, template.footer_y - 0.2 * inch)
+        text.textOut(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self.canvas.drawText(text)
+
+    def draw_value(self, text_object, cell, value):
+        """Add a field value to the text object at a fixed cell, truncating it to the cell width."""
+        x, y, max_width = cell
+        text = str(value)
+        font_size = ClaimFormTemplate.FONT_SIZE
+        if stringWidth(text, "Helvetica", font_size) > max_width:
+            # Binary search for the longest prefix that fits with an ellipsis
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if stringWidth(text[:middle] + "...", "Helvetica", font_size) <= max_width:
+                    low = middle
+                else:
+                    high = middle - 1
+            text = text[:low] + "..."
+        text_object.setTextOrigin(x, y)
+        text_object.textOut(text)
+
     def add_footer(self):
         """Add a footer to the PDF."""
         self.y_position = max(self.y_position, self.min_y + 0.5 * inch)
         self.canvas.setFont("Helvetica", 8)
         self.canvas.setFillColor(colors.grey)
-        self.canvas.drawString(self.margin, self.y_position, "This is a computer-generated form created by AI Medical Coding Assistant.")
+        self.canvas.drawString(self.margin, self.y_position, FOOTER_TEXT)
         self.y_position -= 0.2 * inch
         self.canvas.drawString(self.margin, self.y_position, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     def save(self):
         """Save the PDF."""
-        self.canvas.save()
\ No newline at end of file
+        self.canvas.save()
+
+    def getvalue(self):
+        """Return the rendered PDF bytes of an in-memory builder (after save)."""
+        if self.buffer is None:
+            raise ValueError("PDFBuilder was created with a file target; read the file instead")
+        return self.buffer.getvalue()
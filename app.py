@@ -1,17 +1,36 @@
+from startup_profile import StartupProfiler
+import sys
+# Installed before any other import, so Tk, the agent modules and the LLM SDKs are all in the ranking
+STARTUP_PROFILER = StartupProfiler().install() if "--profile-startup" in sys.argv[1:] else None
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox
 from tkinter import ttk
 import threading
-import sys
+import queue
+import argparse
 import os
 import re
-from Agent import MedicalCodingAgent
+from collections import deque
+from main import (add_llm_argument, add_profile_startup_argument, add_profile_arguments, add_metrics_arguments,
+                  add_trace_argument, create_agent, create_profiler, create_tracer, export_trace, report_profile,
+                  start_metrics)
 from PIL import Image, ImageTk
 import time
 import subprocess
 import platform
+EXIT_WORDS = ["exit", "quit", "bye"]
+CLAIM_WORDS = ["generate", "create", "show", "view", "preview"]
+# The transcript keeps every message, but only a window of them is rendered in the text widget;
+# older or newer messages are paged in a page at a time when the view is scrolled to an edge
+TRANSCRIPT_WINDOW = 200
+TRANSCRIPT_PAGE = 50
+# Live code suggestions: any text while looking codes up, code-shaped words while writing notes
+SUGGESTION_STATES = ["code_lookup", "collecting_clinical_notes"]
+CODE_LIKE = re.compile(r"^(?:[A-Z][0-9]|[0-9]{3})", re.IGNORECASE)
+SUGGESTION_LIMIT = 8
+
 class MediSuiteGUI:
-    def __init__(self, root):
+    def __init__(self, root, llm_name="mistral", profiler=None, turn_profiler=None, cprofile_path=None, tracer=None):
         self.root = root
         self.root.title("MediSuite - Medical Coding Assistant")
         self.root.geometry("1100x750")  # Increased window size
@@ -25,11 +44,20 @@ class MediSuiteGUI:
         except:
             pass
             
-        self.agent = MedicalCodingAgent()
-        self.agent_output_lock = threading.Lock()
-        self.conversation_thread = None
-        self.user_input_ready = threading.Event()
-        self.user_input_value = ""
+        # Agent work runs on worker threads; they only post (kind, turn, payload) events to this
+        # queue, which the Tk main loop drains with after() so widgets are touched on one thread
+        self.events = queue.Queue()
+        self.poll_interval_ms = 50
+        self.agent_lock = threading.Lock()  # One turn at a time against the agent
+        self.turn_id = 0
+        self.running_turn = None
+        self.running_cancel = None  # threading.Event of the running turn
+        self.cancelled_turns = set()
+        self.busy = False
+        self.agent = create_agent(llm_name, message_handler=self.post_message, profiler=turn_profiler, tracer=tracer)
+        self.cprofile_path = cprofile_path
+        if profiler:
+            profiler.mark("agent")
         self.agent.current_state = "greeting"
         self.upload_enabled = False  # Track if upload is enabled
         self.pdf_preview_window = None  # For PDF preview window
@@ -42,10 +70,15 @@ class MediSuiteGUI:
         
         # Start with greeting
         self.start_greeting()
+        if profiler:
+            profiler.mark("widgets and greeting")
         
         # Apply animations
         self.animate_startup()
 
+        # Start draining agent events
+        self.root.after(self.poll_interval_ms, self.poll_events)
+
     def load_images(self):
         # Create placeholder images if actual images aren't available
         self.send_icon = self.create_circle_image("#10b981", 20, "➤")
@@ -219,6 +252,21 @@ class MediSuiteGUI:
         # Custom scrollbar styling
         self.history.vbar.configure(troughcolor="#f1f5f9", background="#94a3b8", activebackground="#64748b", width=12)
 
+        # Configure tags for styling once; every message reuses them
+        self.history.tag_config('spacing', spacing1=5)
+        self.history.tag_config('user_prefix', foreground='#2563eb', font=('Segoe UI', 11, 'bold'))
+        self.history.tag_config('user_message', foreground='#1e293b', font=('Segoe UI', 11))
+        self.history.tag_config('assistant_prefix', foreground='#10b981', font=('Segoe UI', 11, 'bold'))
+        self.history.tag_config('assistant_message', foreground='#1e293b', font=('Segoe UI', 11))
+
+        # All messages, and the rendered window over them: transcript[rendered_start:rendered_start + len(rendered_lines)]
+        self.transcript = []
+        self.rendered_start = 0
+        self.rendered_lines = deque()  # Text lines taken by each rendered message
+        self.rendered_line_count = 0
+        self.paging = False
+        self.history.configure(yscrollcommand=self.on_history_scroll)
+
     def create_input_area(self):
         # Input container with shadow effect
         input_frame = tk.Frame(self.main_container, bg="#ffffff", bd=0, highlightthickness=1, highlightbackground="#e2e8f0")
@@ -250,6 +298,31 @@ class MediSuiteGUI:
         # Add focus/unfocus events for placeholder
         self.input_entry.bind("<FocusIn>", self.on_entry_focus_in)
         self.input_entry.bind("<FocusOut>", self.on_entry_focus_out)
+
+        # Code suggestions, shown under the input box while a code or description is being typed
+        self.input_frame = input_frame
+        self.suggestions = []
+        self.suggestion_prefix = ""
+        self.suggestion_list = tk.Listbox(
+            self.main_container,
+            height=SUGGESTION_LIMIT,
+            font=('Segoe UI', 10),
+            bg="#ffffff",
+            fg="#1e293b",
+            relief=tk.FLAT,
+            highlightthickness=1,
+            highlightbackground="#e2e8f0",
+            selectbackground="#dbeafe",
+            selectforeground="#1e293b",
+            activestyle="none"
+        )
+        self.input_entry.bind("<KeyRelease>", self.update_suggestions)
+        self.input_entry.bind("<Tab>", self.accept_suggestion)
+        self.input_entry.bind("<Down>", self.focus_suggestions)
+        self.input_entry.bind("<Escape>", self.hide_suggestions)
+        self.suggestion_list.bind("<Return>", self.accept_suggestion)
+        self.suggestion_list.bind("<Double-Button-1>", self.accept_suggestion)
+        self.suggestion_list.bind("<Escape>", self.hide_suggestions)
         
         # Button container
         button_container = tk.Frame(input_container, bg="#ffffff")
@@ -310,6 +383,38 @@ class MediSuiteGUI:
             fg="#64748b"
         )
         self.status_text.pack(side=tk.LEFT)
+
+        # Busy indicator and cancel button, shown while the agent is working
+        self.progress = ttk.Progressbar(status_frame, mode="indeterminate", length=120)
+        self.cancel_btn = tk.Button(
+            status_frame,
+            text="Cancel",
+            font=('Segoe UI', 9, 'bold'),
+            bg="#ef4444",
+            fg="white",
+            activebackground="#dc2626",
+            activeforeground="white",
+            relief=tk.FLAT,
+            bd=0,
+            padx=8,
+            cursor="hand2",
+            command=self.cancel_turn
+        )
+
+        # Profiling toggle: times each turn's stages; the summary is shown when switched off
+        self.profile_var = tk.BooleanVar(value=self.agent.profiler is not None)
+        profile_toggle = tk.Checkbutton(
+            status_frame,
+            text="Profile",
+            variable=self.profile_var,
+            command=self.toggle_profiling,
+            font=('Segoe UI', 9),
+            bg="#f0f4f8",
+            fg="#64748b",
+            activebackground="#f0f4f8",
+            highlightthickness=0
+        )
+        profile_toggle.pack(side=tk.RIGHT, padx=(10, 0))
         
         # Version info
         version_text = tk.Label(
@@ -349,6 +454,64 @@ class MediSuiteGUI:
             self.input_entry.insert(0, "Type your message here...")
             self.input_entry.config(fg="#94a3b8")
 
+    def update_suggestions(self, event=None):
+        """Suggest codes for the word being typed; the prefix index answers on the Tk thread"""
+        if event is not None and event.keysym in ("Return", "Tab", "Down", "Up", "Escape"):
+            return
+        text = self.input_var.get()
+        state = self.agent.current_state
+        if self.busy or state not in SUGGESTION_STATES or text == "Type your message here...":
+            self.hide_suggestions()
+            return
+
+        # Code lookup takes a comma-separated list (descriptions have spaces); notes are free text
+        separator = r",\s*" if state == "code_lookup" else r"[,;\s]+"
+        token = re.split(separator, text)[-1]
+        if len(token.strip()) < 2 or (state != "code_lookup" and not CODE_LIKE.match(token)):
+            self.hide_suggestions()
+            return
+
+        # The index is built in the background on the first keystroke; suggestions start once it is ready
+        typeahead = self.agent.catalog.typeahead(wait=False)
+        self.suggestions = typeahead.suggest(token, SUGGESTION_LIMIT) if typeahead else []
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_prefix = text[:len(text) - len(token)]
+        self.suggestion_list.delete(0, tk.END)
+        for entry in self.suggestions:
+            self.suggestion_list.insert(tk.END, f"{entry['code']}   {entry['description']}   ({entry['system']})")
+        self.suggestion_list.configure(height=len(self.suggestions))
+        if not self.suggestion_list.winfo_ismapped():
+            self.suggestion_list.pack(after=self.input_frame, fill=tk.X, pady=(0, 10))
+
+    def hide_suggestions(self, event=None):
+        self.suggestions = []
+        if self.suggestion_list.winfo_ismapped():
+            self.suggestion_list.pack_forget()
+
+    def focus_suggestions(self, event=None):
+        """Move from the input box into the suggestion list (Down arrow)"""
+        if not self.suggestions:
+            return None
+        self.suggestion_list.focus_set()
+        self.suggestion_list.selection_clear(0, tk.END)
+        self.suggestion_list.selection_set(0)
+        self.suggestion_list.activate(0)
+        return "break"
+
+    def accept_suggestion(self, event=None):
+        """Replace the word being typed with the selected (or first) suggested code"""
+        if not self.suggestions:
+            return None
+        selection = self.suggestion_list.curselection()
+        entry = self.suggestions[selection[0] if selection else 0]
+        self.input_var.set(self.suggestion_prefix + entry["code"])
+        self.hide_suggestions()
+        self.input_entry.focus_set()
+        self.input_entry.icursor(tk.END)
+        return "break"
+
     def animate_startup(self):
         # Simple fade-in effect for the main container
         self.main_container.update()
@@ -375,20 +538,25 @@ class MediSuiteGUI:
             self.history.config(state=tk.NORMAL)
             self.history.delete(1.0, tk.END)
             self.history.config(state=tk.DISABLED)
+            self.transcript = []
+            self.rendered_start = 0
+            self.rendered_lines.clear()
+            self.rendered_line_count = 0
             
-            # Reset agent state
-            self.agent = MedicalCodingAgent()
+            # Drop whatever the agent is still working on; it finishes on the old agent
+            if self.busy:
+                self.cancelled_turns.add(self.turn_id)
+                self.stop_running_turn()
+                self.set_busy(False)
+
+            # Reset agent state, reusing the loaded catalogs, LLM client and OCR engine; the new case
+            # gets a new trace ID
+            old_agent = self.agent
+            self.agent = create_agent(None, llm=old_agent.llm, catalog=old_agent.catalog_source, ocr_engine=old_agent.ocr_engine,
+                                      message_handler=self.post_message, profiler=old_agent.profiler,
+                                      tracer=old_agent.tracer)
             self.agent.current_state = "greeting"
             
-            # Reset conversation thread
-            if self.conversation_thread and self.conversation_thread.is_alive():
-                self.user_input_value = "exit"
-                self.user_input_ready.set()
-                self.conversation_thread.join(0.5)  # Wait a bit for thread to exit
-                
-            self.conversation_thread = None
-            self.user_input_ready.clear()
-            
             # Reset upload enabled flag
             self.upload_enabled = False
             
@@ -405,33 +573,109 @@ class MediSuiteGUI:
         greeting = "Hello! I'm your AI medical coding assistant. I can help you code patient diagnoses and procedures, then generate insurance claims. Would you like to:\n\n1️⃣ Start with guided mode (I'll help you step by step)\n2️⃣ Use summary mode (provide all information at once)\n3️⃣ Upload a PDF/JPG document (I'll extract information from your document)"
         self.append_history("Assistant", greeting)
 
+    def message_segments(self, role, message):
+        """Text/tag pairs for one message, ready for a single Text.insert call"""
+        if role == "User":
+            return ["\n", 'spacing', "You: ", 'user_prefix', f"{message}\n", 'user_message']
+        return ["\n", 'spacing', "🤖 Assistant: ", 'assistant_prefix', f"{message}\n", 'assistant_message']
+
+    def render_messages(self, index, messages):
+        """Insert several messages at index with one widget call; returns the line count of each"""
+        segments = []
+        for role, message in messages:
+            segments.extend(self.message_segments(role, message))
+        if segments:
+            self.history.insert(index, *segments)
+        return [message.count("\n") + 2 for _, message in messages]
+
+    def rendered_end(self):
+        return self.rendered_start + len(self.rendered_lines)
+
+    def trim_top(self):
+        """Drop rendered messages from the top until the window fits; returns the lines removed"""
+        removed = 0
+        while len(self.rendered_lines) > TRANSCRIPT_WINDOW:
+            removed += self.rendered_lines.popleft()
+            self.rendered_start += 1
+        if removed:
+            self.history.delete("1.0", f"{removed + 1}.0")
+            self.rendered_line_count -= removed
+        return removed
+
+    def trim_bottom(self):
+        """Drop rendered messages from the bottom until the window fits"""
+        removed = 0
+        while len(self.rendered_lines) > TRANSCRIPT_WINDOW:
+            removed += self.rendered_lines.pop()
+        if removed:
+            self.history.delete(f"{self.rendered_line_count - removed + 1}.0", f"{self.rendered_line_count + 1}.0")
+            self.rendered_line_count -= removed
+
     def append_history(self, role, message):
+        following = self.rendered_end() == len(self.transcript)
+        self.transcript.append((role, message))
+        if not following:
+            # Scrolled back into older pages: jump to the latest messages for the new one
+            self.show_latest()
+            return
+
         self.history.config(state=tk.NORMAL)
-        
-        if role == "User":
-            # Add user message with bubble effect
-            self.history.insert(tk.END, "\n", 'spacing')
-            self.history.insert(tk.END, f"You: ", 'user_prefix')
-            self.history.insert(tk.END, f"{message}\n", 'user_message')
-        else:
-            # Add assistant message with bubble effect
-            self.history.insert(tk.END, "\n", 'spacing')
-            self.history.insert(tk.END, f"🤖 Assistant: ", 'assistant_prefix')
-            self.history.insert(tk.END, f"{message}\n", 'assistant_message')
-            
-        # Configure tags for styling
-        self.history.tag_config('spacing', spacing1=5)
-        self.history.tag_config('user_prefix', foreground='#2563eb', font=('Segoe UI', 11, 'bold'))
-        self.history.tag_config('user_message', foreground='#1e293b', font=('Segoe UI', 11))
-        self.history.tag_config('assistant_prefix', foreground='#10b981', font=('Segoe UI', 11, 'bold'))
-        self.history.tag_config('assistant_message', foreground='#1e293b', font=('Segoe UI', 11))
-        
+        lines = self.render_messages(tk.END, [(role, message)])
+        self.rendered_lines.extend(lines)
+        self.rendered_line_count += sum(lines)
+        self.trim_top()
+        self.history.see(tk.END)
+        self.history.config(state=tk.DISABLED)
+
+    def show_latest(self):
+        """Re-render the window ending at the newest message"""
+        self.history.config(state=tk.NORMAL)
+        self.history.delete("1.0", tk.END)
+        self.rendered_start = max(0, len(self.transcript) - TRANSCRIPT_WINDOW)
+        lines = self.render_messages(tk.END, self.transcript[self.rendered_start:])
+        self.rendered_lines = deque(lines)
+        self.rendered_line_count = sum(lines)
         self.history.see(tk.END)
         self.history.config(state=tk.DISABLED)
-        
-        # Simulate typing effect for assistant messages
-        if role == "Assistant":
-            self.root.update()
+
+    def on_history_scroll(self, first, last):
+        """Scrollbar callback: page messages in when the view reaches either edge of the window"""
+        self.history.vbar.set(first, last)
+        if self.paging:
+            return
+        if float(first) <= 0.0 and self.rendered_start > 0:
+            self.paging = True
+            self.root.after_idle(self.page_older)
+        elif float(last) >= 1.0 and self.rendered_end() < len(self.transcript):
+            self.paging = True
+            self.root.after_idle(self.page_newer)
+
+    def page_older(self):
+        """Render the previous page above the window, keeping the view on the same message"""
+        count = min(TRANSCRIPT_PAGE, self.rendered_start)
+        self.history.config(state=tk.NORMAL)
+        lines = self.render_messages("1.0", self.transcript[self.rendered_start - count:self.rendered_start])
+        self.rendered_start -= count
+        self.rendered_lines.extendleft(reversed(lines))
+        self.rendered_line_count += sum(lines)
+        self.trim_bottom()
+        self.history.yview(f"{sum(lines) + 1}.0")
+        self.history.config(state=tk.DISABLED)
+        self.paging = False
+
+    def page_newer(self):
+        """Render the next page below the window, keeping the view on the same message"""
+        end = self.rendered_end()
+        count = min(TRANSCRIPT_PAGE, len(self.transcript) - end)
+        first_new_line = self.rendered_line_count + 1
+        self.history.config(state=tk.NORMAL)
+        lines = self.render_messages(tk.END, self.transcript[end:end + count])
+        self.rendered_lines.extend(lines)
+        self.rendered_line_count += sum(lines)
+        removed = self.trim_top()
+        self.history.see(f"{first_new_line - removed}.0")
+        self.history.config(state=tk.DISABLED)
+        self.paging = False
 
     def on_send(self, event=None):
         user_input = self.input_var.get().strip()
@@ -443,20 +687,19 @@ class MediSuiteGUI:
             self.upload_enabled = True
             self.status_text.config(text="Upload enabled")
             
-        # Disable buttons temporarily
-        self.send_btn.config(state=tk.DISABLED)
-        
+        if self.busy:
+            self.show_toast_notification("Still working on the previous request. Cancel it or wait for it to finish.")
+            return
+
         self.append_history("User", user_input)
         self.input_var.set("")
-        self.user_input_value = user_input
-        self.user_input_ready.set()
-        
-        if not self.conversation_thread or not self.conversation_thread.is_alive():
-            self.conversation_thread = threading.Thread(target=self.conversation_loop, daemon=True)
-            self.conversation_thread.start()
-        
-        # Re-enable buttons after a short delay
-        self.root.after(500, lambda: self.send_btn.config(state=tk.NORMAL))
+        self.hide_suggestions()
+
+        if user_input.lower() in EXIT_WORDS:
+            self.append_history("Assistant", "Thank you for using the Medical Coding Assistant. Goodbye!")
+            return
+
+        self.start_turn(user_input)
 
     def on_upload(self):
         if not self.upload_enabled:
@@ -473,19 +716,12 @@ class MediSuiteGUI:
         )
         
         if file_path:
-            # Disable buttons temporarily
-            self.send_btn.config(state=tk.DISABLED)
-            
+            if self.busy:
+                self.show_toast_notification("Still working on the previous request. Cancel it or wait for it to finish.")
+                return
+
             self.append_history("User", f"[Uploaded file: {os.path.basename(file_path)}]")
-            self.user_input_value = file_path
-            self.user_input_ready.set()
-            
-            if not self.conversation_thread or not self.conversation_thread.is_alive():
-                self.conversation_thread = threading.Thread(target=self.conversation_loop, daemon=True)
-                self.conversation_thread.start()
-            
-            # Re-enable buttons after a short delay
-            self.root.after(500, lambda: self.send_btn.config(state=tk.NORMAL))
+            self.start_turn(file_path)
 
     def show_toast_notification(self, message):
         """Show a temporary toast notification"""
@@ -508,82 +744,123 @@ class MediSuiteGUI:
         # Auto-dismiss after 3 seconds
         self.root.after(3000, toast_frame.destroy)
 
-    def conversation_loop(self):
-        while True:
-            self.user_input_ready.wait()
-            user_input = self.user_input_value
-            self.user_input_ready.clear()
-            
-            if user_input.lower() in ["exit", "quit", "bye"]:
-                self.append_history("Assistant", "Thank you for using the Medical Coding Assistant. Goodbye!")
-                break
-                
-            self.agent.add_to_history("user", user_input)
+    def post_message(self, message):
+        """Agent message handler; runs on the worker thread, so it only queues the message"""
+        self.events.put(("assistant", self.running_turn, message))
+
+    def start_turn(self, user_input):
+        """Run one agent turn on a worker thread so OCR, LLM and matching never block the UI"""
+        self.turn_id += 1
+        self.set_busy(True)
+        threading.Thread(target=self.run_turn, args=(self.turn_id, user_input), daemon=True,
+                         name=f"agent-turn-{self.turn_id}").start()
+
+    def run_turn(self, turn_id, user_input):
+        """Worker thread: drive the agent and report back through the event queue only"""
+        from Agent import TurnCancelled  # Already loaded by create_agent
+        with self.agent_lock:
+            agent = self.agent
+            snapshot = agent.snapshot_case()
+            self.running_turn = turn_id
+            # Cancel stops the turn at its next irreversible step, not just its messages
+            self.running_cancel = agent.cancel_event = threading.Event()
+            if turn_id in self.cancelled_turns:
+                self.running_cancel.set()
+            previous_state = agent.current_state
             try:
-                if self.agent.current_state == "collecting_patient_info":
-                    self.collect_patient_info_gui(user_input)
-                elif self.agent.current_state == "collecting_clinical_notes":
-                    self.collect_clinical_notes_gui(user_input)
-                elif self.agent.current_state == "confirming_codes":
-                    self.confirm_codes_gui(user_input)
-                elif self.agent.current_state == "reviewing_claim":
-                    self.review_claim_gui(user_input)
-                elif self.agent.current_state == "post_claim_menu":
-                    self.handle_post_claim_menu_gui(user_input)
-                elif self.agent.current_state == "collecting_summary":
-                    self.collect_summary_gui(user_input)
-                elif self.agent.current_state == "code_lookup":
-                    self.code_lookup_gui(user_input)
-                elif self.agent.current_state == "processing_document":
-                    self.process_document_gui(user_input)
-                else:
-                    self.handle_default_conversation_gui(user_input)
+                agent.handle_input(user_input)
+            except TurnCancelled:
+                pass
             except Exception as e:
-                self.append_history("Assistant", f"Sorry, I encountered an error: {str(e)}")
-
-    # GUI wrappers for agent methods
-    def collect_patient_info_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.collect_patient_info(user_input)
-        sys.stdout = old_stdout
-
-    def collect_clinical_notes_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.collect_clinical_notes(user_input)
-        sys.stdout = old_stdout
-
-    def confirm_codes_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.confirm_codes(user_input)
-        sys.stdout = old_stdout
-
-    def review_claim_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.review_claim(user_input)
-        sys.stdout = old_stdout
-
-    def handle_post_claim_menu_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.handle_post_claim_menu(user_input)
-        
-        # Check if a PDF was generated and offer to preview it
-        if "claim" in user_input.lower() and any(word in user_input.lower() for word in ["generate", "create", "show", "view", "preview"]):
-            # Look for generated PDF files in the current directory
-            pdf_files = [f for f in os.listdir('.') if f.endswith('.pdf') and 'claim' in f.lower()]
-            if pdf_files:
-                # Sort by creation time, newest first
-                pdf_files.sort(key=lambda x: os.path.getctime(x), reverse=True)
-                newest_pdf = pdf_files[0]
-                
-                # Ask if user wants to preview the PDF
-                self.show_pdf_preview_button(newest_pdf)
-        
-        sys.stdout = old_stdout
+                self.events.put(("assistant", turn_id, f"Sorry, I encountered an error: {str(e)}"))
+            finally:
+                agent.cancel_event = None
+
+            # Offer a preview when a claim was requested from the post-claim menu
+            if previous_state == "post_claim_menu" and "claim" in user_input.lower() and \
+                    any(word in user_input.lower() for word in CLAIM_WORDS):
+                pdf_files = [f for f in os.listdir('.') if f.endswith('.pdf') and 'claim' in f.lower()]
+                if pdf_files:
+                    # Newest first
+                    pdf_files.sort(key=lambda x: os.path.getctime(x), reverse=True)
+                    self.events.put(("pdf_ready", turn_id, pdf_files[0]))
+
+            # A cancelled turn leaves the case as it was before the turn
+            if turn_id in self.cancelled_turns:
+                agent.restore_case(snapshot)
+            self.running_turn = None
+            self.running_cancel = None
+        self.events.put(("done", turn_id, None))
+
+    def poll_events(self):
+        """Drain queued agent events on the Tk main thread, then reschedule"""
+        try:
+            while True:
+                kind, turn_id, payload = self.events.get_nowait()
+                if turn_id in self.cancelled_turns:
+                    if kind == "done":
+                        self.cancelled_turns.discard(turn_id)
+                    continue
+                if kind == "assistant":
+                    self.append_history("Assistant", payload)
+                elif kind == "pdf_ready":
+                    self.show_pdf_preview_button(payload)
+                elif kind == "done" and turn_id == self.turn_id:
+                    self.set_busy(False)
+        except queue.Empty:
+            pass
+        self.root.after(self.poll_interval_ms, self.poll_events)
+
+    def set_busy(self, busy):
+        """Show or hide the busy indicator and block new requests while a turn runs"""
+        self.busy = busy
+        button_state = tk.DISABLED if busy else tk.NORMAL
+        self.send_btn.config(state=button_state)
+        self.upload_btn.config(state=button_state)
+        if busy:
+            self.status_text.config(text="Working...")
+            self.progress.pack(side=tk.LEFT, padx=10)
+            self.progress.start(15)
+            self.cancel_btn.pack(side=tk.LEFT)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+            self.cancel_btn.pack_forget()
+            self.status_text.config(text="Ready")
+
+    def toggle_profiling(self):
+        """Start timing turns, or stop and show the ranked summary in the chat"""
+        if self.profile_var.get():
+            from turn_profiler import TurnProfiler
+            self.agent.profiler = TurnProfiler()
+            self.status_text.config(text="Profiling on")
+        elif self.agent.profiler:
+            summary = self.agent.profiler.summary()
+            self.agent.profiler = None
+            self.append_history("Assistant", summary)
+            self.status_text.config(text="Profiling off")
+
+    def on_close(self):
+        """Print the profile, if one is running, and stop the OCR workers before the window closes"""
+        report_profile(self.agent.profiler, self.cprofile_path)
+        self.agent.close()
+        self.root.destroy()
+
+    def stop_running_turn(self):
+        """Signal the turn in progress, if any, to stop before its next LLM call, claim file or export"""
+        running_cancel = self.running_cancel
+        if running_cancel is not None:
+            running_cancel.set()
+
+    def cancel_turn(self):
+        """Abandon the running turn: its messages are dropped and the case is rolled back when it ends"""
+        if not self.busy:
+            return
+        self.cancelled_turns.add(self.turn_id)
+        self.stop_running_turn()
+        self.set_busy(False)
+        self.status_text.config(text="Cancelled")
+        self.append_history("Assistant", "Cancelled. You can continue where you left off.")
 
     def show_pdf_preview_button(self, pdf_path):
         """Show a button to preview the PDF"""
@@ -636,45 +913,24 @@ class MediSuiteGUI:
         except Exception as e:
             self.show_toast_notification(f"Error opening file: {str(e)}")
 
-    def collect_summary_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.collect_summary(user_input)
-        sys.stdout = old_stdout
-
-    def code_lookup_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.code_lookup(user_input)
-        sys.stdout = old_stdout
-
-    def process_document_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        self.agent.process_document(user_input)
-        sys.stdout = old_stdout
-
-    def handle_default_conversation_gui(self, user_input):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        
-        # Check for option 3 selection in default conversation handler
-        if "3" in user_input and any(keyword in user_input.lower() for keyword in ["option", "upload", "document", "pdf", "jpg", "image"]):
-            self.upload_enabled = True
-            self.status_text.config(text="Upload enabled")
-            
-        self.agent.handle_default_conversation(user_input)
-        sys.stdout = old_stdout
+def main():
+    parser = argparse.ArgumentParser(description="MediSuite desktop assistant.")
+    add_llm_argument(parser)
+    add_profile_startup_argument(parser)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_argument(parser)
+    args = parser.parse_args()
+    stop_metrics = start_metrics(args)
+    tracer = create_tracer(args)
 
-    # Redirect print to GUI
-    def write(self, message):
-        if message.strip():
-            self.append_history("Assistant", message.strip())
-    def flush(self):
-        pass
+    profiler = STARTUP_PROFILER
+    if profiler:
+        profiler.mark("imports, metrics, tracing")
 
-def main():
     root = tk.Tk()
+    if profiler:
+        profiler.mark("Tk root window")
     # Set window minimum size
     root.minsize(900, 600)
     
@@ -687,8 +943,19 @@ def main():
     center_y = int(screen_height/2 - window_height/2)
     root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
     
-    app = MediSuiteGUI(root)
-    root.mainloop()
+    app = MediSuiteGUI(root, llm_name=args.llm, profiler=profiler, turn_profiler=create_profiler(args),
+                       cprofile_path=args.cprofile, tracer=tracer)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
+    if profiler:
+        def report_first_paint():
+            profiler.mark("first paint")
+            profiler.report()
+        root.after_idle(report_first_paint)
+    try:
+        root.mainloop()
+    finally:
+        export_trace(tracer, args.trace)
+        stop_metrics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
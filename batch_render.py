@@ -0,0 +1,150 @@
+import io
+import os
+import re
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from PDFBuilder import PDFBuilder
+
+def claim_title(record, index):
+    """Bookmark/file label for a claim: its claim_id, else its position and patient name."""
+    if record.get('claim_id'):
+        return str(record['claim_id'])
+    name = (record.get('patient_info') or {}).get('name') or 'Unknown'
+    return f"{index + 1:05d} {name}"
+
+def draw_claim(pdf_builder, record, form_template):
+    if form_template:
+        pdf_builder.draw_cms1500_template(record)
+    else:
+        pdf_builder.draw_cms1500(record)
+
+def render_claim_file(job):
+    """
+    Process-pool task: render one claim record to its own PDF file, with the dynamic layout (a
+    form skeleton shared by a single page makes the file larger, not smaller).
+    """
+    record, path = job
+    pdf_builder = PDFBuilder(path)
+    pdf_builder.draw_cms1500(record)
+    pdf_builder.save()
+    return path
+
+def render_claim_pages(job):
+    """
+    Process-pool task: render a run of claims into one multi-page PDF in memory.
+
+    Returns the PDF bytes and the page index each claim starts on. With bookmarks=True the
+    outline entries are written by ReportLab directly (used when no PDF merger is installed).
+    """
+    records, first_index, form_template, bookmarks = job
+    pdf_builder = PDFBuilder()
+    start_pages = []
+    for offset, record in enumerate(records):
+        if offset:
+            pdf_builder.new_page()
+        start_pages.append(pdf_builder.canvas.getPageNumber() - 1)
+        if bookmarks:
+            key = f"claim{first_index + offset}"
+            pdf_builder.canvas.bookmarkPage(key)
+            pdf_builder.canvas.addOutlineEntry(claim_title(record, first_index + offset), key, level=0)
+        draw_claim(pdf_builder, record, form_template)
+    pdf_builder.save()
+    return pdf_builder.getvalue(), start_pages
+
+class BatchClaimRenderer:
+    def __init__(self, workers=None, form_template=True, chunksize=16):
+        """
+        Render many CMS-1500 claims across a process pool.
+
+        Args:
+            workers (int): Worker processes; defaults to the CPU count. 1 renders in-process.
+            form_template (bool): Draw merged documents over one shared form skeleton instead of
+                                  the dynamic table layout. Individual files always use the dynamic layout.
+            chunksize (int): Claims handed to a worker at a time when writing individual files.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.form_template = form_template
+        self.chunksize = chunksize
+
+    def run_jobs(self, task, jobs, chunksize=1):
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [task(job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            return list(executor.map(task, jobs, chunksize=chunksize))
+
+    def report(self, count, started):
+        seconds = time.perf_counter() - started
+        return {"claims": count, "seconds": seconds, "claims_per_second": count / seconds if seconds > 0 else 0.0}
+
+    def render_files(self, records, output_dir):
+        """Write one PDF per claim into output_dir and return throughput stats with the paths."""
+        started = time.perf_counter()
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = []
+        for index, record in enumerate(records):
+            safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', claim_title(record, index))
+            jobs.append((record, os.path.join(output_dir, f"claim_{safe_name}.pdf")))
+        paths = self.run_jobs(render_claim_file, jobs, chunksize=self.chunksize)
+        stats = self.report(len(jobs), started)
+        stats["files"] = paths
+        return stats
+
+    def render_merged(self, records, output_path):
+        """Write every claim into one multi-page PDF with a bookmark per claim and return throughput stats."""
+        started = time.perf_counter()
+        records = list(records)
+        try:
+            from pypdf import PdfReader, PdfWriter
+        except ImportError:
+            # No merger available: render everything into one document in this process
+            pdf_bytes, _ = render_claim_pages((records, 0, self.form_template, True))
+            with open(output_path, 'wb') as file:
+                file.write(pdf_bytes)
+            return self.report(len(records), started)
+
+        # One contiguous shard per worker, so each shard shares a single form skeleton
+        shard_size = max(1, -(-len(records) // self.workers))
+        jobs = [(records[i:i + shard_size], i, self.form_template, False) for i in range(0, len(records), shard_size)]
+        shards = self.run_jobs(render_claim_pages, jobs)
+
+        writer = PdfWriter()
+        for (pdf_bytes, start_pages), (shard_records, first_index, _, _) in zip(shards, jobs):
+            page_offset = len(writer.pages)
+            writer.append(PdfReader(io.BytesIO(pdf_bytes)))
+            for offset, (record, start_page) in enumerate(zip(shard_records, start_pages)):
+                writer.add_outline_item(claim_title(record, first_index + offset), page_offset + start_page)
+        with open(output_path, 'wb') as file:
+            writer.write(file)
+        return self.report(len(records), started)
+
+def load_claim_records(path):
+    """Read claim records from a JSON list or a JSONL file."""
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.lower().endswith('.jsonl'):
+            return [json.loads(line) for line in file if line.strip()]
+        data = json.load(file)
+        return data if isinstance(data, list) else [data]
+
+def main():
+    """Entry point for end-of-day batch claim rendering."""
+    parser = argparse.ArgumentParser(description="Render many CMS-1500 claims in parallel.")
+    parser.add_argument("claims", help="JSON or JSONL file of claim records (patient_info, clinical_info, icd10_codes, cpt4_codes).")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", help="Write one PDF per claim into this folder.")
+    output.add_argument("--merged", help="Write all claims into this single PDF with a bookmark per claim.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--dynamic", action="store_true", help="Use the dynamic table layout for --merged instead of the form template.")
+    args = parser.parse_args()
+
+    records = load_claim_records(args.claims)
+    renderer = BatchClaimRenderer(workers=args.workers, form_template=not args.dynamic)
+    if args.output_dir:
+        stats = renderer.render_files(records, args.output_dir)
+    else:
+        stats = renderer.render_merged(records, args.merged)
+    print(f"Rendered {stats['claims']} claims in {stats['seconds']:.2f}s ({stats['claims_per_second']:.1f} claims/second)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import os
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+from PDFBuilder import PDFBuilder
+
+DEFAULT_SIZES = "1x1,4x2,12x6,30x15,80x40"
+MODES = ["dynamic", "template"]
+WORDS = ["acute", "chronic", "bilateral", "unspecified", "type 2", "diabetes", "hypertension", "fracture", "infection",
+         "of the", "left", "right", "lower", "upper", "limb", "with", "without", "complications", "disorder", "syndrome"]
+
+def load_procedures(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "CPT4.json")):
+    """Use real CPT-4 descriptions when the catalog is present, so row text has realistic lengths."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return [(entry['code'], entry['procedure']) for entry in json.load(file)]
+    except (OSError, ValueError, KeyError):
+        return [(f"{99200 + i}", f"Office visit level {i}") for i in range(50)]
+
+def synthetic_claim(rng, diagnoses, procedures, procedure_catalog):
+    """Build a claim record with the given number of diagnosis and procedure rows."""
+    return {
+        "patient_info": {
+            "name": f"Patient {rng.randint(1000, 9999)} Example",
+            "dob": f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1930, 2020)}",
+            "gender": rng.choice(["Male", "Female"]),
+            "address": f"{rng.randint(1, 9999)} Main Street, Springfield, IL 62701",
+            "phone": f"555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "insurance": rng.choice(["Aetna", "Blue Cross Blue Shield", "Medicare", "UnitedHealthcare"]),
+            "policy": f"POL{rng.randint(100000, 999999)}",
+            "group": f"GRP{rng.randint(1000, 9999)}"
+        },
+        "clinical_info": {
+            "service_date": "01/05/2024",
+            "place_of_service": "11",
+            "provider": "Dr. Jane Smith",
+            "referring_provider": "Dr. John Doe"
+        },
+        "icd10_codes": [{"code": f"{rng.choice('ABCEIJKMNRSZ')}{rng.randint(0, 99):02d}.{rng.randint(0, 9)}",
+                         "disease": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))).capitalize()}
+                        for _ in range(diagnoses)],
+        "cpt4_codes": [{"code": code, "procedure": procedure}
+                       for code, procedure in rng.sample(procedure_catalog, min(procedures, len(procedure_catalog)))]
+    }
+
+def render_claim(record, form_template, filename=None):
+    """Render one claim the way MedicalCodingAgent.render_cms1500_pdf does; return (bytes, pages)."""
+    pdf_builder = PDFBuilder(filename)
+    if form_template:
+        pdf_builder.draw_cms1500_template(record)
+    else:
+        pdf_builder.draw_cms1500(record)
+    pages = pdf_builder.canvas.getPageNumber()
+    pdf_builder.save()
+    if filename:
+        return os.path.getsize(filename), pages
+    return len(pdf_builder.getvalue()), pages
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(round(fraction * len(sorted_values), 9)) - 1))
+    return sorted_values[index]
+
+def run_case(records, form_template, warmup=3, to_disk=False):
+    """Time every record in turn, then measure peak memory on a separate pass so tracing does not skew the timings."""
+    directory = tempfile.mkdtemp(prefix="claim_bench_") if to_disk else None
+    path = os.path.join(directory, "claim.pdf") if directory else None
+    for record in records[:warmup]:
+        render_claim(record, form_template, path)
+
+    latencies = []
+    output_bytes = []
+    pages = 0
+    started = time.perf_counter()
+    for record in records:
+        begin = time.perf_counter()
+        size, record_pages = render_claim(record, form_template, path)
+        latencies.append(time.perf_counter() - begin)
+        output_bytes.append(size)
+        pages = max(pages, record_pages)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for record in records[:min(len(records), 20)]:
+        render_claim(record, form_template, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if directory:
+        os.remove(path)
+        os.rmdir(directory)
+
+    latencies.sort()
+    return {
+        "claims": len(records),
+        "pages": pages,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "claims_per_second": len(records) / elapsed if elapsed > 0 else 0.0,
+        "peak_memory_kb": peak / 1024,
+        "output_bytes": sum(output_bytes) // len(output_bytes)
+    }
+
+def positive_int(text):
+    """argparse type for counts that must be at least 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {text}")
+    return value
+
+def parse_modes(text):
+    """argparse type for a comma-separated list of layouts out of MODES."""
+    modes = [mode.strip() for mode in text.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown or not modes:
+        raise argparse.ArgumentTypeError(f"choose from {', '.join(MODES)}, got {text!r}")
+    return modes
+
+def parse_sizes(text):
+    """Parse '12x6,30x15' into [(12, 6), (30, 15)] diagnosis x procedure row counts."""
+    sizes = []
+    for item in text.split(","):
+        diagnoses, _, procedures = item.strip().lower().partition("x")
+        sizes.append((int(diagnoses), int(procedures or 0)))
+    return sizes
+
+def main():
+    """Entry point for the claim rendering benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark CMS-1500 claim rendering on synthetic claims of varying size.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated DIAGNOSESxPROCEDURES row counts (default: {DEFAULT_SIZES}).")
+    parser.add_argument("--claims", type=positive_int, default=200, help="Claims rendered per case.")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed renders before each case.")
+    parser.add_argument("--modes", type=parse_modes, default=MODES, help="Layouts to benchmark: dynamic, template or both.")
+    parser.add_argument("--disk", action="store_true", help="Write each claim to a file, as generate_cms1500_pdf does.")
+    parser.add_argument("--seed", type=int, default=1500, help="Random seed for the synthetic claims.")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results, e.g. a branch name.")
+    parser.add_argument("--json", help="Append the results as JSON lines to this file to track them over time.")
+    args = parser.parse_args()
+
+    procedure_catalog = load_procedures()
+    header = f"{'rows (dx x px)':>15} {'mode':>9} {'pages':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'claims/s':>9} {'peak KB':>8} {'bytes':>8}"
+    print(header)
+    print("-" * len(header))
+
+    results = []
+    for diagnoses, procedures in parse_sizes(args.sizes):
+        rng = random.Random(args.seed)
+        records = [synthetic_claim(rng, diagnoses, procedures, procedure_catalog) for _ in range(args.claims)]
+        for mode in args.modes:
+            stats = run_case(records, mode == "template", warmup=args.warmup, to_disk=args.disk)
+            print(f"{f'{diagnoses} x {procedures}':>15} {mode:>9} {stats['pages']:>5} {stats['p50_ms']:>8.2f} {stats['p90_ms']:>8.2f} "
+                  f"{stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f} {stats['claims_per_second']:>9.1f} "
+                  f"{stats['peak_memory_kb']:>8.0f} {stats['output_bytes']:>8}")
+            stats.update({"diagnoses": diagnoses, "procedures": procedures, "mode": mode, "disk": args.disk})
+            results.append(stats)
+
+    if args.json:
+        run = {"timestamp": datetime.now().isoformat(), "label": args.label, "python": platform.python_version()}
+        with open(args.json, 'a', encoding='utf-8') as file:
+            for stats in results:
+                file.write(json.dumps({**run, **stats}) + "\n")
+        print(f"Results appended to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span, propagate
+from llm_interface import LLMInterface
+
+class ChunkedExtractor:
+    def __init__(self, llm: LLMInterface, max_chunk_chars=6000, max_workers=4):
+        """
+        Split long documents into page/section sized chunks and extract them concurrently.
+
+        Args:
+            llm (LLMInterface): The LLM used to extract each chunk.
+            max_chunk_chars (int): Upper bound on the text sent with a single extraction call.
+            max_workers (int): Number of chunks extracted in parallel.
+        """
+        self.llm = llm
+        self.max_chunk_chars = max_chunk_chars
+        self.max_workers = max_workers
+
+    def split_into_chunks(self, pages):
+        """Pack whole pages into chunks, splitting oversized pages on paragraph boundaries."""
+        sections = []
+        for page in pages:
+            page = page.strip()
+            if not page:
+                continue
+            if len(page) <= self.max_chunk_chars:
+                sections.append(page)
+            else:
+                sections.extend(self._split_page(page))
+
+        chunks = []
+        current = ""
+        for section in sections:
+            if current and len(current) + len(section) + 2 > self.max_chunk_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{section}" if current else section
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _split_page(self, page):
+        """Split a single oversized page into paragraph groups no larger than max_chunk_chars."""
+        parts = []
+        current = ""
+        for paragraph in re.split(r'\n\s*\n', page):
+            paragraph = paragraph.strip()
+            # Hard-wrap paragraphs that are longer than a whole chunk (e.g. OCR without blank lines)
+            while len(paragraph) > self.max_chunk_chars:
+                cut = paragraph.rfind('\n', 0, self.max_chunk_chars)
+                if cut <= 0:
+                    cut = self.max_chunk_chars
+                parts.append(paragraph[:cut].strip())
+                paragraph = paragraph[cut:].strip()
+            if not paragraph:
+                continue
+            if current and len(current) + len(paragraph) + 2 > self.max_chunk_chars:
+                parts.append(current)
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            parts.append(current)
+        return parts
+
+    def extract_chunk(self, index, total, chunk, system_prompt):
+        """Run the extraction prompt on one chunk and return the parsed JSON fragment (or None)."""
+        # Each chunk gets its own history so concurrent calls never share a message list
+        history = [
+            {"role": "system", "content": f"Extracted text from document (part {index + 1} of {total}):\n{chunk}"}
+        ]
+        try:
+            with span("llm extraction", chunk=index + 1, chunks=total, chars=len(chunk)):
+                response = self.llm.generate_response(history, system_prompt)
+            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            if json_match:
+                return json.loads(json_match.group(0))
+        except Exception as e:
+            print(f"Error extracting document part {index + 1}: {e}")
+        return None
+
+    def extract(self, pages, system_prompt):
+        """Extract every chunk concurrently and reduce the fragments into one record."""
+        chunks = self.split_into_chunks(pages)
+        if not chunks:
+            return {}
+
+        workers = max(1, min(self.max_workers, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fragments = list(executor.map(
+                propagate(lambda item: self.extract_chunk(item[0], len(chunks), item[1], system_prompt)),
+                enumerate(chunks)
+            ))
+        return self.merge_fragments([fragment for fragment in fragments if isinstance(fragment, dict)])
+
+    def merge_fragments(self, fragments):
+        """Merge per-chunk patient_info/clinical_info fragments into a single record."""
+        patient_fragments = [f.get('patient_info') for f in fragments if isinstance(f.get('patient_info'), dict)]
+        clinical_fragments = [f.get('clinical_info') for f in fragments if isinstance(f.get('clinical_info'), dict)]
+
+        merged = {}
+        if patient_fragments:
+            merged['patient_info'] = self._merge_patient_info(patient_fragments)
+        if clinical_fragments:
+            merged['clinical_info'] = self._merge_values(clinical_fragments)
+        return merged
+
+    def _merge_patient_info(self, fragments):
+        """Pick the most frequently extracted value per field, preferring earlier chunks on ties."""
+        candidates = {}
+        for fragment in fragments:
+            for key, value in fragment.items():
+                if self._is_empty(value):
+                    continue
+                votes = candidates.setdefault(key, {})
+                normalized = json.dumps(value, sort_keys=True).lower()
+                if normalized not in votes:
+                    votes[normalized] = [0, value]
+                votes[normalized][0] += 1
+
+        merged = {}
+        for key, votes in candidates.items():
+            # max() keeps the first candidate among equal counts, i.e. the earliest chunk
+            merged[key] = max(votes.values(), key=lambda vote: vote[0])[1]
+        return merged
+
+    def _merge_values(self, values):
+        """Recursively merge dicts, concatenate lists without duplicates, and collect differing scalars."""
+        values = [value for value in values if not self._is_empty(value)]
+        if not values:
+            return None
+        if all(isinstance(value, dict) for value in values):
+            keys = []
+            for value in values:
+                keys.extend(key for key in value if key not in keys)
+            merged = {}
+            for key in keys:
+                merged_value = self._merge_values([value.get(key) for value in values])
+                if merged_value is not None:
+                    merged[key] = merged_value
+            return merged
+
+        items = []
+        seen = set()
+        for value in values:
+            for item in (value if isinstance(value, list) else [value]):
+                if self._is_empty(item):
+                    continue
+                normalized = json.dumps(item, sort_keys=True).lower()
+                if normalized not in seen:
+                    seen.add(normalized)
+                    items.append(item)
+        if any(isinstance(value, list) for value in values) or len(items) > 1:
+            return items
+        return items[0] if items else None
+
+    @staticmethod
+    def _is_empty(value):
+        return value in [None, "", "null"] or value == [] or value == {}
@@ -0,0 +1,238 @@
+import os
+import json
+import hashlib
+import threading
+from code_scanner import CodeScanner
+from code_index import SortedCodeIndex
+from retrieval_index import TfidfIndex
+from code_typeahead import CodeTypeahead
+from term_spotter import TermSpotter
+
+def load_code_data(data_path, label, digest=None):
+    """Load a code list from a json file, or an empty list if it cannot be read. The raw bytes are added to digest."""
+    try:
+        with open(data_path, 'rb') as file:
+            raw = file.read()
+        if digest is not None:
+            digest.update(raw)
+        return json.loads(raw.decode('utf-8'))
+    except Exception as e:
+        print(f"Error loading {label} data: {e}")
+        return []
+
+def file_signature(path):
+    """(modification time, size) of a file, or None when it is missing; a cheap change check."""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def group_by_category(ranked_entries):
+    """
+    Group (rank, ICD-10 entry) pairs under their category, keeping their order inside each group:
+    [(category_lower, [(rank, entry, disease_lower), ...]), ...]
+    """
+    groups = {}
+    for rank, entry in ranked_entries:
+        category = entry.get("category", "").lower()
+        groups.setdefault(category, []).append((rank, entry, entry.get("disease", "").lower()))
+    return list(groups.items())
+
+class CodeCatalog:
+    def __init__(self, icd10_data_path="ICD10.json", cpt4_data_path="CPT4.json"):
+        """
+        The ICD-10 and CPT-4 catalogs and the indexes built over them.
+
+        The catalog is read-only once built, so a single instance can be shared by every agent
+        (and every session) in a process instead of each one loading its own copy. The files are
+        read on first use rather than at construction, so start-up does not wait for them.
+
+        A loaded catalog never changes; new code files become a new CodeCatalog (see
+        CatalogManager), identified by its version, a hash of the file contents.
+        """
+        self.icd10_data_path = icd10_data_path
+        self.cpt4_data_path = cpt4_data_path
+        self.loaded = False
+        self.load_lock = threading.Lock()
+        self.indexes = {}
+        self.index_lock = threading.Lock()
+        self.term_spotter_index = None
+        self.typeahead_index = None
+        self.typeahead_lock = threading.Lock()
+        self.typeahead_thread = None
+
+    def load(self):
+        """Read the catalogs and build the indexes, once."""
+        if self.loaded:
+            return self
+        with self.load_lock:
+            if not self.loaded:
+                self.signatures = (file_signature(self.icd10_data_path), file_signature(self.cpt4_data_path))
+                digest = hashlib.sha256()
+                self._icd10_data = load_code_data(self.icd10_data_path, "ICD-10", digest)
+                digest.update(b"\0")
+                self._cpt4_data = load_code_data(self.cpt4_data_path, "CPT-4", digest)
+                self._version = digest.hexdigest()[:12]
+                # Literal codes in notes are validated against the catalogs with hash lookups
+                self._code_scanner = CodeScanner(self._icd10_data, self._cpt4_data)
+                # Many ICD-10 entries share a category, so matching scores each category once per query
+                self._icd10_categories = group_by_category(enumerate(self._icd10_data))
+                # Code ranges and families are answered by binary search over the codes in sorted order
+                self._icd10_code_index = SortedCodeIndex(self._icd10_data)
+                self._cpt4_code_index = SortedCodeIndex(self._cpt4_data)
+                self.loaded = True
+        return self
+
+    @property
+    def current(self):
+        """A fixed catalog is its own current version (CatalogManager.current changes over time)."""
+        return self
+
+    @property
+    def version(self):
+        return self.load()._version
+
+    @property
+    def icd10_data(self):
+        return self.load()._icd10_data
+
+    @property
+    def cpt4_data(self):
+        return self.load()._cpt4_data
+
+    @property
+    def icd10_categories(self):
+        return self.load()._icd10_categories
+
+    @property
+    def code_scanner(self):
+        return self.load()._code_scanner
+
+    @property
+    def icd10_code_index(self):
+        return self.load()._icd10_code_index
+
+    @property
+    def cpt4_code_index(self):
+        return self.load()._cpt4_code_index
+
+    def retrieval_index(self, name):
+        """TF-IDF index over the "icd10" or "cpt4" descriptions, built the first time it is asked for."""
+        index = self.indexes.get(name)
+        if index is None:
+            with self.index_lock:
+                index = self.indexes.get(name)
+                if index is None:
+                    if name == "icd10":
+                        texts = [f"{entry['disease']} {entry['category']}" for entry in self.icd10_data]
+                    else:
+                        texts = [entry["procedure"] for entry in self.cpt4_data]
+                    index = self.indexes[name] = TfidfIndex(texts)
+        return index
+
+    def term_spotter(self):
+        """Multi-pattern matcher over the catalog descriptions and clinical shorthand, built on first use."""
+        if self.term_spotter_index is None:
+            with self.index_lock:
+                if self.term_spotter_index is None:
+                    self.term_spotter_index = TermSpotter(self.icd10_data, self.cpt4_data)
+        return self.term_spotter_index
+
+    def build_typeahead(self):
+        with self.typeahead_lock:
+            if self.typeahead_index is None:
+                self.typeahead_index = CodeTypeahead(self.icd10_data, self.cpt4_data)
+        return self.typeahead_index
+
+    def typeahead(self, wait=True):
+        """
+        Prefix index for code/description typeahead. With wait=False (e.g. from a UI keystroke)
+        it is built on a background thread and None is returned until it is ready.
+        """
+        if self.typeahead_index is not None or wait:
+            return self.typeahead_index or self.build_typeahead()
+        with self.typeahead_lock:
+            if self.typeahead_thread is None:
+                self.typeahead_thread = threading.Thread(target=self.build_typeahead, daemon=True, name="typeahead-build")
+                self.typeahead_thread.start()
+        return None
+
+    def warm(self, like=None):
+        """Load now and build the lazy indexes that the catalog being replaced (like) had already built."""
+        self.load()
+        if like is not None:
+            for name in list(like.indexes):
+                self.retrieval_index(name)
+            if like.term_spotter_index is not None:
+                self.term_spotter()
+            if like.typeahead_index is not None:
+                self.build_typeahead()
+        return self
+
+class CatalogManager:
+    def __init__(self, icd10_data_path="ICD10.json", cpt4_data_path="CPT4.json", poll_interval=60):
+        """
+        Serve the current CodeCatalog and replace it when ICD10.json or CPT4.json changes.
+
+        A changed version is loaded and indexed on the watcher thread, then swapped in with a
+        single reference assignment. Agents pin the catalog for a whole turn or match, so work in
+        flight finishes on the version it started with; the old version is freed once nothing
+        uses it.
+
+        Args:
+            poll_interval (float): Seconds between checks of the files' modification time and size.
+        """
+        self.icd10_data_path = icd10_data_path
+        self.cpt4_data_path = cpt4_data_path
+        self.poll_interval = poll_interval
+        self.current = CodeCatalog(icd10_data_path, cpt4_data_path)
+        self.rejected_signatures = None
+        self.reload_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.watcher = None
+
+    def signatures(self):
+        return (file_signature(self.icd10_data_path), file_signature(self.cpt4_data_path))
+
+    def changed(self):
+        """True when the files differ from the loaded version (and from a version already rejected)."""
+        if not self.current.loaded:
+            return False  # Nothing loaded yet; the first use will read the files as they are
+        signatures = self.signatures()
+        return signatures != self.current.signatures and signatures != self.rejected_signatures
+
+    def reload(self):
+        """Load and index the files again and swap the new version in. Returns True when it was swapped."""
+        with self.reload_lock:
+            old = self.current
+            catalog = CodeCatalog(self.icd10_data_path, self.cpt4_data_path).load()
+            if (old.icd10_data and not catalog.icd10_data) or (old.cpt4_data and not catalog.cpt4_data):
+                # A file mid-copy or broken: keep serving the old version until the files change again
+                self.rejected_signatures = catalog.signatures
+                print(f"Keeping code catalog version {old.version}: the updated files could not be read")
+                return False
+            if catalog.version == old.version:
+                old.signatures = catalog.signatures  # Touched but identical
+                return False
+            self.current = catalog.warm(old)
+            print(f"Code catalogs updated from version {old.version} to {catalog.version}")
+            return True
+
+    def watch_loop(self):
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                if self.changed():
+                    self.reload()
+            except Exception as e:
+                print(f"Error reloading code catalogs: {e}")
+
+    def start(self):
+        self.watcher = threading.Thread(target=self.watch_loop, daemon=True, name="catalog-watcher")
+        self.watcher.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.watcher:
+            self.watcher.join()
@@ -0,0 +1,54 @@
+from bisect import bisect_left, bisect_right
+from code_scanner import normalize_code
+
+# Sorts after every character of a normalized code, so "E11" + PREFIX_END bounds the E11 family
+PREFIX_END = "￿"
+
+def code_class(key):
+    """
+    CPT Category II/III and PLA codes (four digits plus F, T or U) are kept apart from the numeric
+    codes, so 00100-99999 does not pick up 0010T; everything else, ICD-10 included, is class "".
+    """
+    return key[-1] if len(key) == 5 and key[:4].isdigit() and key[-1].isalpha() else ""
+
+class SortedCodeIndex:
+    def __init__(self, entries):
+        """
+        Catalog entries held in normalized code order (one sorted run per code class), for range
+        ("99202-99215") and family ("E11*") queries by binary search. A query costs O(log n) to
+        locate plus the size of whatever part of the result is read.
+        """
+        runs = {}
+        for entry in entries:
+            key = normalize_code(entry["code"])
+            runs.setdefault(code_class(key), []).append((key, entry))
+        self.runs = {}
+        for cls in sorted(runs):
+            ordered = sorted(runs[cls], key=lambda item: item[0])
+            self.runs[cls] = ([key for key, _ in ordered], [entry for _, entry in ordered])
+
+    def range_spans(self, low, high):
+        """
+        [(entries, start, stop), ...] covering the codes from low to high inclusive, within the code
+        class of low. high also includes its own subcodes, so E10-E11 covers E11.9 as well.
+        """
+        low, high = normalize_code(low), normalize_code(high)
+        if low > high:
+            low, high = high, low
+        run = self.runs.get(code_class(low))
+        if not run:
+            return []
+        keys, entries = run
+        return [(entries, bisect_left(keys, low), bisect_right(keys, high + PREFIX_END))]
+
+    def prefix_spans(self, prefix):
+        """[(entries, start, stop), ...] covering the codes that start with prefix, in every code class."""
+        prefix = normalize_code(prefix)
+        return [(entries, bisect_left(keys, prefix), bisect_left(keys, prefix + PREFIX_END))
+                for keys, entries in self.runs.values()]
+
+    def range(self, low, high):
+        return [entry for entries, start, stop in self.range_spans(low, high) for entry in entries[start:stop]]
+
+    def prefix(self, prefix):
+        return [entry for entries, start, stop in self.prefix_spans(prefix) for entry in entries[start:stop]]
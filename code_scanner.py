@@ -0,0 +1,114 @@
+import re
+
+# Code-shaped tokens: ICD-10-CM (letter, digit, alnum, optional dotted extension) and
+# CPT-4 (four digits plus a digit, or F/T/U for category II/III and PLA codes)
+ICD10_TOKEN = re.compile(r"\b([A-TV-Z][0-9][0-9A-Z](?:\.?[0-9A-Z]{1,4})?)\b", re.IGNORECASE)
+CPT4_TOKEN = re.compile(r"\b(\d{4}[0-9FTU])\b")
+
+# Five-digit numbers in these contexts are identifiers, not procedure codes: a whole-word label
+# (any case) or a state abbreviation after a comma ("Austin, TX 78701", upper case only)
+NON_CODE_CONTEXT = re.compile(
+    r"(?:(?i:\b(?:zip|postal|phone|fax|tel|npi|id|policy|member|group|account|acct|mrn|ssn)\b)|,\s*[A-Z]{2})"
+    r"\s*[:#]?\s*$"
+)
+
+def normalize_code(code):
+    """Canonical form used for lookups: upper case without the ICD-10 dot."""
+    return code.strip().upper().replace(".", "")
+
+class CodeScanner:
+    def __init__(self, icd10_data, cpt4_data):
+        """
+        Index the loaded catalogs by normalized code so every token is validated with one hash lookup.
+
+        Args:
+            icd10_data (list): ICD-10 entries with code, disease and category.
+            cpt4_data (list): CPT-4 entries with code and procedure.
+        """
+        self.icd10_by_code = {normalize_code(entry["code"]): entry for entry in icd10_data}
+        self.cpt4_by_code = {normalize_code(entry["code"]): entry for entry in cpt4_data}
+
+    def scan(self, text):
+        """
+        Find literal ICD-10 and CPT-4 codes in the text that exist in the catalogs.
+
+        Returns:
+            tuple: (icd10_matches, cpt4_matches) in order of first appearance, shaped like the
+                   fuzzy matcher results with a score of 100.
+        """
+        icd10_matches = []
+        cpt4_matches = []
+        seen = set()
+
+        for match in ICD10_TOKEN.finditer(text):
+            key = normalize_code(match.group(1))
+            entry = self.icd10_by_code.get(key)
+            if entry and ("icd10", key) not in seen:
+                seen.add(("icd10", key))
+                icd10_matches.append({
+                    "code": entry["code"],
+                    "disease": entry["disease"],
+                    "category": entry["category"],
+                    "score": 100,
+                    "source": "literal"
+                })
+
+        for match in CPT4_TOKEN.finditer(text):
+            key = normalize_code(match.group(1))
+            entry = self.cpt4_by_code.get(key)
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            if not entry or ("cpt4", key) in seen or NON_CODE_CONTEXT.search(text[line_start:match.start()]):
+                continue
+            seen.add(("cpt4", key))
+            cpt4_matches.append({
+                "code": entry["code"],
+                "procedure": entry["procedure"],
+                "score": 100,
+                "source": "literal"
+            })
+
+        return icd10_matches, cpt4_matches
+
+    def residual_text(self, text, matches):
+        """
+        Remove the literal codes that were matched, and a description written right next to one
+        ("99213 - Office visit", "Type 2 diabetes (E11.9)"), leaving the text still to be interpreted.
+        Uncoded items on the same line as a code are kept.
+        """
+        descriptions = {normalize_code(match["code"]): match.get("disease", match.get("procedure", ""))
+                        for match in matches}
+        if not descriptions:
+            return text
+
+        spans = []
+        for pattern in (ICD10_TOKEN, CPT4_TOKEN):
+            for match in pattern.finditer(text):
+                key = normalize_code(match.group(1))
+                if key not in descriptions:
+                    continue
+                if pattern is CPT4_TOKEN:
+                    line_start = text.rfind("\n", 0, match.start()) + 1
+                    if NON_CODE_CONTEXT.search(text[line_start:match.start()]):
+                        continue
+                start, end = match.span()
+                description = re.escape(descriptions[key]) if descriptions[key] else None
+                if description:
+                    after = re.compile(r"[ \t]*(?:[-:\u2013(][ \t]*)?" + description + r"\)?", re.IGNORECASE).match(text, end)
+                    before = re.compile(description + r"[ \t]*(?:[-:\u2013(][ \t]*)?\Z", re.IGNORECASE).search(text, 0, start)
+                    if after:
+                        end = after.end()
+                    elif before:
+                        start = before.start()
+                        end = end + 1 if text[end:end + 1] == ")" else end
+                spans.append((start, end))
+
+        residual = []
+        position = 0
+        for start, end in sorted(spans):
+            if start >= position:
+                residual.append(text[position:start])
+                position = end
+            else:
+                position = max(position, end)
+        residual.append(text[position:])
+        return re.sub(r"[ \t]{2,}", " ", "".join(residual))
@@ -0,0 +1,114 @@
+import re
+from code_scanner import normalize_code
+
+WORD = re.compile(r"[a-z0-9]+")
+# Starts like a code: ICD-10 (letter + digit) or CPT-4 (digits); anything else is read as description words
+CODE_PREFIX = re.compile(r"^(?:[A-Z][0-9]|[0-9])", re.IGNORECASE)
+
+class PrefixTrie:
+    def __init__(self, max_items=200):
+        """
+        Character trie whose nodes keep the ids of the first max_items entries below them, in
+        insertion order, so a prefix query is one walk down the prefix with no subtree search.
+        The node a key ends at also keeps every id inserted under that key, for find_all.
+        """
+        self.root = ({}, [], [])
+        self.max_items = max_items
+
+    def insert(self, key, item):
+        node = self.root
+        for char in key:
+            children = node[0]
+            node = children.get(char)
+            if node is None:
+                node = children[char] = ({}, [], [])
+            items = node[1]
+            if len(items) < self.max_items and (not items or items[-1] != item):
+                items.append(item)
+        ends = node[2]
+        if not ends or ends[-1] != item:
+            ends.append(item)
+
+    def walk(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return None
+        return node
+
+    def find(self, prefix):
+        """Ids stored under the prefix (empty for an unknown or empty prefix), at most max_items."""
+        node = self.walk(prefix) if prefix else None
+        return node[1] if node else []
+
+    def is_complete(self, items):
+        """Whether a find() result holds every id under its prefix rather than the first max_items."""
+        return len(items) < self.max_items
+
+    def find_all(self, prefix):
+        """Every id of every key starting with the prefix, as a set; walks the whole subtree."""
+        node = self.walk(prefix) if prefix else None
+        found = set()
+        stack = [node] if node else []
+        while stack:
+            children, _, ends = stack.pop()
+            found.update(ends)
+            stack.extend(children.values())
+        return found
+
+class CodeTypeahead:
+    def __init__(self, icd10_data, cpt4_data, max_node_items=200):
+        """
+        Typeahead over the ICD-10 and CPT-4 catalogs: code prefixes ("992", "E11.") and
+        description word prefixes ("knee arthr").
+
+        Codes are suggested in code order; descriptions shortest first, so the general entry comes
+        before its more specific variants.
+        """
+        self.entries = []
+        for entry in icd10_data:
+            self.entries.append({"code": entry["code"], "description": entry["disease"], "system": "ICD-10"})
+        for entry in cpt4_data:
+            self.entries.append({"code": entry["code"], "description": entry["procedure"], "system": "CPT-4"})
+        self.entry_words = [WORD.findall(entry["description"].lower()) for entry in self.entries]
+
+        self.codes = PrefixTrie(max_node_items)
+        for item in sorted(range(len(self.entries)), key=lambda item: normalize_code(self.entries[item]["code"])):
+            self.codes.insert(normalize_code(self.entries[item]["code"]), item)
+
+        self.words = PrefixTrie(max_node_items)
+        by_length = sorted(range(len(self.entries)),
+                           key=lambda item: (len(self.entries[item]["description"]), self.entries[item]["code"]))
+        self.word_rank = {item: rank for rank, item in enumerate(by_length)}
+        for item in by_length:
+            for word in self.entry_words[item]:
+                self.words.insert(word, item)
+
+    def suggest(self, text, limit=10):
+        """
+        Entries whose code starts with the text, or whose description has a word starting with
+        each word of the text. Returns [{"code", "description", "system"}, ...].
+        """
+        text = text.strip()
+        if CODE_PREFIX.match(text):
+            return [self.entries[item] for item in self.codes.find(normalize_code(text))[:limit]]
+
+        words = WORD.findall(text.lower())
+        if not words:
+            return []
+        # Walk the most selective word's list and check the other words against each entry. When
+        # even that list was cut at max_node_items ("repair" + "arte"), the matches may lie past
+        # the cut, so take the word's full set from the subtree instead
+        candidates = min((self.words.find(word) for word in words), key=len)
+        if not self.words.is_complete(candidates):
+            candidates = min((self.words.find_all(word) for word in words), key=len)
+            candidates = sorted(candidates, key=self.word_rank.__getitem__)
+        suggestions = []
+        for item in candidates:
+            entry_words = self.entry_words[item]
+            if all(any(entry_word.startswith(word) for entry_word in entry_words) for word in words):
+                suggestions.append(self.entries[item])
+                if len(suggestions) >= limit:
+                    break
+        return suggestions
@@ -0,0 +1,172 @@
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+from code_scanner import normalize_code
+
+# Shapes used to tell the system of a code when the input does not say
+ICD10_SHAPE = re.compile(r"[A-TV-Z][0-9][0-9A-Z]{1,5}")
+CPT4_SHAPE = re.compile(r"[0-9]{4}[0-9FTU]")
+
+SYSTEM_NAMES = {
+    "icd10": "ICD-10", "icd-10": "ICD-10", "icd10cm": "ICD-10", "icd-10-cm": "ICD-10", "diagnosis": "ICD-10",
+    "cpt": "CPT-4", "cpt4": "CPT-4", "cpt-4": "CPT-4", "procedure": "CPT-4"
+}
+RESULT_FIELDS = ["line", "claim_id", "code", "system", "status", "description"]
+
+class CodeValidator:
+    def __init__(self, catalog):
+        """
+        Check codes against one catalog version with hash lookups.
+
+        Results are "valid" (in the catalog), "invalid" (a code of a known system that is not in
+        the catalog) or "unknown_system" (the system given is not ICD-10/CPT-4, or the code has
+        the shape of neither).
+        """
+        catalog = catalog.current  # One version for the whole run, even under a CatalogManager
+        self.version = catalog.version
+        self.icd10_by_code = catalog.code_scanner.icd10_by_code
+        self.cpt4_by_code = catalog.code_scanner.cpt4_by_code
+
+    def validate(self, code, system=None):
+        """Return (system, status, description) for one code."""
+        key = normalize_code(code)
+        # A blank system column means "work it out from the code"; JSON may give a number or the like
+        system = str(system if system is not None else "").strip() or None
+        if system:
+            system = SYSTEM_NAMES.get(system.lower())
+            if system is None:
+                return None, "unknown_system", ""
+        if system in (None, "ICD-10") and key in self.icd10_by_code:
+            return "ICD-10", "valid", self.icd10_by_code[key]["disease"]
+        if system in (None, "CPT-4") and key in self.cpt4_by_code:
+            return "CPT-4", "valid", self.cpt4_by_code[key]["procedure"]
+        if system is None:
+            if CPT4_SHAPE.fullmatch(key):
+                system = "CPT-4"
+            elif ICD10_SHAPE.fullmatch(key):
+                system = "ICD-10"
+            else:
+                return None, "unknown_system", ""
+        return system, "invalid", ""
+
+    def validate_rows(self, rows):
+        """Validate (line, claim_id, code, system) rows lazily, yielding one result dict per code."""
+        for line, claim_id, code, system in rows:
+            found_system, status, description = self.validate(code, system)
+            yield {"line": line, "claim_id": claim_id, "code": code, "system": found_system or system or "",
+                   "status": status, "description": description}
+
+def read_csv_codes(stream):
+    """
+    Yield (line, claim_id, code, system) from a CSV with a "code" column and optional "system" and
+    "claim_id" columns (header names are case-insensitive).
+    """
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    if "code" not in header:
+        raise ValueError("CSV input needs a 'code' column")
+    code_column = header.index("code")
+    system_column = header.index("system") if "system" in header else None
+    claim_column = header.index("claim_id") if "claim_id" in header else None
+    for line, row in enumerate(reader, start=2):
+        if len(row) <= code_column or not row[code_column].strip():
+            continue
+        yield (line, row[claim_column] if claim_column is not None and claim_column < len(row) else "",
+               row[code_column].strip(),
+               row[system_column] if system_column is not None and system_column < len(row) else None)
+
+def read_jsonl_codes(stream):
+    """
+    Yield (line, claim_id, code, system) from JSON lines that are either single codes
+    ({"code": ..., "system": ...}) or claim records as exported by the agent (icd10_codes/cpt4_codes).
+    """
+    for line, text in enumerate(stream, start=1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            print(f"Skipping line {line}: {e}", file=sys.stderr)
+            continue
+        if not isinstance(record, dict):
+            print(f"Skipping line {line}: expected a JSON object, got {type(record).__name__}", file=sys.stderr)
+            continue
+        claim_id = record.get("claim_id", "")
+        if "code" in record:
+            yield line, claim_id, str(record["code"]), record.get("system")
+            continue
+        for field, system in (("icd10_codes", "ICD-10"), ("cpt4_codes", "CPT-4")):
+            for item in record.get(field) or []:
+                yield line, claim_id, str(item.get("code", "") if isinstance(item, dict) else item), system
+
+def read_codes(stream, input_format):
+    return read_csv_codes(stream) if input_format == "csv" else read_jsonl_codes(stream)
+
+def write_results(results, stream, output_format, invalid_only=False):
+    """Write results as they arrive and return the count per status."""
+    counts = {"valid": 0, "invalid": 0, "unknown_system": 0}
+    writer = csv.DictWriter(stream, fieldnames=RESULT_FIELDS) if output_format == "csv" else None
+    if writer:
+        writer.writeheader()
+    for result in results:
+        counts[result["status"]] += 1
+        if invalid_only and result["status"] == "valid":
+            continue
+        if writer:
+            writer.writerow(result)
+        else:
+            stream.write(json.dumps(result) + "\n")
+    return counts
+
+def detect_format(path, default="jsonl"):
+    _, ext = os.path.splitext(path.lower())
+    return {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl"}.get(ext, default)
+
+def main(argv=None):
+    """Entry point for validating codes in bulk (also run as `python main.py validate`)."""
+    parser = argparse.ArgumentParser(prog="main.py validate",
+                                     description="Validate ICD-10/CPT-4 codes from a CSV or JSONL file against the code catalogs.")
+    parser.add_argument("input", help="CSV with a 'code' column (optional 'system', 'claim_id'), or JSONL of codes or claim records. '-' reads stdin.")
+    parser.add_argument("-o", "--output", default="-", help="Where to write the results (default: stdout).")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"], help="Defaults to the input file extension.")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], help="Defaults to the output file extension, else jsonl.")
+    parser.add_argument("--invalid-only", action="store_true", help="Only write codes that are not valid.")
+    parser.add_argument("--icd10", default="ICD10.json", help="ICD-10 catalog file.")
+    parser.add_argument("--cpt4", default="CPT4.json", help="CPT-4 catalog file.")
+    args = parser.parse_args(argv)
+
+    from code_catalog import CodeCatalog
+    catalog = CodeCatalog(args.icd10, args.cpt4)
+    # An unreadable catalog loads as empty, which would report every one of its codes as invalid
+    for label, data, path in (("ICD-10", catalog.icd10_data, args.icd10), ("CPT-4", catalog.cpt4_data, args.cpt4)):
+        if not data:
+            print(f"Error: the {label} catalog {path} is missing, unreadable or empty", file=sys.stderr)
+            return 2
+    validator = CodeValidator(catalog)
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or detect_format(args.output)
+
+    source = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8', newline='')
+    target = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        counts = write_results(validator.validate_rows(read_codes(source, input_format)), target, output_format,
+                               invalid_only=args.invalid_only)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(f"Catalog version {validator.version}: {counts['valid']} valid, {counts['invalid']} invalid, "
+          f"{counts['unknown_system']} unknown system", file=sys.stderr)
+    return 1 if counts["invalid"] or counts["unknown_system"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import re
+from datetime import datetime
+
+# Labels as they commonly appear on intake forms, insurance cards and superbills
+FIELD_LABELS = {
+    "name": [r"patient\s+name", r"patient'?s\s+name", r"full\s+name", r"name\s+of\s+patient", r"patient", r"name"],
+    "dob": [r"date\s+of\s+birth", r"birth\s*date", r"d\.?\s*o\.?\s*b\.?"],
+    "gender": [r"gender", r"sex"],
+    "insurance": [r"insurance\s+(?:provider|company|carrier|plan|name)", r"primary\s+insurance", r"health\s+plan",
+                  r"insurance", r"payer", r"payor", r"carrier"],
+    "policy": [r"member\s*id(?:\s*(?:#|no\.?|number))?", r"subscriber\s*id(?:\s*(?:#|no\.?|number))?",
+               r"policy\s*(?:#|no\.?|number|id)", r"insurance\s*id(?:\s*(?:#|no\.?|number))?", r"policy", r"id\s*#"],
+    "group": [r"group\s*(?:#|no\.?|number|id)", r"group"],
+    "phone": [r"phone(?:\s*(?:#|no\.?|number))?", r"tel(?:ephone)?", r"mobile", r"cell"],
+}
+
+CLINICAL_LABELS = {
+    "service_date": [r"date\s+of\s+service", r"service\s+date", r"d\.?o\.?s\.?"],
+    "place_of_service": [r"place\s+of\s+service", r"pos"],
+    "provider": [r"rendering\s+provider", r"attending\s+(?:physician|provider)", r"provider", r"physician"],
+    "referring_provider": [r"referring\s+(?:provider|physician)"],
+    "npi": [r"npi(?:\s*(?:#|no\.?|number))?"],
+}
+
+DATE_FORMATS = ["%m/%d/%Y", "%m-%d-%Y", "%m.%d.%Y", "%Y-%m-%d", "%Y/%m/%d", "%m/%d/%y", "%m-%d-%y",
+                "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%b. %d, %Y", "%d %B %Y", "%d %b %Y"]
+DATE_PATTERN = re.compile(
+    r"\b(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}|\d{4}[/\-]\d{1,2}[/\-]\d{1,2}"
+    r"|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{4}|\d{1,2}\s+[A-Za-z]{3,9}\s+\d{4})\b"
+)
+GENDER_TOKENS = {"m": "Male", "male": "Male", "man": "Male", "f": "Female", "female": "Female", "woman": "Female",
+                 "x": "Other", "other": "Other", "non-binary": "Other", "nonbinary": "Other", "u": "Unknown", "unknown": "Unknown"}
+POLICY_PATTERN = re.compile(r"\b([A-Z0-9][A-Z0-9\-]{3,24})\b", re.IGNORECASE)
+
+# Confidence assigned to values found next to an explicit label vs. inferred from free text
+LABELLED_CONFIDENCE = 0.95
+INFERRED_CONFIDENCE = 0.6
+
+class DemographicsExtractor:
+    def __init__(self):
+        """Compile the label patterns once; the extractor is stateless and safe to share."""
+        self.labels = [(field, re.compile(r"(?:" + "|".join(labels) + r")\Z", re.IGNORECASE))
+                       for field, labels in list(FIELD_LABELS.items()) + list(CLINICAL_LABELS.items())]
+
+        # One alternation over every label, longest first, so "Insurance Name:" is never read as "Name:"
+        all_labels = sorted((label for field_labels in list(FIELD_LABELS.values()) + list(CLINICAL_LABELS.values())
+                             for label in field_labels), key=len, reverse=True)
+        self.label_pattern = re.compile(
+            r"(?:^|(?<=[\s|,;]))(?P<label>" + "|".join(all_labels) + r")\s*(?:[:#]|-\s)",
+            re.IGNORECASE | re.MULTILINE
+        )
+
+    def labelled_values(self, text):
+        """Split text into (field, value) pairs; a value runs until the next label or the end of the line."""
+        matches = list(self.label_pattern.finditer(text))
+        values = {}
+        for i, match in enumerate(matches):
+            line_end = text.find("\n", match.end())
+            end = len(text) if line_end == -1 else line_end
+            if i + 1 < len(matches):
+                end = min(end, matches[i + 1].start())
+            value = text[match.end():end].strip(" \t:#-|,;")
+            label = re.sub(r"\s+", " ", match.group("label").strip())
+            field = next((field for field, pattern in self.labels if pattern.match(label)), None)
+            if field and value:
+                values.setdefault(field, []).append(value)
+        return values
+
+    def extract(self, text):
+        """
+        Extract essential demographics from free text.
+
+        Returns:
+            dict: field -> {"value": ..., "confidence": float} for every field that was found.
+        """
+        results = {}
+        values = self.labelled_values(text)
+
+        for value in values.get("name", []):
+            name = self.normalize_name(value)
+            if name:
+                results["name"] = {"value": name, "confidence": LABELLED_CONFIDENCE}
+                break
+
+        for value in values.get("dob", []):
+            dob = self.normalize_date(value)
+            if dob:
+                results["dob"] = {"value": dob, "confidence": LABELLED_CONFIDENCE}
+                break
+
+        for value in values.get("gender", []):
+            gender = GENDER_TOKENS.get(value.split()[0].lower().strip("."))
+            if gender:
+                results["gender"] = {"value": gender, "confidence": LABELLED_CONFIDENCE}
+                break
+        if "gender" not in results:
+            # e.g. "45 year old female" or a lone "Male" on a form line
+            match = re.search(r"\b(male|female|man|woman)\b", text, re.IGNORECASE)
+            if match:
+                results["gender"] = {"value": GENDER_TOKENS[match.group(1).lower()], "confidence": INFERRED_CONFIDENCE}
+
+        for value in values.get("insurance", []):
+            # Every value here follows a payer label, so acronyms such as "BCBS" are payer names; only
+            # a single token with digits in it ("Insurance: XYZ123456") is really an ID
+            if re.search(r"[A-Za-z]{2,}", value) and not re.fullmatch(r"[A-Z0-9\-]*\d[A-Z0-9\-]*", value, re.IGNORECASE):
+                results["insurance"] = {"value": value, "confidence": LABELLED_CONFIDENCE}
+                break
+
+        for field in ["policy", "group"]:
+            for value in values.get(field, []):
+                match = POLICY_PATTERN.search(value)
+                if match and re.search(r"\d", match.group(1)):
+                    results[field] = {"value": match.group(1).upper(), "confidence": LABELLED_CONFIDENCE}
+                    break
+
+        for value in values.get("phone", []):
+            digits = re.sub(r"\D", "", value)
+            if len(digits) in (10, 11):
+                results["phone"] = {"value": value, "confidence": LABELLED_CONFIDENCE}
+                break
+
+        return results
+
+    def extract_clinical(self, text):
+        """Extract labelled claim details (service date, place of service, provider, NPI)."""
+        clinical_info = {}
+        values = self.labelled_values(text)
+        for field in CLINICAL_LABELS:
+            for value in values.get(field, []):
+                if field == "service_date":
+                    value = self.normalize_date(value)
+                elif field == "npi":
+                    match = re.search(r"\b\d{10}\b", value)
+                    value = match.group(0) if match else None
+                if value:
+                    clinical_info[field] = value
+                    break
+        return clinical_info
+
+    @staticmethod
+    def normalize_name(value):
+        """Turn 'DOE, JOHN A' / 'john doe' into 'John A Doe'; reject values that are not names."""
+        value = re.sub(r"\s+", " ", value).strip()
+        if "," in value:
+            last, _, first = value.partition(",")
+            value = f"{first.strip()} {last.strip()}"
+        if not re.fullmatch(r"[A-Za-z][A-Za-z.'\- ]{1,60}", value) or len(value.split()) < 2:
+            return None
+        return " ".join(part if any(c.islower() for c in part) else part.capitalize() for part in value.split())
+
+    @staticmethod
+    def normalize_date(value):
+        """Parse the first date in value and return it as MM/DD/YYYY, or None."""
+        match = DATE_PATTERN.search(value)
+        if not match:
+            return None
+        candidate = re.sub(r"\s+", " ", match.group(1))
+        for date_format in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(candidate, date_format)
+            except ValueError:
+                continue
+            if parsed.year > datetime.now().year:
+                # Two digit years such as 01/02/45 mean 1945 for a date of birth
+                parsed = parsed.replace(year=parsed.year - 100)
+            return parsed.strftime("%m/%d/%Y")
+        return None
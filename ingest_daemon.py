@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import queue
+import argparse
+import threading
+from datetime import datetime
+
+SUPPORTED_EXTENSIONS = ['.pdf', '.jpg', '.jpeg', '.png']
+
+class IngestionDaemon:
+    def __init__(self, agent_factory, watch_dir, output_dir, workers=2, queue_size=8, poll_interval=2.0):
+        """
+        Watch a folder and run new documents through OCR, extraction, coding and claim generation.
+
+        Args:
+            agent_factory (callable): Returns a new MedicalCodingAgent; each worker owns one agent.
+            watch_dir (str): Folder the scanners drop documents into.
+            output_dir (str): Folder for generated claims and per-file status records.
+            workers (int): Number of documents processed concurrently.
+            queue_size (int): Maximum number of documents waiting for a worker. When the queue is
+                              full the scanner stops enqueueing until a worker frees a slot.
+            poll_interval (float): Seconds between directory scans.
+        """
+        self.agent_factory = agent_factory
+        self.watch_dir = watch_dir
+        self.claims_dir = os.path.join(output_dir, "claims")
+        self.status_dir = os.path.join(output_dir, "status")
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.pending_sizes = {}  # file name -> size seen on the previous scan
+        self.scheduled = set()   # (file name, fingerprint) queued or processed in this run
+        self.status_lock = threading.Lock()
+
+        os.makedirs(self.claims_dir, exist_ok=True)
+        os.makedirs(self.status_dir, exist_ok=True)
+
+    def fingerprint(self, path):
+        """Identify one version of a file by its size and modification time."""
+        stat = os.stat(path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def status_path(self, file_name):
+        return os.path.join(self.status_dir, f"{file_name}.json")
+
+    def read_status(self, file_name):
+        try:
+            with open(self.status_path(file_name), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_status(self, file_name, record):
+        """Write the status record atomically so a crash never leaves a half-written file."""
+        path = self.status_path(file_name)
+        with self.status_lock:
+            with open(path + ".tmp", 'w', encoding='utf-8') as file:
+                json.dump(record, file, indent=2)
+            os.replace(path + ".tmp", path)
+
+    def is_completed(self, file_name, fingerprint):
+        status = self.read_status(file_name)
+        return bool(status) and status.get("fingerprint") == fingerprint and status.get("status") in ["completed", "needs_review"]
+
+    def scan_once(self):
+        """Enqueue documents that are new, finished copying and not yet completed."""
+        try:
+            file_names = sorted(os.listdir(self.watch_dir))
+        except OSError as e:
+            print(f"Error scanning {self.watch_dir}: {e}")
+            return
+
+        for file_name in file_names:
+            if self.stop_event.is_set():
+                return
+            path = os.path.join(self.watch_dir, file_name)
+            _, ext = os.path.splitext(file_name.lower())
+            if ext not in SUPPORTED_EXTENSIONS or not os.path.isfile(path):
+                continue
+
+            try:
+                size = os.path.getsize(path)
+                fingerprint = self.fingerprint(path)
+            except OSError:
+                continue  # File disappeared between listdir and stat
+
+            # Wait until the size is stable across two scans so half-copied files are not read
+            if self.pending_sizes.get(file_name) != size:
+                self.pending_sizes[file_name] = size
+                continue
+
+            key = (file_name, fingerprint)
+            if key in self.scheduled or self.is_completed(file_name, fingerprint):
+                continue
+
+            self.write_status(file_name, {"file": file_name, "fingerprint": fingerprint, "status": "queued",
+                                          "queued_at": datetime.now().isoformat()})
+            # Blocks while the queue is full, which is the backpressure on the scanner
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put((file_name, fingerprint), timeout=0.5)
+                    self.scheduled.add(key)
+                    break
+                except queue.Full:
+                    continue
+
+    def process_file(self, agent, file_name, fingerprint):
+        """Run one document through the whole pipeline and return its status record."""
+        path = os.path.join(self.watch_dir, file_name)
+        # Each document is its own trace, so its status record can be matched to its spans
+        agent.trace_id = uuid.uuid4().hex[:16]
+        record = {"file": file_name, "fingerprint": fingerprint, "status": "processing", "trace_id": agent.trace_id,
+                  "started_at": datetime.now().isoformat()}
+        self.write_status(file_name, record)
+
+        agent.reset_case(clear_history=True)
+        # The whole document is coded against one catalog version, even if a new one is swapped in
+        with agent.trace_span("ingest document", file=file_name), agent.pin_catalog() as catalog:
+            agent.current_state = "processing_document"
+            result = agent.process_document(path)
+            if agent.document_text is None:
+                raise RuntimeError(result or "Document could not be read")
+
+            # Code the diagnoses and procedures found in the document, taking the best suggestion for each
+            agent.collect_clinical_notes(agent.document_text)
+            agent.auto_confirm_top_matches()
+
+            # Named after the whole file name, like the status record, so scan.pdf and scan.jpg get separate claims
+            claim_path = os.path.join(self.claims_dir, f"{file_name}.pdf")
+            agent.generate_cms1500_pdf(filename=claim_path)
+            # Queued for the X12 837P exporter, like a claim finalized in a conversation
+            if agent.claim_export_path:
+                record["claim_id"] = agent.export_claim_record()
+
+        missing_fields = [description for field, description in agent.essential_info_fields.items()
+                          if not agent.patient_info.get(field)]
+        record.update({
+            "status": "needs_review" if missing_fields or not agent.matched_icd10_codes else "completed",
+            "claim": claim_path,
+            "missing_fields": missing_fields,
+            "patient_info": agent.patient_info,
+            "icd10_codes": [code['code'] for code in agent.matched_icd10_codes],
+            "cpt4_codes": [code['code'] for code in agent.matched_cpt4_codes],
+            "catalog_version": catalog.version,
+            "finished_at": datetime.now().isoformat()
+        })
+        return record
+
+    def worker_loop(self):
+        agent = self.agent_factory()
+        try:
+            self.process_queue(agent)
+        finally:
+            agent.close()
+
+    def process_queue(self, agent):
+        """Process queued documents with this worker's agent until the daemon stops."""
+        while not self.stop_event.is_set():
+            try:
+                file_name, fingerprint = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                record = self.process_file(agent, file_name, fingerprint)
+                print(f"Processed {file_name}: {record['status']}")
+            except Exception as e:
+                print(f"Error processing {file_name}: {e}")
+                record = {"file": file_name, "fingerprint": fingerprint, "status": "failed", "error": str(e),
+                          "finished_at": datetime.now().isoformat()}
+            self.write_status(file_name, record)
+            self.queue.task_done()
+
+    def run(self):
+        """Scan the watch folder until interrupted."""
+        threads = [threading.Thread(target=self.worker_loop, daemon=True, name=f"ingest-worker-{i}")
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        print(f"Watching {self.watch_dir} with {self.workers} workers. Press Ctrl+C to stop.")
+        try:
+            while not self.stop_event.is_set():
+                self.scan_once()
+                self.stop_event.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            print("\nStopping ingestion...")
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+def main():
+    """Entry point for the watch-folder ingestion service."""
+    from code_catalog import CatalogManager
+    from main import (add_claim_export_argument, add_llm_argument, add_metrics_arguments, add_trace_argument,
+                      create_agent, create_tracer, export_trace, start_metrics)
+
+    parser = argparse.ArgumentParser(description="Watch a folder and turn dropped documents into coded claims.")
+    parser.add_argument("watch_dir", help="Folder to watch for PDF/JPG/PNG documents.")
+    parser.add_argument("--output", default="ingest_output", help="Folder for claims and status records.")
+    parser.add_argument("--workers", type=int, default=2, help="Documents processed concurrently.")
+    parser.add_argument("--queue-size", type=int, default=8, help="Maximum documents waiting for a worker.")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between folder scans.")
+    parser.add_argument("--catalog-poll", type=float, default=60,
+                        help="Seconds between checks for updated ICD10.json/CPT4.json (0 disables reloading).")
+    add_llm_argument(parser)
+    add_metrics_arguments(parser)
+    add_trace_argument(parser)
+    add_claim_export_argument(parser)
+    args = parser.parse_args()
+    stop_metrics = start_metrics(args)
+    tracer = create_tracer(args)
+    # One set of catalogs shared by every worker, reloaded when the files are updated
+    catalog = CatalogManager(poll_interval=args.catalog_poll)
+    if args.catalog_poll:
+        catalog.start()
+
+    daemon = IngestionDaemon(
+        agent_factory=lambda: create_agent(args.llm, tracer=tracer, catalog=catalog,
+                                           claim_export_path=args.claim_export),
+        watch_dir=args.watch_dir,
+        output_dir=args.output,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        poll_interval=args.poll_interval
+    )
+    try:
+        daemon.run()
+    finally:
+        export_trace(tracer, args.trace)
+        stop_metrics()
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,195 @@
+from startup_profile import StartupProfiler
 import os
+import sys
 import argparse
-from Agent import MedicalCodingAgent
-from openai_implementation import OpenAIImplementation
-from mistral_implementation import MistralImplementation
+import threading
+from llm_interface import LLMInterface
 
-def main():
-    """Main entry point for the CLI."""
-    # Parse CLI arguments
-    parser = argparse.ArgumentParser(description="Choose the LLM implementation to use.")
+def add_llm_argument(parser):
+    """Add the shared --llm option to an argument parser."""
     parser.add_argument(
         "--llm",
         choices=["openai", "mistral"],
         default="mistral",
         help="Specify which LLM implementation to use: 'openai' or 'mistral'. Default is 'mistral'."
     )
-    args = parser.parse_args()
 
-    tesseract_cmd = os.getenv('TESSERACT_CMD', '/usr/bin/tesseract')  # Default for Linux
-    poppler_path = os.getenv('POPPLER_PATH', '/usr/bin')  # Default for Linux
+def add_profile_startup_argument(parser):
+    """Add the shared --profile-startup option to an argument parser."""
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print how long imports and initialisation took before the first prompt."
+    )
+
+def add_profile_arguments(parser):
+    """Add the shared --profile/--cprofile options to an argument parser."""
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time every turn and its stages (OCR, LLM, matching, PDF) per state and print a summary at exit."
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        help="Also capture cProfile data for the session, list the top functions at exit and save the raw stats to FILE."
+    )
+
+def add_claim_export_argument(parser):
+    """Add the shared --claim-export option to an argument parser."""
+    parser.add_argument(
+        "--claim-export",
+        metavar="FILE",
+        help="Append every finalized claim to FILE as a JSON line, the input of x12_export.py."
+    )
+
+def create_profiler(args):
+    """Return a TurnProfiler when --profile or --cprofile was given, otherwise None."""
+    if not (args.profile or args.cprofile):
+        return None
+    from turn_profiler import TurnProfiler
+    return TurnProfiler(cprofile=bool(args.cprofile))
+
+def report_profile(profiler, cprofile_path=None):
+    """Print the ranked turn profile and save the cProfile data if requested."""
+    if not profiler:
+        return
+    print(profiler.summary())
+    if cprofile_path:
+        if profiler.dump_stats(cprofile_path):
+            print(f"cProfile data saved to {cprofile_path}")
+        else:
+            print(f"No turns were profiled; {cprofile_path} not written")
+
+def add_trace_argument(parser):
+    """Add the shared --trace option to an argument parser."""
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Record tracing spans (turns, OCR pages, LLM calls, matching, PDF) and write a Chrome trace JSON to FILE at exit."
+    )
+
+def create_tracer(args):
+    """Return a Tracer when --trace was given, otherwise None."""
+    if not args.trace:
+        return None
+    from tracing import Tracer
+    return Tracer()
+
+def export_trace(tracer, path):
+    """Write the collected spans, if tracing is on."""
+    if tracer and path:
+        tracer.export(path)
+        print(f"Trace written to {path} (open it in https://ui.perfetto.dev or chrome://tracing)")
+
+def add_metrics_arguments(parser):
+    """Add the shared --metrics-port/--metrics-file options to an argument parser."""
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics.")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics to this file every 15 seconds and at exit.")
+
+def start_metrics(args):
+    """Start the metrics exporters that were asked for and return a function that stops them."""
+    from metrics import start_metrics_server, start_metrics_file_writer
+
+    stops = []
+    if args.metrics_port:
+        server = start_metrics_server(args.metrics_port)
+        stops.append(server.shutdown)
+        print(f"Metrics available at http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_file:
+        stops.append(start_metrics_file_writer(args.metrics_file))
+
+    def stop():
+        for stop_exporter in stops:
+            stop_exporter()
+    return stop
+
+def create_llm(llm_name):
+    """Initialize the chosen LLM implementation from environment configuration; only its SDK is imported."""
     openai_api_key = os.getenv('OPENAI_API_KEY', 'your-default-api-key')
     mistral_api_key = os.getenv('MISTRAL_API_KEY', 'your-default-api-key')
 
-    # Initialize the chosen LLM implementation
-    if args.llm == "openai":
-        llm = OpenAIImplementation(api_key=openai_api_key)
-    elif args.llm == "mistral":
-        llm = MistralImplementation(api_key=mistral_api_key)
+    if llm_name == "openai":
+        from openai_implementation import OpenAIImplementation
+        return OpenAIImplementation(api_key=openai_api_key)
+    elif llm_name == "mistral":
+        from mistral_implementation import MistralImplementation
+        return MistralImplementation(api_key=mistral_api_key)
+    raise ValueError(f"Unknown LLM implementation: {llm_name}")
+
+class LazyLLM(LLMInterface):
+    def __init__(self, llm_name):
+        """Stands in for the chosen LLM; its SDK is imported and the client created on the first request."""
+        self.llm_name = llm_name
+        self.llm = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.llm is None:
+            with self.lock:
+                if self.llm is None:
+                    self.llm = create_llm(self.llm_name)
+        return self.llm
+
+    def generate_response(self, conversation_history, specific_prompt=None):
+        return self.get().generate_response(conversation_history, specific_prompt)
+
+def create_agent(llm_name, llm=None, **kwargs):
+    """Create a MedicalCodingAgent with the OCR paths and LLM configured from the environment; pass llm to share a client."""
+    from Agent import MedicalCodingAgent
+
+    tesseract_cmd = os.getenv('TESSERACT_CMD', '/usr/bin/tesseract')  # Default for Linux
+    poppler_path = os.getenv('POPPLER_PATH', '/usr/bin')  # Default for Linux
 
     # Inject configurations into the MedicalCodingAgent
-    agent = MedicalCodingAgent(
+    return MedicalCodingAgent(
         tesseract_cmd=tesseract_cmd,
         poppler_path=poppler_path,
-        llm=llm,
+        llm=llm or LazyLLM(llm_name),
+        **kwargs
     )
-    agent.start_conversation()
+
+def main():
+    """Main entry point for the CLI."""
+    # `python main.py validate ...` checks codes in bulk instead of starting a conversation
+    if sys.argv[1:2] == ["validate"]:
+        from code_validation import main as validate_main
+        sys.exit(validate_main(sys.argv[2:]))
+
+    # Checked before the parser is built, so the imports made while setting up (metrics, tracing,
+    # the agent) are all in the import ranking
+    profiler = StartupProfiler().install() if "--profile-startup" in sys.argv[1:] else None
+
+    # Parse CLI arguments
+    parser = argparse.ArgumentParser(description="Choose the LLM implementation to use.")
+    add_llm_argument(parser)
+    add_profile_startup_argument(parser)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_argument(parser)
+    add_claim_export_argument(parser)
+    args = parser.parse_args()
+    stop_metrics = start_metrics(args)
+    tracer = create_tracer(args)
+    if profiler:
+        profiler.mark("arguments, metrics, tracing")
+
+    agent = create_agent(args.llm, profiler=create_profiler(args), tracer=tracer, claim_export_path=args.claim_export)
+    if profiler:
+        profiler.mark("agent")
+
+    agent.open_conversation()
+    if profiler:
+        profiler.mark("first prompt")
+        profiler.report()
+
+    try:
+        agent.conversation_loop()
+    finally:
+        report_profile(agent.profiler, args.cprofile)
+        export_trace(tracer, args.trace)
+        stop_metrics()
+        agent.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,196 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labelnames, values, extra=()):
+    """Render {name="value",...} for a series, with extra (name, value) pairs such as the bucket bound."""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in list(zip(labelnames, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of a block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                for bound, bucket_count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', bound)])} {bucket_count}")
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        """Process-wide set of metrics, rendered in the Prometheus text exposition format."""
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline metrics
+LLM_LATENCY = REGISTRY.histogram("medisuite_llm_request_seconds", "LLM request latency.", ["backend"])
+LLM_ERRORS = REGISTRY.counter("medisuite_llm_errors_total", "LLM requests that failed.", ["backend"])
+FUZZY_LATENCY = REGISTRY.histogram("medisuite_fuzzy_match_seconds", "Time to fuzzy-match one phrase against a catalog.", ["catalog"])
+FUZZY_CANDIDATES = REGISTRY.histogram("medisuite_fuzzy_match_candidates", "Catalog entries above the match threshold per phrase.",
+                                      ["catalog"], buckets=COUNT_BUCKETS)
+OCR_PAGES = REGISTRY.counter("medisuite_ocr_pages_total", "Pages recognized by OCR.")
+OCR_SECONDS = REGISTRY.counter("medisuite_ocr_seconds_total", "Time spent in OCR.")
+OCR_PAGES_PER_SECOND = REGISTRY.gauge("medisuite_ocr_pages_per_second", "OCR throughput of the most recent document.")
+PDF_RENDERS = REGISTRY.counter("medisuite_pdf_renders_total", "Claim PDFs rendered.", ["layout"])
+PDF_RENDER_LATENCY = REGISTRY.histogram("medisuite_pdf_render_seconds", "Claim PDF render latency.", ["layout"])
+CACHE_REQUESTS = REGISTRY.counter("medisuite_cache_requests_total", "Cache lookups by cache and result (hit or miss).",
+                                  ["cache", "result"])
+
+def record_ocr(pages, seconds):
+    """Count the pages of one OCR run and update the throughput gauge."""
+    OCR_PAGES.inc(pages)
+    OCR_SECONDS.inc(seconds)
+    if seconds > 0:
+        OCR_PAGES_PER_SECOND.set(pages / seconds)
+
+def record_fuzzy_match(catalog, candidates, seconds):
+    """Record the latency and number of candidates of one fuzzy match."""
+    FUZZY_LATENCY.observe(seconds, catalog=catalog)
+    FUZZY_CANDIDATES.observe(candidates, catalog=catalog)
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def write_metrics_file(path, registry=REGISTRY):
+    """Write the current metrics to a file atomically (e.g. for the node_exporter textfile collector)."""
+    with open(path + ".tmp", 'w', encoding='utf-8') as file:
+        file.write(registry.render())
+    os.replace(path + ".tmp", path)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve /metrics from a background thread and return the server."""
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
+
+def start_metrics_file_writer(path, interval=15.0, registry=REGISTRY):
+    """Rewrite the metrics file every interval seconds from a background thread; returns a stop function that writes once more."""
+    stop_event = threading.Event()
+
+    def loop():
+        while not stop_event.wait(interval):
+            write_metrics_file(path, registry)
+
+    threading.Thread(target=loop, daemon=True, name="metrics-file-writer").start()
+
+    def stop():
+        stop_event.set()
+        write_metrics_file(path, registry)
+    return stop
@@ -1,5 +1,6 @@
 from llm_interface import LLMInterface
 from mistralai import Mistral
+from metrics import LLM_LATENCY, LLM_ERRORS
 
 class MistralImplementation(LLMInterface):
     def __init__(self, api_key, model="mistral-large-latest"):
@@ -26,17 +27,21 @@ class MistralImplementation(LLMInterface):
             str: The generated response from the Mistral API.
         """
         try:
-            # If a specific prompt is provided, prepend it as a system message
+            # If a specific prompt is provided, prepend it as a system message (to a copy: the
+            # agent's history is not ours to change)
+            messages = list(conversation_history)
             if specific_prompt:
-                conversation_history.insert(0, {"role": "system", "content": specific_prompt})
+                messages.insert(0, {"role": "system", "content": specific_prompt})
 
             # Use the Mistral client to generate a response
-            chat_response = self.client.chat.complete(
-                model=self.model,
-                messages=conversation_history
-            )
+            with LLM_LATENCY.time(backend="mistral"):
+                chat_response = self.client.chat.complete(
+                    model=self.model,
+                    messages=messages
+                )
 
             # Extract and return the content of the response
             return chat_response.choices[0].message.content.strip()
         except Exception as e:
+            LLM_ERRORS.inc(backend="mistral")
             return f"Error: {str(e)}"
\ No newline at end of file
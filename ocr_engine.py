@@ -0,0 +1,83 @@
+import os
+import queue
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span, propagate
+
+class OCREngine(ABC):
+    def __init__(self, workers=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+
+    @abstractmethod
+    def recognize(self, image):
+        """Return the text found in a single PIL image."""
+        pass
+
+    def recognize_page(self, page, image):
+        with span("ocr page", page=page + 1):
+            return self.recognize(image)
+
+    def recognize_pages(self, images):
+        """OCR every page, several at a time, keeping page order."""
+        images = list(images)
+        if len(images) <= 1 or self.workers <= 1:
+            return [self.recognize_page(page, image) for page, image in enumerate(images)]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(images))) as executor:
+            return list(executor.map(propagate(self.recognize_page), range(len(images)), images))
+
+    def close(self):
+        """Release any resources held by the engine."""
+        pass
+
+class TesserocrEngine(OCREngine):
+    def __init__(self, workers=None, lang="eng", tessdata_path=None):
+        """
+        In-process Tesseract through the tesserocr binding.
+
+        A fixed pool of PyTessBaseAPI instances is created up front and reused, so the language
+        model is loaded once per worker instead of once per page, and images are handed over in
+        memory instead of through temporary files.
+        """
+        super().__init__(workers)
+        import tesserocr
+
+        if tessdata_path is None:
+            tessdata_path, _ = tesserocr.get_languages()
+        self.apis = queue.Queue()
+        for _ in range(self.workers):
+            self.apis.put(tesserocr.PyTessBaseAPI(path=tessdata_path, lang=lang))
+
+    def recognize(self, image):
+        api = self.apis.get()
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            self.apis.put(api)
+
+    def close(self):
+        while not self.apis.empty():
+            self.apis.get().End()
+
+class PytesseractEngine(OCREngine):
+    def __init__(self, workers=None, tesseract_cmd=None, lang="eng"):
+        """Fallback that runs the tesseract executable once per page through pytesseract."""
+        super().__init__(workers)
+        import pytesseract
+
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self.pytesseract = pytesseract
+        self.lang = lang
+
+    def recognize(self, image):
+        return self.pytesseract.image_to_string(image, lang=self.lang)
+
+def create_ocr_engine(tesseract_cmd=None, workers=None, lang="eng"):
+    """Use warm in-process tesserocr workers when the binding is installed, otherwise pytesseract."""
+    try:
+        return TesserocrEngine(workers=workers, lang=lang)
+    except Exception as e:
+        if not isinstance(e, ImportError):
+            print(f"Error starting in-process OCR, falling back to pytesseract: {e}")
+        return PytesseractEngine(workers=workers, tesseract_cmd=tesseract_cmd, lang=lang)
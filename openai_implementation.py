@@ -1,5 +1,6 @@
 import openai
 from llm_interface import LLMInterface
+from metrics import LLM_LATENCY, LLM_ERRORS
 
 class OpenAIImplementation(LLMInterface):
     def __init__(self, api_key):
@@ -11,12 +12,14 @@ class OpenAIImplementation(LLMInterface):
             messages.append({"role": "system", "content": specific_prompt})
         
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4.1",
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.7
-            )
+            with LLM_LATENCY.time(backend="openai"):
+                response = openai.ChatCompletion.create(
+                    model="gpt-4.1",
+                    messages=messages,
+                    max_tokens=1000,
+                    temperature=0.7
+                )
             return response.choices[0].message.content.strip()
         except Exception as e:
+            LLM_ERRORS.inc(backend="openai")
             return f"Error: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,82 @@
+import re
+import math
+import heapq
+
+WORD = re.compile(r"[a-z0-9]+")
+
+def text_features(text, ngram=3):
+    """
+    Word tokens plus character n-grams of each word (padded with spaces), so reordered words
+    and abbreviations such as "endosc" or "w/suture" still share features with the full text.
+    """
+    features = {}
+    for word in WORD.findall(text.lower()):
+        features["w:" + word] = features.get("w:" + word, 0) + 1
+        padded = f" {word} "
+        for i in range(max(1, len(padded) - ngram + 1)):
+            gram = "c:" + padded[i:i + ngram]
+            features[gram] = features.get(gram, 0) + 1
+    return features
+
+class TfidfIndex:
+    def __init__(self, texts, max_df=0.3):
+        """
+        Sparse TF-IDF vectors over word and character n-gram features, stored as an inverted
+        index (feature -> [(document, weight), ...]) so a query only touches the documents that
+        share a feature with it.
+
+        Args:
+            texts (list): One description per catalog entry; results refer to positions in this list.
+            max_df (float): Features found in more than this share of the documents carry almost no
+                            signal and are left out, which keeps the posting lists short.
+        """
+        self.size = len(texts)
+        counts = [text_features(text) for text in texts]
+
+        document_frequency = {}
+        for features in counts:
+            for feature in features:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        limit = max(1, max_df * self.size)
+        self.idf = {feature: math.log((1 + self.size) / (1 + df)) + 1
+                    for feature, df in document_frequency.items() if df <= limit}
+
+        self.postings = {}
+        for document, features in enumerate(counts):
+            vector = self.weigh(features)
+            for feature, weight in vector.items():
+                self.postings.setdefault(feature, []).append((document, weight))
+
+    def weigh(self, features):
+        """Sublinear TF-IDF weights of a feature count dict, L2-normalized; unknown features are dropped."""
+        vector = {feature: (1 + math.log(count)) * self.idf[feature]
+                  for feature, count in features.items() if feature in self.idf}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {feature: weight / norm for feature, weight in vector.items()} if norm else {}
+
+    def search(self, query, k=100):
+        """Return up to k (document, cosine similarity) pairs, best first."""
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries, k=100):
+        """
+        Score several queries in one pass: each posting list is walked once and its weights are
+        added to every query that shares the feature (a sparse queries x documents product).
+        """
+        vectors = [self.weigh(text_features(query)) for query in queries]
+        by_feature = {}
+        for position, vector in enumerate(vectors):
+            for feature, weight in vector.items():
+                by_feature.setdefault(feature, []).append((position, weight))
+
+        scores = [{} for _ in queries]
+        for feature, query_weights in by_feature.items():
+            postings = self.postings.get(feature)
+            if not postings:
+                continue
+            for position, query_weight in query_weights:
+                accumulator = scores[position]
+                for document, weight in postings:
+                    accumulator[document] = accumulator.get(document, 0.0) + query_weight * weight
+
+        return [heapq.nlargest(k, accumulator.items(), key=lambda item: item[1]) for accumulator in scores]
@@ -0,0 +1,295 @@
+import os
+import json
+import uuid
+import time
+import argparse
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EXIT_WORDS = ["exit", "quit", "bye"]
+
+class AgentSession:
+    def __init__(self, session_id, agent_factory):
+        """One user's conversation: a private agent (patient, codes, history, state) and its pending replies."""
+        self.session_id = session_id
+        self.outbox = []
+        self.agent = agent_factory(message_handler=self.outbox.append)
+        self.agent.trace_id = session_id  # Spans of this conversation are grouped under the session ID
+        self.lock = threading.Lock()  # One turn at a time per session; sessions run concurrently
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+    def drain(self):
+        """Return the assistant messages produced since the last call."""
+        messages = list(self.outbox)
+        del self.outbox[:]
+        return messages
+
+    def summary(self):
+        agent = self.agent
+        return {
+            "session_id": self.session_id,
+            "state": agent.current_state,
+            "patient_info": agent.patient_info,
+            "icd10_codes": [code['code'] for code in agent.matched_icd10_codes],
+            "cpt4_codes": [code['code'] for code in agent.matched_cpt4_codes],
+            "idle_seconds": round(time.time() - self.last_active, 1)
+        }
+
+class SessionManager:
+    def __init__(self, agent_factory, idle_timeout=1800, max_sessions=200, reap_interval=60, catalog=None):
+        """
+        Host many independent coding conversations in one process.
+
+        Args:
+            agent_factory (callable): Called with message_handler=... and returns a new agent. Agents
+                                      should share one CodeCatalog, LLM client and OCR engine so a
+                                      session only costs its own mutable state.
+            idle_timeout (float): Seconds without activity after which a session is evicted.
+            max_sessions (int): Sessions allowed at once; idle ones are evicted first when full.
+            reap_interval (float): Seconds between idle-eviction sweeps.
+            catalog (CatalogManager): The shared catalogs, for session-less code suggestions.
+        """
+        self.agent_factory = agent_factory
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.reap_interval = reap_interval
+        self.catalog = catalog
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.reaper = None
+
+    def create_session(self):
+        """Start a new conversation and return the session with its greeting."""
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                self.evict_idle(locked=True)
+            if len(self.sessions) >= self.max_sessions:
+                raise RuntimeError("Too many active sessions")
+            session = AgentSession(uuid.uuid4().hex, self.agent_factory)
+            self.sessions[session.session_id] = session
+        session.agent.open_conversation()
+        return session, session.drain()
+
+    def get_session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def send(self, session_id, text):
+        """Run one user message through the session's agent and return the assistant replies."""
+        session = self.get_session(session_id)
+        with session.lock:
+            session.last_active = time.time()
+            text = (text or "").strip()
+            if not text:
+                return ["I didn't catch that. Could you please repeat?"]
+            if text.lower() in EXIT_WORDS:
+                self.close_session(session_id)
+                return ["Thank you for using the Medical Coding Assistant. Goodbye!"]
+            try:
+                session.agent.handle_input(text)
+            except Exception as e:
+                print(f"Error in session {session_id}: {e}")
+                session.agent.say("Sorry, I encountered an error. Let's continue.")
+            session.last_active = time.time()
+            return session.drain()
+
+    def close_session(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def evict_idle(self, locked=False):
+        """Drop sessions idle longer than idle_timeout, skipping any that are mid-turn."""
+        if not locked:
+            with self.lock:
+                return self.evict_idle(locked=True)
+        cutoff = time.time() - self.idle_timeout
+        evicted = []
+        for session_id, session in list(self.sessions.items()):
+            if session.last_active < cutoff and session.lock.acquire(blocking=False):
+                try:
+                    del self.sessions[session_id]
+                    evicted.append(session_id)
+                finally:
+                    session.lock.release()
+        return evicted
+
+    def reap_loop(self):
+        while not self.stop_event.wait(self.reap_interval):
+            evicted = self.evict_idle()
+            if evicted:
+                print(f"Evicted {len(evicted)} idle session(s)")
+
+    def start(self):
+        self.reaper = threading.Thread(target=self.reap_loop, daemon=True, name="session-reaper")
+        self.reaper.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.reaper:
+            self.reaper.join()
+
+class SessionRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API:
+        POST   /sessions                     start a session -> {session_id, messages}
+        POST   /sessions/<id>/messages       {"text": ...} -> {messages, state}
+        GET    /sessions/<id>                current state, patient info and confirmed codes
+        GET    /sessions/<id>/claim.pdf      the session's CMS-1500 claim
+        DELETE /sessions/<id>                end a session
+        GET    /codes/suggest?q=992&limit=10 typeahead for a partial code or description
+        GET    /health                       liveness and session count
+        GET    /metrics                      pipeline metrics in Prometheus text format
+    """
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for errors and evictions
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def route(self):
+        """Split the path into ('sessions', id, sub-resource) parts."""
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        return parts + [None] * (3 - len(parts))
+
+    def do_GET(self):
+        resource, session_id, item = self.route()[:3]
+        try:
+            if resource == "health":
+                self.send_json(200, {"status": "ok", "sessions": len(self.manager.sessions)})
+            elif resource == "metrics":
+                from metrics import REGISTRY
+                body = REGISTRY.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif resource == "codes" and session_id == "suggest" and self.manager.catalog:
+                query = parse_qs(self.path.partition("?")[2])
+                limit = min(int(query.get("limit", ["10"])[0]), 100)
+                text = query.get("q", [""])[0]
+                self.send_json(200, {"query": text, "suggestions": self.manager.catalog.current.typeahead().suggest(text, limit)})
+            elif resource == "sessions" and session_id and item is None:
+                self.send_json(200, self.manager.get_session(session_id).summary())
+            elif resource == "sessions" and session_id and item == "claim.pdf":
+                session = self.manager.get_session(session_id)
+                with session.lock:
+                    pdf_bytes = session.agent.render_cms1500_pdf()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(pdf_bytes)))
+                self.end_headers()
+                self.wfile.write(pdf_bytes)
+            else:
+                self.send_json(404, {"error": "Not found"})
+        except KeyError:
+            self.send_json(404, {"error": f"Unknown session {session_id}"})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def do_POST(self):
+        resource, session_id, item = self.route()[:3]
+        try:
+            if resource == "sessions" and session_id is None:
+                session, messages = self.manager.create_session()
+                self.send_json(201, {"session_id": session.session_id, "messages": messages})
+            elif resource == "sessions" and session_id and item == "messages":
+                messages = self.manager.send(session_id, self.read_json().get("text", ""))
+                session = self.manager.sessions.get(session_id)
+                self.send_json(200, {"messages": messages, "state": session.agent.current_state if session else "closed"})
+            else:
+                self.send_json(404, {"error": "Not found"})
+        except KeyError:
+            self.send_json(404, {"error": f"Unknown session {session_id}"})
+        except ValueError as e:
+            self.send_json(400, {"error": f"Invalid JSON: {e}"})
+        except RuntimeError as e:
+            self.send_json(503, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def do_DELETE(self):
+        resource, session_id, _ = self.route()[:3]
+        if resource == "sessions" and session_id and self.manager.close_session(session_id):
+            self.send_json(200, {"session_id": session_id, "closed": True})
+        else:
+            self.send_json(404, {"error": f"Unknown session {session_id}"})
+
+def serve(manager, host="127.0.0.1", port=8765):
+    """Serve the session API until interrupted."""
+    server = ThreadingHTTPServer((host, port), SessionRequestHandler)
+    server.daemon_threads = True
+    server.manager = manager
+    manager.start()
+    print(f"Medical coding sessions on http://{host}:{port} (idle timeout {manager.idle_timeout:.0f}s). Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping session service...")
+    finally:
+        server.server_close()
+        manager.stop()
+
+def main():
+    """Entry point for the multi-session HTTP/JSON service."""
+    from main import add_llm_argument, add_trace_argument, create_agent, create_llm, create_tracer, export_trace
+    from code_catalog import CatalogManager
+    from ocr_engine import create_ocr_engine
+
+    parser = argparse.ArgumentParser(description="Serve many medical coding sessions over a local HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--idle-timeout", type=float, default=1800, help="Seconds before an idle session is evicted.")
+    parser.add_argument("--max-sessions", type=int, default=200, help="Maximum concurrent sessions.")
+    parser.add_argument("--catalog-poll", type=float, default=60,
+                        help="Seconds between checks for updated ICD10.json/CPT4.json (0 disables reloading).")
+    add_llm_argument(parser)
+    add_trace_argument(parser)
+    args = parser.parse_args()
+
+    # Loaded once and shared by every session
+    catalog = CatalogManager(poll_interval=args.catalog_poll)
+    if args.catalog_poll:
+        catalog.start()
+    llm = create_llm(args.llm)
+    ocr_engine = create_ocr_engine(os.getenv('TESSERACT_CMD', '/usr/bin/tesseract'))
+    tracer = create_tracer(args)
+
+    manager = SessionManager(
+        agent_factory=lambda message_handler: create_agent(args.llm, llm=llm, catalog=catalog, ocr_engine=ocr_engine,
+                                                           message_handler=message_handler, tracer=tracer),
+        idle_timeout=args.idle_timeout,
+        max_sessions=args.max_sessions,
+        catalog=catalog
+    )
+    try:
+        serve(manager, host=args.host, port=args.port)
+    finally:
+        export_trace(tracer, args.trace)
+        ocr_engine.close()  # Shared by every session's agent, so closed here rather than per agent
+
+if __name__ == "__main__":
+    main()
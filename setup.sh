@@ -14,6 +14,11 @@ sudo apt install -y tesseract-ocr poppler-utils
 echo "Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Optional in-process OCR (tesserocr); pytesseract is used when it cannot be built
+echo "Installing optional in-process OCR..."
+sudo apt install -y libtesseract-dev libleptonica-dev pkg-config
+pip install -r requirements-optional.txt || echo "tesserocr could not be installed; OCR will use pytesseract."
+
 # Verify installations
 echo "Verifying installations..."
 if command -v tesseract >/dev/null 2>&1; then
@@ -0,0 +1,72 @@
+import sys
+import time
+import builtins
+import threading
+
+# Taken when the entry point first imports this module, i.e. about as early as the program starts
+PROCESS_STARTED = time.perf_counter()
+
+class StartupProfiler:
+    def __init__(self, started=None):
+        """
+        Time-to-first-prompt report: named initialisation phases plus the modules imported while
+        starting up.
+
+        Imports are timed by wrapping builtins.__import__; only the outermost import of a module
+        not yet loaded is measured, so each figure includes everything that module pulled in.
+        """
+        self.started = started or PROCESS_STARTED
+        self.last = self.started
+        self.phases = []
+        self.import_times = {}
+        self.depth = 0
+        self.original_import = None
+
+    def install(self):
+        """Start timing imports made on the main thread."""
+        if self.original_import:
+            return self
+        self.original_import = builtins.__import__
+        original_import = self.original_import
+        main_thread = threading.main_thread()
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if self.depth or level or name in sys.modules or threading.current_thread() is not main_thread:
+                return original_import(name, globals, locals, fromlist, level)
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                self.depth -= 1
+                self.import_times[name] = self.import_times.get(name, 0.0) + time.perf_counter() - start
+
+        builtins.__import__ = timed_import
+        return self
+
+    def uninstall(self):
+        if self.original_import:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def mark(self, label):
+        """Close the current phase under the given label."""
+        now = time.perf_counter()
+        self.phases.append((label, now - self.last))
+        self.last = now
+
+    def report(self, stream=None, top=10):
+        """Print the phases and the slowest imports, then stop timing imports."""
+        self.uninstall()
+        stream = stream or sys.stderr
+        total = self.last - self.started
+        print("\nStartup profile (time to first prompt)", file=stream)
+        for label, seconds in self.phases:
+            print(f"  {label:<32} {seconds * 1000:8.1f} ms", file=stream)
+        print(f"  {'total':<32} {total * 1000:8.1f} ms", file=stream)
+        if self.import_times:
+            print(f"Slowest imports during startup (run with python -X importtime for the full tree):", file=stream)
+            ranked = sorted(self.import_times.items(), key=lambda item: item[1], reverse=True)[:top]
+            for name, seconds in ranked:
+                print(f"  {name:<32} {seconds * 1000:8.1f} ms", file=stream)
+        print("", file=stream)
@@ -0,0 +1,195 @@
+import re
+from collections import deque
+
+WORD = re.compile(r"[a-z0-9]+")
+
+# Common clinical shorthand -> (catalog wording, "diagnosis" | "procedure"). Two-letter abbreviations
+# that mean something else just as often (PE: physical exam, MI, RA, OA, DM, CT, UA) are left out
+SYNONYMS = {
+    "htn": ("hypertension", "diagnosis"),
+    "high blood pressure": ("hypertension", "diagnosis"),
+    "t2dm": ("type 2 diabetes mellitus", "diagnosis"),
+    "dm2": ("type 2 diabetes mellitus", "diagnosis"),
+    "t1dm": ("type 1 diabetes mellitus", "diagnosis"),
+    "copd": ("chronic obstructive pulmonary disease", "diagnosis"),
+    "chf": ("congestive heart failure", "diagnosis"),
+    "cad": ("coronary artery disease", "diagnosis"),
+    "heart attack": ("myocardial infarction", "diagnosis"),
+    "afib": ("atrial fibrillation", "diagnosis"),
+    "a fib": ("atrial fibrillation", "diagnosis"),
+    "ckd": ("chronic kidney disease", "diagnosis"),
+    "uti": ("urinary tract infection", "diagnosis"),
+    "uri": ("upper respiratory infection", "diagnosis"),
+    "gerd": ("gastro-esophageal reflux disease", "diagnosis"),
+    "acid reflux": ("gastro-esophageal reflux disease", "diagnosis"),
+    "hld": ("hyperlipidemia", "diagnosis"),
+    "high cholesterol": ("hyperlipidemia", "diagnosis"),
+    "dvt": ("deep vein thrombosis", "diagnosis"),
+    "osa": ("obstructive sleep apnea", "diagnosis"),
+    "mdd": ("major depressive disorder", "diagnosis"),
+    "gad": ("generalized anxiety disorder", "diagnosis"),
+    "bph": ("benign prostatic hyperplasia", "diagnosis"),
+    "ecg": ("electrocardiogram", "procedure"),
+    "ekg": ("electrocardiogram", "procedure"),
+    "cxr": ("chest x-ray", "procedure"),
+    "egd": ("upper gi endoscopy", "procedure"),
+    "mri": ("mri scan", "procedure"),
+    "cbc": ("complete blood count", "procedure"),
+    "bmp": ("basic metabolic panel", "procedure"),
+    "cmp": ("comprehensive metabolic panel", "procedure"),
+    "a1c": ("glycosylated hemoglobin test", "procedure"),
+    "hba1c": ("glycosylated hemoglobin test", "procedure"),
+    "tka": ("total knee arthroplasty", "procedure"),
+    "tha": ("total hip arthroplasty", "procedure"),
+    "flu shot": ("influenza vaccine", "procedure"),
+}
+
+# A spotted term preceded by one of these (within NEGATION_WINDOW words of the same sentence) is not coded
+NEGATION_CUES = {"no", "not", "denies", "denied", "without", "negative", "rule", "ruled", "never", "absent"}
+
+# Words that say nothing codable; they are left out of the coverage figure
+STOPWORDS = set("""
+a an and are as at be been by for from had has have he her his in is it its of on or she that the their there they
+this to was were which with without patient pt pts presents presented presenting seen today reports reported
+history hx noted notes note complains complaint c o year years old yo male female man woman mr mrs ms dr
+also well good stable continue continued plan follow up f u visit day days week weeks month months per
+done performed underwent undergoing diagnosed treated given ordered administered known left right mild
+""".split()) | NEGATION_CUES
+
+NEGATION_WINDOW = 4
+SENTENCE_BREAK = re.compile(r"[.;:\n]")
+PARENTHETICAL = re.compile(r"\([^)]*\)")
+MIN_SINGLE_WORD = 5  # Single-word catalog terms shorter than this ("test", "exam") are too vague to spot
+
+def phrase_variants(description):
+    """
+    The description without parentheticals and its head phrases (before a comma, before a slash),
+    as word tuples: "Essential (primary) hypertension" -> essential hypertension, "Knee
+    arthroscopy/surgery" -> knee arthroscopy.
+
+    A single word is only a term when it is the whole description ("Urinalysis"); a one-word head
+    such as "Blood" from "Blood, occult, by peroxidase activity" is far too general to code on.
+    """
+    description = PARENTHETICAL.sub(" ", description)
+    full = tuple(WORD.findall(description.lower()))
+    variants = set()
+    if len(full) > 1 or (len(full) == 1 and len(full[0]) >= MIN_SINGLE_WORD and full[0] not in STOPWORDS):
+        variants.add(full)
+    for text in (description.split(",")[0], re.split(r"[,/]", description)[0]):
+        words = tuple(WORD.findall(text.lower()))
+        if len(words) > 1:
+            variants.add(words)
+    return variants
+
+class TermSpotter:
+    def __init__(self, icd10_data, cpt4_data, synonyms=None):
+        """
+        Aho-Corasick automaton over words, compiled from the catalog descriptions (and their head
+        phrases) plus clinical shorthand, that finds every known diagnosis/procedure term in a note
+        in one pass over its words.
+        """
+        synonyms = SYNONYMS if synonyms is None else synonyms
+        self.patterns = []  # pattern id -> (word count, phrase to match on, {kinds})
+        pattern_ids = {}
+
+        def add(words, phrase, kind):
+            pattern_id = pattern_ids.get(words)
+            if pattern_id is None:
+                pattern_id = pattern_ids[words] = len(self.patterns)
+                self.patterns.append((len(words), phrase, set()))
+            self.patterns[pattern_id][2].add(kind)
+
+        for entry in icd10_data:
+            for words in phrase_variants(entry["disease"]):
+                add(words, None, "diagnosis")
+        for entry in cpt4_data:
+            for words in phrase_variants(entry["procedure"]):
+                add(words, None, "procedure")
+        for term, (phrase, kind) in synonyms.items():
+            add(tuple(WORD.findall(term.lower())), phrase, kind)
+
+        # Trie over words, then failure links breadth-first; outputs include those of the failure state
+        self.goto = [{}]
+        self.outputs = [[]]
+        for words, pattern_id in pattern_ids.items():
+            state = 0
+            for word in words:
+                next_state = self.goto[state].get(word)
+                if next_state is None:
+                    next_state = self.goto[state][word] = len(self.goto)
+                    self.goto.append({})
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(pattern_id)
+
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(word, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def spot(self, text):
+        """
+        Find the known terms in the text.
+
+        Returns:
+            dict: diagnoses and procedures (phrases to match, in order of appearance, without
+                  duplicates), hits ([{phrase, kinds, start, end, negated}]) and coverage, the
+                  share of the text's content words that the hits account for.
+        """
+        tokens = [(match.group(0), match.start(), match.end()) for match in WORD.finditer(text.lower())]
+
+        # One pass over the words collects every (start word, end word, pattern) occurrence
+        found = []
+        state = 0
+        for position, (word, _, _) in enumerate(tokens):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for pattern_id in self.outputs[state]:
+                found.append((position - self.patterns[pattern_id][0] + 1, position, pattern_id))
+
+        # Keep the leftmost-longest occurrences that do not overlap
+        found.sort(key=lambda item: (item[0], item[0] - item[1]))
+        hits = []
+        covered = set()
+        next_free = 0
+        for first, last, pattern_id in found:
+            if first < next_free:
+                continue
+            next_free = last + 1
+            covered.update(range(first, last + 1))
+            _, phrase, kinds = self.patterns[pattern_id]
+            start, end = tokens[first][1], tokens[last][2]
+            hits.append({"phrase": phrase or text[start:end], "kinds": sorted(kinds), "start": start, "end": end,
+                         "negated": self.is_negated(text, tokens, first)})
+
+        diagnoses, procedures = [], []
+        for hit in hits:
+            if hit["negated"]:
+                continue
+            for kind, phrases in (("diagnosis", diagnoses), ("procedure", procedures)):
+                if kind in hit["kinds"] and hit["phrase"].lower() not in (phrase.lower() for phrase in phrases):
+                    phrases.append(hit["phrase"])
+
+        content = [position for position, (word, _, _) in enumerate(tokens)
+                   if word not in STOPWORDS and not word.isdigit() and len(word) > 1]
+        coverage = sum(1 for position in content if position in covered) / len(content) if content else 0.0
+        return {"diagnoses": diagnoses, "procedures": procedures, "hits": hits, "coverage": coverage}
+
+    @staticmethod
+    def is_negated(text, tokens, first):
+        """True when a negation cue precedes the term within a few words of the same sentence."""
+        for position in range(first - 1, max(-1, first - 1 - NEGATION_WINDOW), -1):
+            word, _, end = tokens[position]
+            if SENTENCE_BREAK.search(text, end, tokens[position + 1][1]):
+                return False
+            if word in NEGATION_CUES:
+                return True
+        return False
@@ -0,0 +1,65 @@
+import json
+import threading
+import pytest
+from llm_interface import LLMInterface
+from code_catalog import CodeCatalog
+from Agent import MedicalCodingAgent, TurnCancelled
+
+ICD10 = [{"code": "J20.9", "disease": "Acute bronchitis, unspecified", "category": "Acute bronchitis"},
+         {"code": "S93.409A", "disease": "Sprain of unspecified ligament of ankle", "category": "Sprain of ankle"}]
+CPT4 = [{"code": "99213", "procedure": "Office visit, established patient"},
+        {"code": "94640", "procedure": "Nebulizer treatment"}]
+
+class StubLLM(LLMInterface):
+    def __init__(self):
+        self.prompts = []
+
+    def generate_response(self, conversation_history, specific_prompt=None):
+        self.prompts.append(specific_prompt)
+        if "diagnoses" in specific_prompt:
+            return "Acute bronchitis\nSprained ankle"
+        return "Nebulizer treatment"
+
+@pytest.fixture
+def agent(tmp_path):
+    icd10_path, cpt4_path = tmp_path / "ICD10.json", tmp_path / "CPT4.json"
+    icd10_path.write_text(json.dumps(ICD10))
+    cpt4_path.write_text(json.dumps(CPT4))
+    return MedicalCodingAgent(StubLLM(), catalog=CodeCatalog(str(icd10_path), str(cpt4_path)),
+                              message_handler=lambda message: None)
+
+def test_uncoded_items_next_to_a_literal_code_are_extracted(agent):
+    agent.collect_clinical_notes("Knee pain treated with 99213 today; also acute bronchitis and sprained ankle, "
+                                 "gave nebulizer treatment")
+    assert [code["code"] for code in agent.matched_cpt4_codes] == ["99213"]
+    assert len(agent.llm.prompts) == 2
+    assert [phrase.lower() for phrase in agent.diagnoses] == ["acute bronchitis", "sprained ankle"]
+    assert [phrase.lower() for phrase in agent.procedures] == ["nebulizer treatment"]
+
+def test_only_codes_skips_the_llm(agent):
+    agent.collect_clinical_notes("99213 - Office visit, established patient")
+    assert agent.llm.prompts == []
+    assert agent.diagnoses == [] and agent.procedures == []
+
+def test_snapshot_keeps_history_by_length(agent):
+    agent.add_to_history("user", "first")
+    snapshot = agent.snapshot_case()
+    assert snapshot["conversation_history"] == (agent.conversation_history, 1)
+    agent.add_to_history("user", "second")
+    agent.diagnoses.append("Cough")
+    agent.restore_case(snapshot)
+    assert agent.conversation_history == [{"role": "user", "content": "first"}]
+    assert agent.diagnoses == []
+
+def test_cancelled_turn_makes_no_llm_calls_files_or_exports(agent, tmp_path):
+    agent.claim_export_path = str(tmp_path / "claims.jsonl")
+    agent.cancel_event = threading.Event()
+    agent.cancel_event.set()
+    with pytest.raises(TurnCancelled):
+        agent.generate_llm_response("Extract diagnoses")
+    with pytest.raises(TurnCancelled):
+        agent.generate_cms1500_pdf(filename=str(tmp_path / "claim.pdf"))
+    with pytest.raises(TurnCancelled):
+        agent.export_claim_record()
+    assert agent.llm.prompts == []
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["CPT4.json", "ICD10.json"]
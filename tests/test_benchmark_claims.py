@@ -0,0 +1,26 @@
+import argparse
+import pytest
+from benchmark_claims import parse_modes, percentile, positive_int
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    ([1, 2, 3, 4, 5, 6], 0.5, 3),
+    ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.7, 7),
+    ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.9, 9),
+    ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.99, 10),
+    ([1, 2, 3, 4, 5], 0.5, 3),
+    ([7], 0.5, 7),
+])
+def test_percentile_is_nearest_rank(values, fraction, expected):
+    assert percentile(values, fraction) == expected
+
+def test_parse_modes():
+    assert parse_modes("template, dynamic") == ["template", "dynamic"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_modes("dynamic,tempalte")
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_modes(",")
+
+def test_positive_int():
+    assert positive_int("3") == 3
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_int("0")
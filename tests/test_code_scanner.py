@@ -0,0 +1,61 @@
+import pytest
+from code_scanner import CodeScanner, normalize_code
+
+ICD10 = [{"code": "E11.9", "disease": "Type 2 diabetes mellitus without complications", "category": "Diabetes"}]
+CPT4 = [{"code": "99213", "procedure": "Office visit, established patient"},
+        {"code": "0010T", "procedure": "Tuberculosis test"}]
+
+@pytest.fixture
+def scanner():
+    return CodeScanner(ICD10, CPT4)
+
+def cpt_codes(scanner, text):
+    return [match["code"] for match in scanner.scan(text)[1]]
+
+@pytest.mark.parametrize("text", [
+    "Procedure paid 99213",
+    "valid 99213",
+    "CPT #99213",
+    "CPT: 99213",
+    "Dx, pt 99213",
+    "Office visit 99213 today",
+])
+def test_codes_are_found(scanner, text):
+    assert cpt_codes(scanner, text) == ["99213"]
+
+@pytest.mark.parametrize("text", [
+    "Zip: 99213",
+    "Member ID# 99213",
+    "ID 99213",
+    "Phone 99213",
+    "Austin, TX 99213",
+    "NPI: 99213",
+])
+def test_identifiers_are_not_codes(scanner, text):
+    assert cpt_codes(scanner, text) == []
+
+def test_icd10_with_and_without_dot(scanner):
+    icd10, _ = scanner.scan("Dx E11.9, also e119")
+    assert [match["code"] for match in icd10] == ["E11.9"]
+    assert normalize_code(" e11.9 ") == "E119"
+
+def test_category_three_code(scanner):
+    assert cpt_codes(scanner, "Performed 0010T") == ["0010T"]
+
+def residual(scanner, text):
+    icd10, cpt4 = scanner.scan(text)
+    return scanner.residual_text(text, icd10 + cpt4)
+
+def test_residual_text_keeps_uncoded_items_on_a_coded_line(scanner):
+    assert residual(scanner, "Knee pain treated with 99213 today; also acute bronchitis") == \
+        "Knee pain treated with today; also acute bronchitis"
+
+def test_residual_text_drops_code_and_adjacent_description(scanner):
+    assert residual(scanner, "99213 - Office visit, established patient\nCough for two weeks") == "\nCough for two weeks"
+    assert residual(scanner, "Type 2 diabetes mellitus without complications (E11.9), sprained ankle") == ", sprained ankle"
+
+def test_residual_text_keeps_identifiers(scanner):
+    assert residual(scanner, "Zip 99213, seen for 99213") == "Zip 99213, seen for "
+
+def test_residual_text_without_codes(scanner):
+    assert residual(scanner, "Cough for two weeks") == "Cough for two weeks"
@@ -0,0 +1,34 @@
+import os
+import json
+import pytest
+from code_typeahead import WORD, CodeTypeahead, PrefixTrie
+
+CPT4_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CPT4.json")
+
+@pytest.fixture(scope="module")
+def typeahead():
+    with open(CPT4_PATH, 'r', encoding='utf-8') as file:
+        return CodeTypeahead([], json.load(file))
+
+def brute_force(typeahead, text):
+    words = WORD.findall(text.lower())
+    matches = [entry for entry in typeahead.entries
+               if all(any(entry_word.startswith(word) for entry_word in WORD.findall(entry["description"].lower()))
+                      for word in words)]
+    return sorted(matches, key=lambda entry: (len(entry["description"]), entry["code"]))
+
+@pytest.mark.parametrize("text", ["repair arte", "repair lesi", "repair remo", "repair surg", "knee arthr",
+                                  "excision", "inj", "remo bone les"])
+def test_word_suggestions_match_brute_force(typeahead, text):
+    expected = brute_force(typeahead, text)
+    assert typeahead.suggest(text, limit=1000) == expected
+    assert typeahead.suggest(text) == expected[:10]
+
+def test_find_all_is_not_truncated():
+    trie = PrefixTrie(max_items=2)
+    for item, key in enumerate(["repair", "repeat", "replace", "remove"]):
+        trie.insert(key, item)
+    assert trie.find("rep") == [0, 1]
+    assert not trie.is_complete(trie.find("rep"))
+    assert trie.find_all("rep") == {0, 1, 2}
+    assert trie.find_all("x") == set()
@@ -0,0 +1,97 @@
+import io
+import json
+import pytest
+from code_catalog import CodeCatalog
+from code_validation import CodeValidator, main, read_csv_codes, read_jsonl_codes
+
+ICD10 = [{"code": "E11.9", "disease": "Type 2 diabetes mellitus without complications", "category": "Diabetes"}]
+CPT4 = [{"code": "99213", "procedure": "Office visit, established patient"},
+        {"code": "0010T", "procedure": "Tuberculosis test"}]
+
+@pytest.fixture
+def catalog_paths(tmp_path):
+    icd10_path, cpt4_path = tmp_path / "ICD10.json", tmp_path / "CPT4.json"
+    icd10_path.write_text(json.dumps(ICD10))
+    cpt4_path.write_text(json.dumps(CPT4))
+    return str(icd10_path), str(cpt4_path)
+
+@pytest.fixture
+def validator(catalog_paths):
+    return CodeValidator(CodeCatalog(*catalog_paths))
+
+@pytest.mark.parametrize("code, system, expected", [
+    ("E11.9", None, ("ICD-10", "valid")),
+    ("e119", "icd10", ("ICD-10", "valid")),
+    ("99213", "CPT", ("CPT-4", "valid")),
+    ("0010T", "", ("CPT-4", "valid")),
+    ("E11.9", "  ", ("ICD-10", "valid")),
+    ("E11.8", "", ("ICD-10", "invalid")),
+    ("99999", None, ("CPT-4", "invalid")),
+    ("99213", "ICD-10", ("ICD-10", "invalid")),
+    ("ZZZ", "", (None, "unknown_system")),
+    ("99213", "HCPCS", (None, "unknown_system")),
+    ("99213", 5, (None, "unknown_system")),
+])
+def test_validate(validator, code, system, expected):
+    assert validator.validate(code, system)[:2] == expected
+
+def test_read_csv_codes_with_blank_system():
+    rows = list(read_csv_codes(io.StringIO("claim_id,code,system\nc1,E11.9,\nc1,,CPT\nc2,99213,cpt\n")))
+    assert rows == [(2, "c1", "E11.9", ""), (4, "c2", "99213", "cpt")]
+
+def test_read_csv_codes_needs_code_column():
+    with pytest.raises(ValueError):
+        list(read_csv_codes(io.StringIO("claim,value\n1,E11.9\n")))
+
+def test_read_jsonl_codes_skips_bad_lines(capsys):
+    text = "\n".join([
+        '{"code": "E11.9"}',
+        "[1, 2]",
+        "not json",
+        '"99213"',
+        '{"claim_id": "c1", "icd10_codes": [{"code": "E11.9"}], "cpt4_codes": ["99213"]}',
+    ])
+    rows = list(read_jsonl_codes(io.StringIO(text)))
+    assert rows == [(1, "", "E11.9", None), (5, "c1", "E11.9", "ICD-10"), (5, "c1", "99213", "CPT-4")]
+    errors = capsys.readouterr().err
+    assert "Skipping line 2" in errors and "Skipping line 3" in errors and "Skipping line 4" in errors
+
+def run_main(catalog_paths, tmp_path, name, content, *options):
+    source = tmp_path / name
+    source.write_text(content)
+    output = tmp_path / "results.jsonl"
+    code = main([str(source), "-o", str(output), "--icd10", catalog_paths[0], "--cpt4", catalog_paths[1], *options])
+    return code, [json.loads(line) for line in output.read_text().splitlines()]
+
+def test_main_all_valid_exits_zero(catalog_paths, tmp_path):
+    code, results = run_main(catalog_paths, tmp_path, "in.csv", "code,system\nE11.9,\n0010T,\n")
+    assert code == 0
+    assert [result["status"] for result in results] == ["valid", "valid"]
+
+def test_main_reports_invalid_and_unknown(catalog_paths, tmp_path):
+    code, results = run_main(catalog_paths, tmp_path, "in.csv", "code,system\nE11.9,\nE11.8,\nZZZ,\n", "--invalid-only")
+    assert code == 1
+    assert [(result["code"], result["status"]) for result in results] == [("E11.8", "invalid"), ("ZZZ", "unknown_system")]
+
+def test_main_jsonl_with_non_object_line(catalog_paths, tmp_path):
+    code, results = run_main(catalog_paths, tmp_path, "in.jsonl", '[1, 2]\n{"code": "99213"}\n')
+    assert code == 0
+    assert [result["status"] for result in results] == ["valid"]
+
+def test_main_bad_csv_header_exits_two(catalog_paths, tmp_path):
+    code, _ = run_main(catalog_paths, tmp_path, "in.csv", "value\nE11.9\n")
+    assert code == 2
+
+def test_main_jsonl_with_non_string_system(catalog_paths, tmp_path):
+    code, results = run_main(catalog_paths, tmp_path, "in.jsonl", '{"code": "99213", "system": 5}\n{"code": "E11.9"}\n')
+    assert code == 1
+    assert [(result["code"], result["status"]) for result in results] == [("99213", "unknown_system"), ("E11.9", "valid")]
+
+@pytest.mark.parametrize("missing", [0, 1])
+def test_main_missing_catalog_exits_two(catalog_paths, tmp_path, capsys, missing):
+    paths = list(catalog_paths)
+    paths[missing] = str(tmp_path / "missing.json")
+    source = tmp_path / "in.csv"
+    source.write_text("code\nE11.9\n")
+    assert main([str(source), "--icd10", paths[0], "--cpt4", paths[1]]) == 2
+    assert "catalog" in capsys.readouterr().err
@@ -0,0 +1,31 @@
+import pytest
+from demographics_extractor import DemographicsExtractor
+
+@pytest.fixture
+def extractor():
+    return DemographicsExtractor()
+
+@pytest.mark.parametrize("payer", ["BCBS", "UHC", "AETNA", "Blue Cross Blue Shield", "Aetna"])
+def test_payer_names_and_acronyms_are_kept(extractor, payer):
+    results = extractor.extract(f"Insurance: {payer}\nMember ID: XYZ123456")
+    assert results["insurance"]["value"] == payer
+    assert results["policy"]["value"] == "XYZ123456"
+
+def test_id_under_insurance_label_is_not_a_payer(extractor):
+    results = extractor.extract("Insurance: XYZ123456")
+    assert "insurance" not in results
+
+def test_payer_label_variants(extractor):
+    assert extractor.extract("Payer: UHC")["insurance"]["value"] == "UHC"
+    assert extractor.extract("Carrier - CIGNA")["insurance"]["value"] == "CIGNA"
+
+def test_labelled_demographics(extractor):
+    results = extractor.extract("Patient Name: DOE, JOHN A\nDOB: 01/02/45\nSex: M\nPhone: (555) 123-4567")
+    assert results["name"]["value"] == "John A Doe"
+    assert results["dob"]["value"] == "01/02/1945"
+    assert results["gender"]["value"] == "Male"
+    assert results["phone"]["value"] == "(555) 123-4567"
+
+def test_gender_inferred_from_free_text(extractor):
+    results = extractor.extract("45 year old female with cough")
+    assert results["gender"] == {"value": "Female", "confidence": 0.6}
@@ -0,0 +1,70 @@
+import os
+import json
+import pytest
+from term_spotter import TermSpotter, phrase_variants
+
+ICD10 = [
+    {"code": "I10", "disease": "Essential (primary) hypertension", "category": "Hypertensive diseases"},
+    {"code": "J45.909", "disease": "Asthma, unspecified", "category": "Asthma"},
+    {"code": "R50.9", "disease": "Fever, unspecified", "category": "General symptoms"},
+    {"code": "R07.9", "disease": "Chest pain, unspecified", "category": "Symptoms"},
+]
+CPT4 = [
+    {"code": "29870", "procedure": "Knee arthroscopy/surgery"},
+    {"code": "81000", "procedure": "Urinalysis"},
+    {"code": "82270", "procedure": "Blood, occult, by peroxidase activity"},
+    {"code": "93000", "procedure": "Electrocardiogram, complete"},
+]
+CPT4_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CPT4.json")
+
+@pytest.fixture(scope="module")
+def spotter():
+    return TermSpotter(ICD10, CPT4)
+
+@pytest.fixture(scope="module")
+def catalog_spotter():
+    with open(CPT4_PATH, 'r', encoding='utf-8') as file:
+        return TermSpotter(ICD10, json.load(file))
+
+def test_phrase_variants():
+    assert phrase_variants("Essential (primary) hypertension") == {("essential", "hypertension")}
+    assert phrase_variants("Knee arthroscopy/surgery") == {("knee", "arthroscopy", "surgery"), ("knee", "arthroscopy")}
+    assert phrase_variants("Urinalysis") == {("urinalysis",)}
+
+def test_single_word_heads_are_not_terms():
+    assert phrase_variants("Blood, occult, by peroxidase activity") == {("blood", "occult", "by", "peroxidase", "activity")}
+    assert phrase_variants("Asthma, unspecified") == {("asthma", "unspecified")}
+    assert phrase_variants("Fever, unspecified") == {("fever", "unspecified")}
+
+def test_terms_and_shorthand(spotter):
+    result = spotter.spot("Pt with HTN, essential hypertension noted. EKG done, knee arthroscopy performed.")
+    assert result["diagnoses"] == ["hypertension", "essential hypertension"]
+    assert result["procedures"] == ["electrocardiogram", "knee arthroscopy"]
+    assert result["coverage"] == 1.0
+
+def test_negated_terms_are_not_coded(spotter):
+    result = spotter.spot("Denies chest pain. No urinalysis today; HTN.")
+    assert result["diagnoses"] == ["hypertension"]
+    assert result["procedures"] == []
+    assert [hit["negated"] for hit in result["hits"]] == [True, True, False]
+
+def test_negation_stops_at_sentence_break(spotter):
+    result = spotter.spot("No urinalysis. Chest pain, unspecified")
+    assert result["diagnoses"] == ["Chest pain, unspecified"]
+
+def test_negation_window(spotter):
+    assert spotter.spot("no history of recent long standing HTN")["diagnoses"] == ["hypertension"]
+    assert spotter.spot("no known HTN")["diagnoses"] == []
+
+@pytest.mark.parametrize("text", [
+    "PE: lungs clear, heart RRR",
+    "MI in family history, RA factor pending, DM education, CT ordered, UA sent",
+    "Blood drawn; analysis, application and delivery discussed; community drain",
+])
+def test_ambiguous_words_are_not_spotted(catalog_spotter, text):
+    result = catalog_spotter.spot(text)
+    assert result["diagnoses"] == [] and result["procedures"] == []
+    assert result["coverage"] == 0.0
+
+def test_whole_word_catalog_terms_still_spotted(catalog_spotter):
+    assert catalog_spotter.spot("Urinalysis and colonoscopy performed")["procedures"] == ["Urinalysis", "colonoscopy"]
@@ -0,0 +1,17 @@
+from turn_profiler import TurnProfiler
+
+def test_cprofile_without_turns(tmp_path):
+    profiler = TurnProfiler(cprofile=True)
+    assert "(no turns recorded)" in profiler.summary()
+    assert profiler.dump_stats(str(tmp_path / "x.prof")) is False
+    assert not (tmp_path / "x.prof").exists()
+
+def test_cprofile_after_a_turn(tmp_path):
+    profiler = TurnProfiler(cprofile=True)
+    with profiler.turn("INITIAL"):
+        with profiler.stage("llm"):
+            sum(range(1000))
+    summary = profiler.summary(top_functions=5)
+    assert "Top 5 functions by cumulative time:" in summary
+    assert profiler.dump_stats(str(tmp_path / "x.prof")) is True
+    assert (tmp_path / "x.prof").exists()
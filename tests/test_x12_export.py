@@ -0,0 +1,55 @@
+import io
+from x12_export import X12ClaimWriter, next_control_number, split_address
+
+def export(record):
+    stream = io.StringIO()
+    with X12ClaimWriter(stream, "SENDER", "RECEIVER") as writer:
+        writer.write_claim(record)
+    return [segment for segment in stream.getvalue().split("~\n") if segment]
+
+def subscriber_segments(segments):
+    start = segments.index("HL*2*1*22*0")
+    return segments[start:next(i for i, segment in enumerate(segments) if segment.startswith("NM1*PR"))]
+
+def test_subscriber_address_has_n4():
+    segments = subscriber_segments(export({"patient_info": {"name": "John Doe", "address": "123 Main St, Austin, TX 78701",
+                                                            "dob": "01/02/1980", "gender": "Male"}}))
+    assert "N3*123 MAIN ST" in segments
+    assert segments[segments.index("N3*123 MAIN ST") + 1] == "N4*AUSTIN*TX*78701"
+    assert "DMG*D8*19800102*M" in segments
+
+def test_address_without_city_still_gets_n4():
+    segments = subscriber_segments(export({"patient_info": {"name": "John Doe", "address": "45 Elm Rd"}}))
+    assert segments[segments.index("N3*45 ELM RD") + 1] == "N4*UNKNOWN*XX*000000000"
+
+def test_missing_dob_omits_dmg():
+    segments = export({"patient_info": {"name": "John Doe", "gender": "Female"}})
+    assert not any(segment.startswith("DMG") for segment in segments)
+
+def test_charges_come_from_the_claim_record():
+    segments = export({"patient_info": {"name": "John Doe"}, "icd10_codes": [{"code": "E11.9"}],
+                       "cpt4_codes": [{"code": "99213", "charge": "75"}, {"code": "36415"}]})
+    assert next(segment for segment in segments if segment.startswith("CLM")).split("*")[2] == "75.00"
+    assert "SV1*HC:99213*75.00*UN*1***1" in segments
+    assert "SV1*HC:36415*0.00*UN*1***1" in segments
+
+def test_split_address_prefers_separate_fields():
+    assert split_address({"address": "1 Oak Ave", "city": "Boston", "state": "MA", "zip": "02101"}) == \
+        ("1 Oak Ave", "Boston", "MA", "02101")
+    assert split_address({"address": "9 Pine St, Springfield IL 62704-1234"}) == \
+        ("9 Pine St", "Springfield", "IL", "62704-1234")
+
+def test_control_numbers_are_not_reused(tmp_path):
+    path = str(tmp_path / "control.txt")
+    assert [next_control_number(path) for _ in range(3)] == [1, 2, 3]
+    (tmp_path / "control.txt").write_text("999999999\n")
+    assert next_control_number(path) == 1
+
+def test_control_number_in_envelope():
+    stream = io.StringIO()
+    with X12ClaimWriter(stream, "SENDER", "RECEIVER", interchange_control_number=42):
+        pass
+    segments = stream.getvalue().split("~\n")
+    assert segments[0].split("*")[13] == "000000042"
+    assert segments[1].split("*")[6] == "42"
+    assert segments[-2] == "IEA*1*000000042"
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# The span the running code belongs to; worker threads inherit it through propagate()
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    def __init__(self, tracer, name, trace_id, parent, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        """Attach attributes known only once the work is under way (page count, claim ID...)."""
+        self.attrs.update(attrs)
+
+class Tracer:
+    def __init__(self, max_spans=100000):
+        """
+        Collect timed spans from the document-to-claim pipeline and export them as a Chrome trace
+        (open the file in https://ui.perfetto.dev or chrome://tracing).
+
+        Every span carries a trace ID - the session or claim being worked on - and its parent span,
+        so the OCR pages, LLM calls, matching and PDF rendering of one claim line up under it. Only
+        the most recent max_spans spans are kept.
+        """
+        self.spans = deque(maxlen=max_spans)
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, trace_id=None, **attrs):
+        """Time a block as a span, nested under the current span when there is one."""
+        parent = _current_span.get()
+        if parent is not None and parent.tracer is not self:
+            parent = None
+        if trace_id is None:
+            trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        span = Span(self, name, trace_id, parent, attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            with self.lock:
+                self.spans.append(span)
+
+    def trace_events(self):
+        """Finished spans as Chrome trace "complete" events, plus thread-name metadata."""
+        with self.lock:
+            spans = list(self.spans)
+        events = []
+        thread_names = {}
+        for span in spans:
+            thread_names[span.thread_id] = span.thread_name
+            args = {"trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id}
+            args.update(span.attrs)
+            events.append({
+                "name": span.name,
+                "cat": span.trace_id,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6, 1),
+                "dur": round((span.end - span.start) * 1e6, 1),
+                "pid": self.pid,
+                "tid": span.thread_id,
+                "args": args
+            })
+        for thread_id, thread_name in thread_names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread_id,
+                           "args": {"name": thread_name}})
+        return events
+
+    def export(self, path):
+        """Write the spans collected so far to a Chrome trace JSON file."""
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file, default=str)
+        os.replace(path + ".tmp", path)
+        return path
+
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Child span of the current span, for code that does not know about the tracer (OCR engines,
+    the chunked extractor). Does nothing when no trace is active.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with parent.tracer.span(name, **attrs) as child:
+        yield child
+
+def propagate(function):
+    """Wrap a function handed to a worker thread so its spans join the caller's trace."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+def annotate(**attrs):
+    """Set attributes on the current span, if any."""
+    parent = _current_span.get()
+    if parent is not None:
+        parent.set(**attrs)
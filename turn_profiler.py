@@ -0,0 +1,84 @@
+import io
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+class TurnProfiler:
+    def __init__(self, cprofile=False):
+        """
+        Time each conversation turn and the stages inside it (OCR, LLM, fuzzy matching, PDF
+        rendering...), grouped by the agent state the turn started in.
+
+        Stages may nest (an LLM call inside document extraction), so the "turn" row of a state is
+        the wall-clock figure to compare against. With cprofile=True the thread running each turn
+        is also profiled with cProfile; work handed to OCR or extraction worker threads shows up
+        in the stage timings but not in the cProfile output.
+        """
+        self.timings = {}  # (state, stage) -> [calls, total seconds, max seconds]
+        self.state = None
+        self.turns = 0
+        self.lock = threading.Lock()
+        self.profile = cProfile.Profile() if cprofile else None
+
+    def record(self, state, stage, seconds):
+        with self.lock:
+            entry = self.timings.setdefault((state, stage), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def turn(self, state):
+        """Time one user turn; stages inside it are filed under the state the turn started in."""
+        self.state = state
+        self.turns += 1
+        if self.profile:
+            self.profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.profile:
+                self.profile.disable()
+            self.record(state, "turn", time.perf_counter() - start)
+            self.state = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time one stage of the current turn."""
+        state = self.state or "outside turn"
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(state, name, time.perf_counter() - start)
+
+    def summary(self, top_functions=25):
+        """Ranked report of the slowest state/stage pairs, plus the top cProfile functions if captured."""
+        with self.lock:
+            rows = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        lines = [f"Turn profile ({self.turns} turns)",
+                 f"  {'state':<26} {'stage':<22} {'calls':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+        for (state, stage), (calls, total, longest) in rows:
+            lines.append(f"  {state:<26} {stage:<22} {calls:>6} {total:>9.3f} {total / calls * 1000:>9.1f} {longest * 1000:>9.1f}")
+        if not rows:
+            lines.append("  (no turns recorded)")
+
+        # pstats refuses a profile that never ran, e.g. when the session ended before a turn
+        if self.profile and self.turns:
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(top_functions)
+            lines.append("")
+            lines.append(f"Top {top_functions} functions by cumulative time:")
+            lines.append(stream.getvalue().strip())
+        return "\n".join(lines)
+
+    def dump_stats(self, path):
+        """Save the raw cProfile data, e.g. for snakeviz or pstats. Returns False if there was none."""
+        if not (self.profile and self.turns):
+            return False
+        self.profile.dump_stats(path)
+        return True
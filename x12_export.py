@@ -0,0 +1,297 @@
+import os
+import re
+import json
+import argparse
+from datetime import datetime
+from demographics_extractor import DemographicsExtractor
+
+ELEMENT_SEPARATOR = "*"
+COMPONENT_SEPARATOR = ":"
+REPETITION_SEPARATOR = "^"
+SEGMENT_TERMINATOR = "~\n"
+IMPLEMENTATION_GUIDE = "005010X222A1"
+MAX_CONTROL_NUMBER = 999999999  # ISA13 is nine digits
+
+GENDER_CODES = {"male": "M", "m": "M", "female": "F", "f": "F"}
+DELIMITERS = re.compile(r"[*~:^\s]+")
+NON_DIGITS = re.compile(r"\D")
+# "123 Main St, Austin, TX 78701" -> street, city, state, zip
+ADDRESS_TAIL = re.compile(r"^(?P<street>.+?),\s*(?P<city>[^,]+?),?\s+(?P<state>[A-Za-z]{2})\.?\s+(?P<zip>\d{5}(?:-?\d{4})?)$")
+
+def clean_element(value, max_length=None):
+    """Strip X12 delimiters from a value and upper-case it, as most payers expect."""
+    text = DELIMITERS.sub(" ", str(value or "")).strip().upper()
+    return text[:max_length] if max_length else text
+
+def x12_date(value):
+    """Convert any date the demographics extractor understands to CCYYMMDD, or '' if it cannot."""
+    normalized = DemographicsExtractor.normalize_date(str(value or ""))
+    if not normalized:
+        return ""
+    return datetime.strptime(normalized, "%m/%d/%Y").strftime("%Y%m%d")
+
+def split_name(full_name):
+    """Return (last, first) from 'First Middle Last' or 'Last, First'."""
+    full_name = (full_name or "").strip()
+    if "," in full_name:
+        last, _, first = full_name.partition(",")
+        return last.strip(), first.strip()
+    parts = full_name.split()
+    if len(parts) < 2:
+        return full_name, ""
+    return parts[-1], " ".join(parts[:-1])
+
+def split_address(patient_info):
+    """
+    Return (street, city, state, zip) for the patient. Separate city/state/zip fields win; otherwise
+    they are read off the end of a one-line address, and missing parts are ''.
+    """
+    address = re.sub(r"\s+", " ", str(patient_info.get('address') or "")).strip()
+    parts = {"street": address, "city": "", "state": "", "zip": ""}
+    match = ADDRESS_TAIL.match(address)
+    if match:
+        parts.update(match.groupdict())
+    for field in ("city", "state", "zip"):
+        parts[field] = patient_info.get(field) or parts[field]
+    return parts["street"], parts["city"], parts["state"], parts["zip"]
+
+def write_claims_jsonl(records, stream):
+    """Write claim records as JSON lines, the intermediate format read by the X12 exporter."""
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, default=str) + "\n")
+        count += 1
+    return count
+
+def read_claims_jsonl(stream):
+    """Yield claim records one at a time from a JSON lines stream."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+class X12ClaimWriter:
+    def __init__(self, stream, sender_id, receiver_id, submitter_name="MEDISUITE", receiver_name="RECEIVER",
+                 billing_provider=None, payer=None, production=False, interchange_control_number=1):
+        """
+        Stream claims into one X12 837P interchange.
+
+        The ISA/GS envelope is written up front and each claim becomes its own ST/SE transaction
+        set, so only counters are kept in memory no matter how many claims are exported.
+
+        Args:
+            stream: Writable text stream for the interchange.
+            sender_id (str): Interchange/application sender ID (ISA06/GS02).
+            receiver_id (str): Interchange/application receiver ID (ISA08/GS03).
+            billing_provider (dict): name, npi, tax_id, address, city, state, zip of the billing provider.
+            payer (dict): Default payer name and id, used when a claim only names its insurance.
+            production (bool): Mark the interchange as production (P) instead of test (T).
+        """
+        self.stream = stream
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.submitter_name = submitter_name
+        self.receiver_name = receiver_name
+        self.billing_provider = billing_provider or {}
+        self.payer = payer or {}
+        self.production = production
+        self.control_number = interchange_control_number
+        self.transaction_count = 0
+        self.segment_count = 0
+        self.now = datetime.now()
+        self.closed = False
+        self.date = self.now.strftime("%Y%m%d")
+        self.time = self.now.strftime("%H%M")
+        self.cached_provider_segments = self.provider_segments()
+        self.write_envelope_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def format_segment(*elements):
+        """Join the elements of one segment, dropping trailing empty elements."""
+        elements = list(elements)
+        while elements and elements[-1] in ("", None):
+            elements.pop()
+        return ELEMENT_SEPARATOR.join("" if e is None else str(e) for e in elements) + SEGMENT_TERMINATOR
+
+    def segment(self, *elements):
+        """Write one segment."""
+        self.stream.write(self.format_segment(*elements))
+        self.segment_count += 1
+
+    def provider_segments(self):
+        """Submitter, receiver and billing provider loops; identical for every claim, so built once."""
+        provider = self.billing_provider
+        return [
+            # 1000A submitter / 1000B receiver
+            self.format_segment("NM1", "41", "2", clean_element(self.submitter_name, 60), "", "", "", "", "46", clean_element(self.sender_id)),
+            self.format_segment("PER", "IC", clean_element(provider.get('contact') or self.submitter_name, 60), "TE",
+                                NON_DIGITS.sub("", provider.get('phone', "")) or "0000000000"),
+            self.format_segment("NM1", "40", "2", clean_element(self.receiver_name, 60), "", "", "", "", "46", clean_element(self.receiver_id)),
+            # 2000A/2010AA billing provider
+            self.format_segment("HL", "1", "", "20", "1"),
+            self.format_segment("NM1", "85", "2", clean_element(provider.get('name', 'BILLING PROVIDER'), 60), "", "", "", "", "XX",
+                                clean_element(provider.get('npi') or "0000000000")),
+            self.format_segment("N3", clean_element(provider.get('address', 'UNKNOWN'), 55)),
+            self.format_segment("N4", clean_element(provider.get('city', 'UNKNOWN'), 30), clean_element(provider.get('state', 'XX'), 2),
+                                clean_element(provider.get('zip', '000000000'), 15)),
+            self.format_segment("REF", "EI", NON_DIGITS.sub("", provider.get('tax_id', '')) or "000000000"),
+        ]
+
+    def write_envelope_header(self):
+        self.segment(
+            "ISA", "00", " " * 10, "00", " " * 10,
+            "ZZ", clean_element(self.sender_id, 15).ljust(15),
+            "ZZ", clean_element(self.receiver_id, 15).ljust(15),
+            self.now.strftime("%y%m%d"), self.time, REPETITION_SEPARATOR, "00501",
+            f"{self.control_number:09d}", "0", "P" if self.production else "T", COMPONENT_SEPARATOR
+        )
+        self.segment("GS", "HC", clean_element(self.sender_id), clean_element(self.receiver_id),
+                     self.date, self.time, str(self.control_number), "X",
+                     IMPLEMENTATION_GUIDE)
+
+    def write_claim(self, record):
+        """
+        Write one claim record (patient_info, clinical_info, icd10_codes, cpt4_codes) as an ST/SE transaction.
+
+        Service line charges (SV102) and the claim total (CLM02) are taken from each CPT-4 code's
+        optional "charge" (and "units"). The agent does not price claims, so its exported records
+        carry 0.00 unless a fee schedule adds charges before the 837P is built.
+        """
+        patient_info = record.get('patient_info') or {}
+        clinical_info = record.get('clinical_info') or {}
+        icd10_codes = (record.get('icd10_codes') or [])[:12]  # HI holds at most 12 diagnoses
+        cpt4_codes = record.get('cpt4_codes') or []
+        self.transaction_count += 1
+        control = f"{self.transaction_count:04d}"
+        claim_id = clean_element(record.get('claim_id') or f"{self.control_number}-{self.transaction_count}", 38)
+        start_count = self.segment_count
+
+        self.segment("ST", "837", control, IMPLEMENTATION_GUIDE)
+        self.segment("BHT", "0019", "00", claim_id, self.date, self.time, "CH")
+        self.stream.write("".join(self.cached_provider_segments))
+        self.segment_count += len(self.cached_provider_segments)
+
+        # 2000B/2010BA subscriber (the patient is the subscriber)
+        last, first = split_name(patient_info.get('name'))
+        self.segment("HL", "2", "1", "22", "0")
+        self.segment("SBR", "P", "18", clean_element(patient_info.get('group'), 50), "", "", "", "", "", "CI")
+        self.segment("NM1", "IL", "1", clean_element(last, 60), clean_element(first, 35), "", "", "", "MI",
+                     clean_element(patient_info.get('policy'), 80))
+        if patient_info.get('address'):
+            # N3 is always followed by its N4 city/state/zip
+            street, city, state, zip_code = split_address(patient_info)
+            self.segment("N3", clean_element(street, 55))
+            self.segment("N4", clean_element(city or 'UNKNOWN', 30), clean_element(state or 'XX', 2),
+                         NON_DIGITS.sub("", zip_code) or "000000000")
+        dob = x12_date(patient_info.get('dob'))
+        if dob:
+            # DMG needs a date of birth; without one the segment is left out rather than sent invalid
+            self.segment("DMG", "D8", dob, GENDER_CODES.get(str(patient_info.get('gender', '')).strip().lower(), "U"))
+
+        # 2010BB payer
+        payer_name = patient_info.get('insurance') or self.payer.get('name', 'UNKNOWN PAYER')
+        self.segment("NM1", "PR", "2", clean_element(payer_name, 60), "", "", "", "", "PI",
+                     clean_element(self.payer.get('id') or payer_name, 80))
+
+        # 2300 claim
+        total = sum(float(code.get('charge', 0) or 0) for code in cpt4_codes)
+        place_of_service = NON_DIGITS.sub("", str(clinical_info.get('place_of_service', '')))[:2] or "11"
+        self.segment("CLM", claim_id, f"{total:.2f}", "", "", COMPONENT_SEPARATOR.join([place_of_service, "B", "1"]),
+                     "Y", "A", "Y", "Y")
+        if icd10_codes:
+            qualifiers = ["ABK"] + ["ABF"] * (len(icd10_codes) - 1)
+            self.segment("HI", *(f"{qualifier}{COMPONENT_SEPARATOR}{clean_element(code['code']).replace('.', '')}"
+                                 for qualifier, code in zip(qualifiers, icd10_codes)))
+
+        # 2400 service lines, each pointing at up to the first four diagnoses
+        pointers = COMPONENT_SEPARATOR.join(str(i) for i in range(1, min(len(icd10_codes), 4) + 1))
+        service_date = x12_date(clinical_info.get('service_date') or record.get('service_date'))
+        for line_number, code in enumerate(cpt4_codes, 1):
+            self.segment("LX", str(line_number))
+            self.segment("SV1", f"HC{COMPONENT_SEPARATOR}{clean_element(code['code'])}", f"{float(code.get('charge', 0) or 0):.2f}",
+                         "UN", str(code.get('units', 1)), "", "", pointers)
+            if service_date:
+                self.segment("DTP", "472", "D8", service_date)
+
+        self.segment("SE", str(self.segment_count - start_count + 1), control)
+
+    def close(self):
+        """Write the GE/IEA trailers with the transaction counts."""
+        if self.closed:
+            return
+        self.segment("GE", str(self.transaction_count), str(self.control_number))
+        self.segment("IEA", "1", f"{self.control_number:09d}")
+        self.closed = True
+
+def control_number_arg(text):
+    """argparse type for an interchange control number (1 to 999999999)."""
+    value = int(text)
+    if not 1 <= value <= MAX_CONTROL_NUMBER:
+        raise argparse.ArgumentTypeError(f"must be between 1 and {MAX_CONTROL_NUMBER}, got {text}")
+    return value
+
+def next_control_number(path):
+    """
+    Take the next interchange control number from a counter file and store it back before the
+    interchange is written, so a crashed export never hands the same number out twice.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            last = int(file.read().strip() or 0)
+    except FileNotFoundError:
+        last = 0
+    number = last % MAX_CONTROL_NUMBER + 1
+    with open(path + ".tmp", 'w', encoding='utf-8') as file:
+        file.write(f"{number}\n")
+    os.replace(path + ".tmp", path)
+    return number
+
+def export_jsonl_to_x12(input_path, output_path, **writer_options):
+    """Stream every claim in a JSONL file into one 837P interchange file and return the claim count."""
+    with open(input_path, 'r', encoding='utf-8') as source, open(output_path, 'w', encoding='ascii', errors='replace') as target:
+        with X12ClaimWriter(target, **writer_options) as writer:
+            for record in read_claims_jsonl(source):
+                writer.write_claim(record)
+            return writer.transaction_count
+
+def main():
+    """Entry point for converting exported claim records to an X12 837P file."""
+    parser = argparse.ArgumentParser(description="Convert claim records (JSONL) into one X12 837P interchange.")
+    parser.add_argument("claims", help="JSONL file of claim records.")
+    parser.add_argument("-o", "--output", required=True, help="Path of the 837P file to write.")
+    parser.add_argument("--sender-id", required=True, help="Submitter/interchange sender ID.")
+    parser.add_argument("--receiver-id", required=True, help="Clearinghouse/payer interchange receiver ID.")
+    parser.add_argument("--submitter-name", default="MEDISUITE")
+    parser.add_argument("--receiver-name", default="RECEIVER")
+    parser.add_argument("--provider-name", default="BILLING PROVIDER")
+    parser.add_argument("--provider-npi", default="")
+    parser.add_argument("--provider-tax-id", default="")
+    parser.add_argument("--provider-address", default="")
+    parser.add_argument("--provider-city", default="")
+    parser.add_argument("--provider-state", default="")
+    parser.add_argument("--provider-zip", default="")
+    parser.add_argument("--production", action="store_true", help="Mark the interchange as production instead of test.")
+    parser.add_argument("--control-number", type=control_number_arg,
+                        help="Interchange control number (ISA13/GS06). Defaults to the next number from --control-file.")
+    parser.add_argument("--control-file", default="x12_control_number.txt",
+                        help="Counter file holding the last control number used (default: x12_control_number.txt).")
+    args = parser.parse_args()
+    control_number = args.control_number or next_control_number(args.control_file)
+
+    billing_provider = {key: value for key, value in {
+        "name": args.provider_name, "npi": args.provider_npi, "tax_id": args.provider_tax_id,
+        "address": args.provider_address, "city": args.provider_city, "state": args.provider_state, "zip": args.provider_zip
+    }.items() if value}
+    count = export_jsonl_to_x12(args.claims, args.output, sender_id=args.sender_id, receiver_id=args.receiver_id,
+                                submitter_name=args.submitter_name, receiver_name=args.receiver_name,
+                                billing_provider=billing_provider, production=args.production,
+                                interchange_control_number=control_number)
+    print(f"Exported {count} claims to {args.output} (interchange control number {control_number})")
+
+if __name__ == "__main__":
+    main()